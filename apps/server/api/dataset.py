@@ -1,22 +1,39 @@
+import asyncio
+import json
 import logging
-from typing import List, Union
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
+from server.api.generate import submit_job
 from server.core.database import get_db
-from server.core import Dataset, QASource
+from server.core import (
+    Dataset,
+    QASource,
+    QALshBucket,
+    QASimilarityPair,
+    QASimilarityFingerprint,
+)
+from server.models.job import JobKind
+from server.services.embeddings import VectorIndex
 from server.services.dataset import (
     get_datasets,
     get_dataset_by_id,
     analyze_dataset_similarities,
     clean_dataset_similarities,
+    find_global_duplicates,
+    stream_clean_dataset_similarities,
+    stream_dataset_similarities,
 )
 from server.schemas.dataset import (
     DatasetResponse,
+    DatasetResult,
     SimilarityAnalysisResponse,
     CleanSimilarityResponse,
     DeleteDatasetResponse,
+    GlobalDuplicatesResponse,
 )
 
 router = APIRouter(
@@ -83,18 +100,113 @@ async def get_all_datasets(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_ndjson(
+    db: Session, start: Callable[[Session], Iterator[Dict[str, Any]]]
+) -> StreamingResponse:
+    """Streams the items of a similarity iterator as NDJSON lines
+
+    ``start`` gets a session of its own, as the request session may be closed
+    before the stream ends, and raises before returning the iterator when the
+    request is invalid.
+    """
+    session = Session(bind=db.get_bind())
+    try:
+        items = await asyncio.to_thread(start, session)
+    except Exception:
+        session.close()
+        raise
+
+    def lines() -> Iterator[str]:
+        try:
+            for item in items:
+                yield json.dumps(item) + "\n"
+        finally:
+            session.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _check_stream_options(stream: bool, background: bool) -> None:
+    if stream and background:
+        raise HTTPException(
+            status_code=400, detail="stream and background cannot be combined"
+        )
+
+
+async def _submit_similarity_job(
+    db: Session, kind: str, dataset_id: str, payload: Dict[str, Any]
+) -> JSONResponse:
+    """Schedule a similarity job on an existing dataset"""
+    dataset = await asyncio.to_thread(
+        lambda: db.query(Dataset.id).filter(Dataset.id == dataset_id).first()
+    )
+    if not dataset:
+        raise HTTPException(
+            status_code=404, detail=f"Dataset with ID '{dataset_id}' not found"
+        )
+    return await submit_job(db, kind, {"dataset_id": dataset_id, **payload}, 0)
+
+
 @router.get(
     "/dataset/{dataset_id}/analyze-similarities",
     response_model=SimilarityAnalysisResponse,
+    responses={
+        202: {
+            "model": DatasetResult,
+            "description": "Background job accepted (background=true)",
+        }
+    },
 )
 async def analyze_similarities(
     dataset_id: str,
     threshold: float = Query(0.8, description="Similarity threshold"),
+    method: Literal["auto", "exact", "tfidf", "lsh", "index", "embedding"] = Query(
+        "auto",
+        description="Similarity engine: exact (SequenceMatcher), tfidf "
+        "(n-gram cosine, for large datasets), lsh (MinHash index, for the "
+        "largest ones), index (persisted similar pairs, for thresholds at or "
+        "above SIMILARITY_INDEX_FLOOR), embedding (cosine of embeddings, which "
+        "also finds paraphrases) or auto",
+    ),
+    workers: Optional[int] = Query(
+        None, ge=1, description="Processes comparing questions in parallel"
+    ),
+    background: bool = Query(
+        False,
+        description="Run as a background job and answer 202 with its task id; "
+        "poll GET /dataset/jobs/{task_id} and page the similarities with "
+        "GET /dataset/jobs/{task_id}/results",
+    ),
+    stream: bool = Query(
+        False,
+        description="Answer with NDJSON lines sent as the pairs are found: a "
+        "dataset line, one pair line per similar pair (unsorted), then a "
+        "summary line, or an error line",
+    ),
     db: Session = Depends(get_db),
 ):
     """Analyzes similar questions in a dataset"""
     try:
-        return analyze_dataset_similarities(db, dataset_id, threshold)
+        _check_stream_options(stream, background)
+        if stream:
+            return await _stream_ndjson(
+                db,
+                lambda session: stream_dataset_similarities(
+                    session, dataset_id, threshold, method, workers
+                ),
+            )
+        if background:
+            return await _submit_similarity_job(
+                db,
+                JobKind.ANALYZE_SIMILARITIES,
+                dataset_id,
+                {"threshold": threshold, "method": method, "workers": workers},
+            )
+        return await asyncio.to_thread(
+            analyze_dataset_similarities, db, dataset_id, threshold, method, workers
+        )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -103,18 +215,78 @@ async def analyze_similarities(
 
 
 @router.post(
-    "/dataset/{dataset_id}/clean-similarities", response_model=CleanSimilarityResponse
+    "/dataset/{dataset_id}/clean-similarities",
+    response_model=CleanSimilarityResponse,
+    responses={
+        202: {
+            "model": DatasetResult,
+            "description": "Background job accepted (background=true)",
+        }
+    },
 )
 async def clean_similarities(
     dataset_id: str,
     threshold: float = Query(
         0.8, description="Similarity threshold to detect duplicates (0.0-1.0)"
     ),
+    method: Literal["auto", "exact", "tfidf", "lsh", "index", "embedding"] = Query(
+        "auto",
+        description="Similarity engine, as for analyze-similarities; auto keeps "
+        "the SequenceMatcher ratio (index or exact) whatever the dataset size",
+    ),
+    workers: Optional[int] = Query(
+        None, ge=1, description="Processes comparing questions in parallel"
+    ),
+    background: bool = Query(
+        False,
+        description="Run as a background job and answer 202 with its task id; "
+        "page the removed items with GET /dataset/jobs/{task_id}/results",
+    ),
+    stream: bool = Query(
+        False,
+        description="Answer with NDJSON lines: a dataset line, one removal "
+        "line per record to remove, then a summary line once they are "
+        "removed, or an error line. Nothing is removed if the stream is "
+        "interrupted",
+    ),
+    dry_run: bool = Query(
+        False, description="Report the records that would be removed, keep them"
+    ),
     db: Session = Depends(get_db),
 ):
     """Cleans similar questions in a dataset by removing duplicates"""
     try:
-        return clean_dataset_similarities(db, dataset_id, threshold)
+        _check_stream_options(stream, background)
+        if stream:
+            return await _stream_ndjson(
+                db,
+                lambda session: stream_clean_dataset_similarities(
+                    session, dataset_id, threshold, method, workers, dry_run
+                ),
+            )
+        if background:
+            return await _submit_similarity_job(
+                db,
+                JobKind.CLEAN_SIMILARITIES,
+                dataset_id,
+                {
+                    "threshold": threshold,
+                    "method": method,
+                    "workers": workers,
+                    "dry_run": dry_run,
+                },
+            )
+        return await asyncio.to_thread(
+            clean_dataset_similarities,
+            db,
+            dataset_id,
+            threshold,
+            method,
+            workers,
+            dry_run=dry_run,
+        )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -122,6 +294,79 @@ async def clean_similarities(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/dataset/global-duplicates",
+    response_model=GlobalDuplicatesResponse,
+    responses={
+        202: {
+            "model": DatasetResult,
+            "description": "Background job accepted (background=true)",
+        }
+    },
+)
+async def global_duplicates(
+    dataset_ids: Optional[List[str]] = Query(
+        None, description="Datasets to compare together; all datasets by default"
+    ),
+    threshold: float = Query(0.8, description="Similarity threshold"),
+    cross_dataset_only: bool = Query(
+        False, description="Only compare records of different datasets"
+    ),
+    workers: Optional[int] = Query(
+        None, ge=1, description="Processes comparing questions in parallel"
+    ),
+    background: bool = Query(
+        False,
+        description="Run as a background job and answer 202 with its task id; "
+        "page the clusters with GET /dataset/jobs/{task_id}/results",
+    ),
+    db: Session = Depends(get_db),
+):
+    """Finds clusters of similar questions across datasets, without removing any"""
+    try:
+        if background:
+            if dataset_ids:
+                found = await asyncio.to_thread(
+                    lambda: {
+                        row[0]
+                        for row in db.query(Dataset.id).filter(
+                            Dataset.id.in_(dataset_ids)
+                        )
+                    }
+                )
+                missing = sorted(set(dataset_ids) - found)
+                if missing:
+                    raise HTTPException(
+                        status_code=404, detail=f"Datasets {missing} not found"
+                    )
+            return await submit_job(
+                db,
+                JobKind.GLOBAL_DUPLICATES,
+                {
+                    "dataset_ids": dataset_ids,
+                    "threshold": threshold,
+                    "cross_dataset_only": cross_dataset_only,
+                    "workers": workers,
+                },
+                0,
+            )
+        return await asyncio.to_thread(
+            find_global_duplicates,
+            db,
+            dataset_ids,
+            threshold,
+            cross_dataset_only,
+            workers,
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in global_duplicates endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/dataset/{dataset_id}", response_model=DeleteDatasetResponse)
 async def delete_dataset(dataset_id: str, db: Session = Depends(get_db)):
     """Deletes a dataset and all its associated records"""
@@ -132,12 +377,20 @@ async def delete_dataset(dataset_id: str, db: Session = Depends(get_db)):
                 status_code=404, detail=f"Dataset with ID '{dataset_id}' not found"
             )
 
+        db.query(QALshBucket).filter(QALshBucket.dataset_id == dataset_id).delete()
+        db.query(QASimilarityPair).filter(
+            QASimilarityPair.dataset_id == dataset_id
+        ).delete()
+        db.query(QASimilarityFingerprint).filter(
+            QASimilarityFingerprint.dataset_id == dataset_id
+        ).delete()
         records_deleted = (
             db.query(QASource).filter(QASource.dataset_id == dataset_id).delete()
         )
 
         db.delete(dataset)
         db.commit()
+        VectorIndex(dataset_id).delete()
 
         return DeleteDatasetResponse(
             message=f"Dataset '{dataset.name}' deleted successfully",
@@ -1,25 +1,83 @@
+import asyncio
+import json
 import logging
 import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from server.schemas.dataset import TargetLanguage
+from server.models.job import JobKind, JobStatus
+from server.schemas.dataset import DatasetResult, JobResultPage, TargetLanguage
 from server.schemas.generate import (
+    DatasetBatchGenerationRequest,
+    DatasetBatchGenerationResponse,
     DatasetGenerationRequest,
     DatasetGenerationResponse,
     ErrorResponse,
     QAPair,
+    UrlGenerationResult,
 )
 from server.core.database import get_db
 from server.pipelines.dataset import DatasetPipeline
+from server.pipelines.jobs import get_job_runner
+from server.services.job import JobService
 from server.core.config import config
+from server.core.utils.url import extract_urls
 
 router = APIRouter(
     prefix="/dataset",
     tags=["generate"],
 )
 
+# Seconds between two progress events of GET /dataset/jobs/{task_id}/events
+JOB_EVENTS_INTERVAL = 1.0
+
+
+def _resolve_generation_params(
+    request: Union[DatasetGenerationRequest, DatasetBatchGenerationRequest],
+) -> Tuple[str, TargetLanguage, str]:
+    """Apply defaults to the requested models and language, and validate them"""
+    model_cleaning = request.model_cleaning or config.model_cleaning
+    target_language = request.target_language or config.target_language
+    model_qa = request.model_qa or config.model_qa
+
+    if model_cleaning not in config.available_models:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Model '{model_cleaning}' not in available models: {config.available_models}",
+        )
+
+    if target_language not in [lang.value for lang in TargetLanguage]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid target language: {target_language}. Available options: {[lang.value for lang in TargetLanguage]}",
+        )
+
+    if model_qa not in config.available_models:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Model '{model_qa}' not in available models: {config.available_models}",
+        )
+
+    return model_cleaning, TargetLanguage(target_language), model_qa
+
+
+async def submit_job(
+    db: Session, kind: str, payload: Dict[str, Any], urls_total: int
+) -> JSONResponse:
+    """Persist a background job, schedule it and answer 202 with its task id"""
+    job_service = JobService(db)
+    job = await asyncio.to_thread(job_service.create_job, kind, payload, urls_total)
+    get_job_runner().submit(job.id)
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=DatasetResult(**JobService.to_result(job)).model_dump(),
+        headers={"Location": f"/dataset/jobs/{job.id}"},
+    )
+
 
 @router.post(
     "/generate",
@@ -33,6 +91,10 @@ router = APIRouter(
             "model": DatasetGenerationResponse,
             "description": "Dataset created successfully",
         },
+        202: {
+            "model": DatasetResult,
+            "description": "Background job accepted (background=true)",
+        },
         400: {
             "model": ErrorResponse,
             "description": "Invalid parameters (model not available, unsupported language, etc.)",
@@ -42,7 +104,7 @@ router = APIRouter(
 )
 async def create_dataset_for_url(
     request: DatasetGenerationRequest, db: Session = Depends(get_db)
-) -> DatasetGenerationResponse:
+) -> Union[DatasetGenerationResponse, JSONResponse]:
     """
     Create a new dataset by processing the content of a given URL.
 
@@ -52,31 +114,18 @@ async def create_dataset_for_url(
     start_time = time.time()
 
     try:
-        # Apply default values if not provided
-        model_cleaning = request.model_cleaning or config.model_cleaning
-        target_language = request.target_language or config.target_language
-        model_qa = request.model_qa or config.model_qa
-
-        # Validate request parameters
-        if model_cleaning not in config.available_models:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Model '{model_cleaning}' not in available models: {config.available_models}",
-            )
-
-        if target_language not in [lang.value for lang in TargetLanguage]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid target language: {target_language}. Available options: {[lang.value for lang in TargetLanguage]}",
-            )
+        model_cleaning, target_language_enum, model_qa = _resolve_generation_params(
+            request
+        )
 
-        if model_qa not in config.available_models:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Model '{model_qa}' not in available models: {config.available_models}",
+        if request.background:
+            payload = request.model_dump(mode="json", exclude={"background"})
+            payload.update(
+                model_cleaning=model_cleaning,
+                target_language=target_language_enum.value,
+                model_qa=model_qa,
             )
-
-        target_language_enum = TargetLanguage(target_language)
+            return await submit_job(db, JobKind.GENERATE, payload, urls_total=1)
 
         pipeline = DatasetPipeline(db)
         result = await pipeline.process_url(
@@ -86,6 +135,7 @@ async def create_dataset_for_url(
             target_language=target_language_enum,
             model_qa=model_qa,
             similarity_threshold=request.similarity_threshold,
+            use_cache=request.use_cache,
         )
 
         processing_time = time.time() - start_time
@@ -126,6 +176,7 @@ async def create_dataset_for_url(
             similarity_threshold=request.similarity_threshold,
             total_questions=len(qa_pairs),
             processing_time=processing_time,
+            cleaned_text_reused=bool(result.get("cleaned_text_reused", False)),
         )
 
     except HTTPException:
@@ -136,3 +187,257 @@ async def create_dataset_for_url(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred while processing your request.",
         )
+
+
+@router.post(
+    "/generate/batch",
+    response_model=DatasetBatchGenerationResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Generate a dataset from several URLs",
+    description="Process a list of URLs (or a hierarchical urls config) into a "
+    "single dataset. URLs are processed in parallel and a failing URL does not "
+    "abort the others; aggregated metrics are returned.",
+    responses={
+        201: {
+            "model": DatasetBatchGenerationResponse,
+            "description": "Batch processed",
+        },
+        202: {
+            "model": DatasetResult,
+            "description": "Background job accepted (background=true)",
+        },
+        400: {
+            "model": ErrorResponse,
+            "description": "Invalid parameters (model not available, no URL, etc.)",
+        },
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def create_dataset_for_urls(
+    request: DatasetBatchGenerationRequest, db: Session = Depends(get_db)
+) -> Union[DatasetBatchGenerationResponse, JSONResponse]:
+    """
+    Create or extend a dataset by processing the content of several URLs.
+
+    Each URL goes through the same pipeline as ``POST /dataset/generate``;
+    per-URL failures are reported in ``errors`` and ``results``.
+    """
+    try:
+        model_cleaning, target_language_enum, model_qa = _resolve_generation_params(
+            request
+        )
+
+        urls = [str(url) for url in request.urls or []]
+        if request.urls_config:
+            urls.extend(extract_urls(request.urls_config))
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No valid URL found in the request",
+            )
+
+        if request.background:
+            payload = request.model_dump(
+                mode="json", exclude={"background", "urls", "urls_config"}
+            )
+            payload.update(
+                urls=urls,
+                model_cleaning=model_cleaning,
+                target_language=target_language_enum.value,
+                model_qa=model_qa,
+            )
+            return await submit_job(
+                db, JobKind.GENERATE_BATCH, payload, urls_total=len(urls)
+            )
+
+        pipeline = DatasetPipeline(db)
+        result = await pipeline.process_urls(
+            urls=urls,
+            dataset_name=request.dataset_name,
+            model_cleaning=model_cleaning,
+            target_language=target_language_enum,
+            model_qa=model_qa,
+            similarity_threshold=request.similarity_threshold,
+            use_cache=request.use_cache,
+            concurrency=request.concurrency,
+        )
+
+        metrics = result["metrics"]
+        return DatasetBatchGenerationResponse(
+            id=result["dataset_id"],
+            dataset_name=result.get("dataset_name", request.dataset_name),
+            model_cleaning=model_cleaning,
+            target_language=target_language_enum.value,
+            model_qa=model_qa,
+            similarity_threshold=request.similarity_threshold,
+            urls_total=len(urls),
+            urls_processed=metrics.urls_processed,
+            qa_pairs_generated=metrics.qa_pairs_generated,
+            errors=metrics.errors,
+            processing_time=metrics.duration,
+            rate=metrics.rate,
+            results=[UrlGenerationResult(**item) for item in result["results"]],
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error in create_dataset_for_urls: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while processing your request.",
+        )
+
+
+@router.get(
+    "/jobs",
+    response_model=List[DatasetResult],
+    summary="List generation jobs",
+)
+async def list_jobs(
+    status_filter: Optional[str] = Query(
+        None, alias="status", description="Only return jobs with this status"
+    ),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of jobs"),
+    db: Session = Depends(get_db),
+) -> List[DatasetResult]:
+    """List the most recent background generation jobs"""
+    jobs = await asyncio.to_thread(JobService(db).list_jobs, status_filter, limit)
+    return [DatasetResult(**JobService.to_result(job)) for job in jobs]
+
+
+@router.get(
+    "/jobs/{task_id}",
+    response_model=DatasetResult,
+    summary="Get the status of a generation job",
+    responses={404: {"model": ErrorResponse, "description": "Job not found"}},
+)
+async def get_job(task_id: str, db: Session = Depends(get_db)) -> DatasetResult:
+    """Poll the status, progress and result of a background generation job"""
+    job = await asyncio.to_thread(JobService(db).get_job, task_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID '{task_id}' not found",
+        )
+    return DatasetResult(**JobService.to_result(job))
+
+
+@router.get(
+    "/jobs/{task_id}/results",
+    response_model=JobResultPage,
+    summary="Get a page of the result of a job",
+    description="Page through a list of the result of a finished job: "
+    "similarities of analyze_similarities jobs, removed_items or details of "
+    "clean_similarities jobs, qa_pairs or results of generation jobs.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Job or list not found"},
+        409: {"model": ErrorResponse, "description": "Job has not succeeded"},
+    },
+)
+async def get_job_results(
+    task_id: str,
+    offset: int = Query(0, ge=0, description="Index of the first item"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items"),
+    field: Optional[str] = Query(
+        None, description="List of the result, the main one of the job kind by default"
+    ),
+    db: Session = Depends(get_db),
+) -> JobResultPage:
+    """Fetch the result of a background job page by page"""
+    job = await asyncio.to_thread(JobService(db).get_job, task_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID '{task_id}' not found",
+        )
+    if job.status != JobStatus.SUCCESS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job with ID '{task_id}' has no result yet (status: {job.status})",
+        )
+
+    page = JobService.get_result_page(job, field, offset, limit)
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID '{task_id}' has no result list '{field}'",
+        )
+    return JobResultPage(**page)
+
+
+@router.post(
+    "/jobs/{task_id}/retry",
+    response_model=DatasetResult,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Retry a failed generation job",
+    description="Queue a failed job again. Stages completed by the previous "
+    "attempt (scrape, clean, QA, persist) are not run again.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Job not found"},
+        409: {"model": ErrorResponse, "description": "Job has not failed"},
+    },
+)
+async def retry_job(task_id: str, db: Session = Depends(get_db)) -> DatasetResult:
+    """Retry a failed background generation job from its last checkpoint"""
+    job_service = JobService(db)
+    job = await asyncio.to_thread(job_service.get_job, task_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID '{task_id}' not found",
+        )
+
+    job = await asyncio.to_thread(job_service.retry_job, task_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job with ID '{task_id}' has not failed and cannot be retried",
+        )
+
+    get_job_runner().submit(job.id)
+    return DatasetResult(**JobService.to_result(job))
+
+
+@router.get(
+    "/jobs/{task_id}/events",
+    summary="Stream the progress of a generation job",
+    description="Server-sent events with the job status, sent on every change "
+    "until the job is finished.",
+    responses={404: {"model": ErrorResponse, "description": "Job not found"}},
+)
+async def stream_job_events(
+    task_id: str, db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """Subscribe to the progress of a background generation job"""
+    job = await asyncio.to_thread(JobService(db).get_job, task_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID '{task_id}' not found",
+        )
+
+    # The request session may be closed before the stream ends
+    bind = db.get_bind()
+
+    def load_result() -> Optional[Dict[str, Any]]:
+        with Session(bind=bind) as session:
+            current = JobService(session).get_job(task_id)
+            return JobService.to_result(current) if current is not None else None
+
+    async def events():
+        last_event = None
+        while True:
+            result = await asyncio.to_thread(load_result)
+            if result is None:
+                return
+            event = json.dumps(DatasetResult(**result).model_dump())
+            if event != last_event:
+                yield f"data: {event}\n\n"
+                last_event = event
+            if result["status"] in JobStatus.FINISHED:
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
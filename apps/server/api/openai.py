@@ -1,18 +1,42 @@
 from fastapi import APIRouter, HTTPException
 
 # Relative import to the LLM service (api/ -> ../services)
+from server.core.cache import get_llm_cache
 from server.services.llm import LLMService
 
 router = APIRouter(prefix="/openai", tags=["openai"])
 
 
 @router.get("/models")
-def list_openai_models():
+async def list_openai_models():
     """
     Returns the list of available models from the OpenAI API.
     """
     service = LLMService()
-    models = service.get_models()
+    models = await service.get_models()
     if models is None:
         raise HTTPException(status_code=500, detail="Unable to retrieve OpenAI models")
     return {"models": models}
+
+
+@router.get("/cache")
+async def get_llm_cache_stats():
+    """
+    Returns hit/miss counters and size of the LLM response cache.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.delete("/cache")
+async def clear_llm_cache():
+    """
+    Removes every entry from the LLM response cache.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="LLM cache is disabled")
+    cache.clear()
+    return {"message": "LLM cache cleared"}
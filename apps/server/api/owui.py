@@ -161,6 +161,7 @@ async def get_knowledge_enrichment(
     file_ids = [file["id"] for file in files]
     file_contents: list[UnitQuestionAnswerResponse] = []
     for file_id in file_ids:
+        record_ids: list[str] = []
         try:
             content: JSONResponse = await get_file_content(file_id)
 
@@ -177,6 +178,9 @@ async def get_knowledge_enrichment(
             content=content.get("content", ""),
             retrieved_at=datetime.now(),
             url_hash=file_id,
+            content_hash=PageSnapshot.compute_hash_from_content(
+                content.get("content", "")
+            ),
             dataset_id=dataset_id,
         )
         scraper_service.add_page_snapshot(page_snapshot)
@@ -259,6 +263,7 @@ async def get_knowledge_enrichment(
 
                     # Save the QA record to the database or any other storage
                     qa_service.add_qa_source(qa_record)
+                    record_ids.append(str(qa_record.id))
             except Exception as e:
                 logger.error(
                     f"Failed to generate QA pairs for file ID {file_id}: {str(e)}"
@@ -267,5 +272,7 @@ async def get_knowledge_enrichment(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Failed to generate QA pairs for file ID {file_id}: {str(e)}",
                 )
+        # Compare the questions of the file with the rest of the dataset
+        qa_service.update_similarity_index(dataset_id, record_ids)
 
     return file_contents
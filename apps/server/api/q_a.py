@@ -60,7 +60,9 @@ async def get_qa_by_dataset(
                     "question": record.input.get("question", ""),
                     "answer": record.expected_output.get("answer", ""),
                     "context": record.input.get("context", ""),
-                    "source_url": record.input.get("source_url", ""),
+                    "context_span": record.input.get("context_span"),
+                    "cleaned_text_id": record.cleaned_text_id,
+                    "source_url": record.source_url or "",
                     "confidence": record.expected_output.get("confidence", 0.0),
                     "created_at": record.created_at,
                     "metadata": record.qa_metadata,
@@ -103,7 +105,9 @@ async def get_qa_by_id(qa_id: str, db: Session = Depends(get_db)) -> QAResponse:
             question=qa_record.input.get("question", ""),
             answer=qa_record.expected_output.get("answer", ""),
             context=qa_record.input.get("context", ""),
-            source_url=qa_record.input.get("source_url", ""),
+            context_span=qa_record.input.get("context_span"),
+            cleaned_text_id=qa_record.cleaned_text_id,
+            source_url=qa_record.source_url or "",
             confidence=qa_record.expected_output.get("confidence", 0.0),
             created_at=qa_record.created_at,
             updated_at=qa_record.updated_at,
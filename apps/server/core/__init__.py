@@ -1,4 +1,23 @@
-from server.models.dataset import Dataset, QASource
+from server.models.dataset import (
+    Dataset,
+    QASource,
+    QALshBucket,
+    QASimilarityPair,
+    QASimilarityFingerprint,
+)
+from server.models.embedding import Embedding
 from server.models.scraper import PageSnapshot, CleanedText
+from server.models.job import Job, PipelineCheckpoint
 
-__all__ = ["Dataset", "QASource", "PageSnapshot", "CleanedText"]
+__all__ = [
+    "Dataset",
+    "QASource",
+    "QALshBucket",
+    "QASimilarityPair",
+    "QASimilarityFingerprint",
+    "Embedding",
+    "PageSnapshot",
+    "CleanedText",
+    "Job",
+    "PipelineCheckpoint",
+]
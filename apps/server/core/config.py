@@ -15,6 +15,14 @@ def parse_list_env(env_var: str, default: Optional[List[str]] = None) -> List[st
     return [item.strip() for item in value.split(",")]
 
 
+def parse_bool_env(env_var: str, default: bool = False) -> bool:
+    """Parse a boolean environment variable (true/1/yes/on)."""
+    value = os.getenv(env_var)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("true", "1", "yes", "on")
+
+
 @dataclass
 class Config:
     # API Configuration
@@ -25,11 +33,131 @@ class Config:
     max_retries: int = 3
     timeout: int = 10
     scrape_delay: float = 0.2
+    batch_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("BATCH_CONCURRENCY", 4))
+    )
+    job_workers: int = field(default_factory=lambda: int(os.getenv("JOB_WORKERS", 2)))
+
+    # Shared HTTP client
+    http_max_connections: int = field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    )
+    http_max_keepalive_connections: int = field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    )
+    http_keepalive_expiry: float = field(
+        default_factory=lambda: float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30.0))
+    )
+    http2_enabled: bool = field(
+        default_factory=lambda: parse_bool_env("HTTP2_ENABLED", False)
+    )
+    http_max_retry_delay: float = field(
+        default_factory=lambda: float(os.getenv("HTTP_MAX_RETRY_DELAY", 60.0))
+    )
 
     # LLM
     max_tokens_cleaning: int = 3000
     max_tokens_qa: int = 4000
     temperature: float = 0.0
+    cleaning_chunk_size: int = field(
+        default_factory=lambda: int(os.getenv("CLEANING_CHUNK_SIZE", 8000))
+    )
+    qa_chunk_size: int = field(
+        default_factory=lambda: int(os.getenv("QA_CHUNK_SIZE", 12000))
+    )
+    llm_max_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+    )
+
+    # LLM response cache
+    llm_cache_enabled: bool = field(
+        default_factory=lambda: parse_bool_env("LLM_CACHE_ENABLED", True)
+    )
+    llm_cache_path: str = field(
+        default_factory=lambda: os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+    )
+    llm_cache_ttl: int = field(
+        default_factory=lambda: int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+    )
+    llm_cache_max_entries: int = field(
+        default_factory=lambda: int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    )
+    llm_cache_max_bytes: int = field(
+        default_factory=lambda: int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    )
+
+    # Dataset similarity analysis
+    similarity_block_size: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_BLOCK_SIZE", 1024))
+    )
+    similarity_max_features: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_MAX_FEATURES", 16384))
+    )
+    similarity_exact_max_records: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_EXACT_MAX_RECORDS", 500))
+    )
+    similarity_tfidf_max_records: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_TFIDF_MAX_RECORDS", 20000))
+    )
+    similarity_workers: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_WORKERS", 1))
+    )
+    similarity_chunk_size: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_CHUNK_SIZE", 256))
+    )
+    similarity_index_floor: float = field(
+        default_factory=lambda: float(os.getenv("SIMILARITY_INDEX_FLOOR", 0.8))
+    )
+    similarity_index_max_pending: int = field(
+        default_factory=lambda: int(os.getenv("SIMILARITY_INDEX_MAX_PENDING", 1000))
+    )
+    duplicate_lsh_min_threshold: float = field(
+        default_factory=lambda: float(os.getenv("DUPLICATE_LSH_MIN_THRESHOLD", 0.9))
+    )
+
+    # Embeddings (OpenAI-compatible endpoint) for semantic duplicate detection
+    embedding_model: str = field(
+        default_factory=lambda: os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    )
+    embedding_base_url: Optional[str] = field(
+        default_factory=lambda: (
+            os.getenv("EMBEDDING_BASE_URL") or os.getenv("OPENAI_BASE_URL")
+        )
+    )
+    embedding_api_key: Optional[str] = field(
+        default_factory=lambda: (
+            os.getenv("EMBEDDING_API_KEY") or os.getenv("OPENAI_API_KEY")
+        )
+    )
+    embedding_batch_size: int = field(
+        default_factory=lambda: int(os.getenv("EMBEDDING_BATCH_SIZE", 512))
+    )
+    embedding_ivf_min_records: int = field(
+        default_factory=lambda: int(os.getenv("EMBEDDING_IVF_MIN_RECORDS", 20000))
+    )
+    embedding_ivf_probes: int = field(
+        default_factory=lambda: int(os.getenv("EMBEDDING_IVF_PROBES", 8))
+    )
+    vectors_dir: str = field(
+        default_factory=lambda: os.getenv("VECTORS_DIR", "vectors")
+    )
+    duplicate_scorer: str = field(
+        default_factory=lambda: os.getenv("DUPLICATE_SCORER", "ratio")
+    )
+
+    # Bloom filter of the QA IDs, skipping exact duplicate lookups
+    qa_id_filter_enabled: bool = field(
+        default_factory=lambda: parse_bool_env("QA_ID_FILTER_ENABLED", True)
+    )
+    qa_id_filter_capacity: int = field(
+        default_factory=lambda: int(os.getenv("QA_ID_FILTER_CAPACITY", 1000000))
+    )
+    qa_id_filter_error_rate: float = field(
+        default_factory=lambda: float(os.getenv("QA_ID_FILTER_ERROR_RATE", 0.001))
+    )
+    qa_id_filter_path: str = field(
+        default_factory=lambda: os.getenv("QA_ID_FILTER_PATH", "")
+    )
 
     # Available LLMs
     available_models: List[str] = field(
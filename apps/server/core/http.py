@@ -0,0 +1,61 @@
+import asyncio
+import importlib.util
+import logging
+import weakref
+from typing import Optional
+
+import httpx
+
+from server.core.config import config
+
+
+def http2_available() -> bool:
+    """Whether the h2 package needed by httpx for HTTP/2 is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Builds an async client with the pool limits of the configuration"""
+    http2 = config.http2_enabled and http2_available()
+    if config.http2_enabled and not http2:
+        logging.warning("HTTP2_ENABLED is set but h2 is not installed, using HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive_connections,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+    # Connection errors are retried by the transport, HTTP status codes by callers
+    transport = httpx.AsyncHTTPTransport(
+        retries=config.max_retries, limits=limits, http2=http2
+    )
+    return httpx.AsyncClient(
+        transport=transport, timeout=config.timeout, follow_redirects=True
+    )
+
+
+# Connections belong to the event loop that opened them, so each loop gets its
+# own client; the application and its background jobs share the main loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared async client of the running event loop
+
+    Requests to the same host reuse its kept-alive connections, and
+    concurrent requests share the pool up to HTTP_MAX_CONNECTIONS.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = create_http_client()
+    return client
+
+
+async def close_http_client() -> None:
+    """Closes the shared client of the running event loop, if it was opened"""
+    client: Optional[httpx.AsyncClient] = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
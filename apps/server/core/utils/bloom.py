@@ -0,0 +1,88 @@
+import hashlib
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class BloomFilter:
+    """Set membership with false positives only, in about 1.2 bytes per item
+
+    ``key in bloom`` is False for keys never added; for other keys it is True,
+    except with probability ``error_rate`` while at most ``capacity`` keys
+    were added. Keys cannot be removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, keys: List[str]) -> np.ndarray:
+        """Returns the ``hash_count`` bit positions of each key, one row per key"""
+        # Double hashing: position i is h1 + i * h2, from one 128-bit digest
+        digests = np.frombuffer(
+            b"".join(
+                hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+                for key in keys
+            ),
+            dtype="<u8",
+        ).reshape(-1, 2)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            positions = digests[:, :1] + steps * (digests[:, 1:] | np.uint64(1))
+        return (positions % np.uint64(self.size)).astype(np.int64)
+
+    def update(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(
+            self._bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8)
+        )
+        self.count += len(keys)
+
+    def add(self, key: str) -> None:
+        self.update([key])
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions([key])[0]
+        return bool(np.all(self._bits[positions >> 3] & (1 << (positions & 7))))
+
+    @property
+    def is_full(self) -> bool:
+        """Whether more keys than ``capacity`` were added, raising the error rate"""
+        return self.count > self.capacity
+
+    def save(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Writes the filter and JSON-serializable ``metadata`` to a .npz file"""
+        header = {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "count": self.count,
+            "metadata": metadata or {},
+        }
+        with open(path, "wb") as file:
+            np.savez(file, bits=self._bits, header=np.array(json.dumps(header)))
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["BloomFilter", Dict[str, Any]]:
+        """Reads a filter written by save; returns it with its metadata"""
+        with np.load(path) as data:
+            header = json.loads(str(data["header"]))
+            bloom = cls(header["capacity"], header["error_rate"])
+            if data["bits"].shape != bloom._bits.shape:
+                raise ValueError(f"Corrupted Bloom filter file: {path}")
+            bloom._bits = data["bits"].copy()
+        bloom.count = header["count"]
+        return bloom, header["metadata"]
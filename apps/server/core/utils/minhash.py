@@ -0,0 +1,83 @@
+import hashlib
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Multiply-shift hashing keeps the high 32 bits of a 64-bit product
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases a text and collapses punctuation and whitespace"""
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+class MinHasher:
+    """MinHash signatures of character shingles, banded for LSH
+
+    Two texts share at least one of the ``bands`` bucket keys with a
+    probability that rises steeply around a Jaccard similarity of
+    ``(1 / bands) ** (1 / rows)`` (about 0.42 with the defaults), so bucket
+    collisions are the only pairs worth comparing exactly.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        generator = np.random.default_rng(seed)
+        # Odd multipliers make multiply-shift a universal hash family
+        self._a = generator.integers(1, 2**63, size=num_perm, dtype=np.uint64) | 1
+        self._b = generator.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> List[str]:
+        """Returns the character shingles of the normalized text"""
+        text = f" {normalize_text(text)} "
+        if len(text) <= self.shingle_size:
+            return [text]
+        return list(
+            {
+                text[i : i + self.shingle_size]
+                for i in range(len(text) - self.shingle_size + 1)
+            }
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """Returns the MinHash signature (``num_perm`` uint32 values) of a text"""
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) for shingle in self.shingles(text)],
+            dtype=np.uint64,
+        )
+        with np.errstate(over="ignore"):
+            permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> 32
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+    def bucket_keys(self, text: str) -> List[int]:
+        """Returns one signed 64-bit key per band; the band index is part of the key"""
+        signature = self.signature(text)
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(
+                band.to_bytes(2, "little")
+                + signature[band * self.rows : (band + 1) * self.rows].tobytes(),
+                digest_size=8,
+            ).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+
+minhasher = MinHasher()
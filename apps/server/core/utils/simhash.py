@@ -0,0 +1,66 @@
+import hashlib
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from server.core.utils.minhash import normalize_text
+
+# Bits of a SimHash; fingerprints are stored as signed 64-bit integers
+SIMHASH_BITS = 64
+
+# Largest Hamming distance between the SimHashes of near-duplicate texts.
+# 3 of 64 bits is the usual choice for web pages (Manku et al., 2007)
+SIMHASH_MAX_DISTANCE = 3
+
+# Up to this distance, or for texts with fewer distinct shingles than
+# SIMHASH_MIN_SHINGLES, the votes are too close to decide: repeated text ties
+# them, so a small edit can flip several bits. Such texts are compared in full
+SIMHASH_GRAY_ZONE_DISTANCE = 10
+SIMHASH_MIN_SHINGLES = 32
+
+
+def _word_shingles(text: str, size: int) -> List[str]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+
+
+def shingle_count(text: str, shingle_size: int = 3) -> int:
+    """Returns the number of distinct word shingles of a text"""
+    return len(set(_word_shingles(text, shingle_size)))
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """Returns the 64-bit SimHash of the word shingles of a text, signed
+
+    Each bit is the majority vote of the matching bit of the shingle hashes,
+    weighted by shingle counts, so texts sharing most of their shingles
+    differ in a few bits only.
+    """
+    counts = Counter(_word_shingles(text, shingle_size))
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            for shingle in counts
+        ],
+        dtype=np.uint64,
+    )
+    weights = np.array(list(counts.values()), dtype=np.int64)
+
+    # One row of bits per shingle, least significant bit first
+    bits = np.unpackbits(
+        hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )
+    votes = weights @ np.where(bits, 1, -1)
+    value = int(np.packbits(votes > 0, bitorder="little").view("<u8")[0])
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Returns the number of differing bits of two 64-bit fingerprints"""
+    return ((a ^ b) & ((1 << SIMHASH_BITS) - 1)).bit_count()
@@ -1,3 +1,11 @@
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+# Structural boundaries, from coarsest to finest: paragraphs, lines, sentences, words
+_BOUNDARY_PATTERNS = [r"\n\s*\n", r"\n", r"(?<=[.!?])\s+", r"\s+"]
+
+
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200):
     """Divise un texte en morceaux de taille fixe avec chevauchement."""
     chunks = []
@@ -8,3 +16,90 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200):
         chunks.append(text[start:end])
         start += chunk_size - overlap
     return chunks
+
+
+def _split_on_boundary(text: str, pattern: str) -> List[str]:
+    """Splits text on a boundary, keeping each separator with the preceding piece."""
+    parts = re.split(f"({pattern})", text)
+    pieces = []
+    for i in range(0, len(parts), 2):
+        piece = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+        if piece:
+            pieces.append(piece)
+    return pieces
+
+
+def _split_recursive(text: str, max_chars: int, level: int = 0) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_BOUNDARY_PATTERNS):
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pieces = []
+    for piece in _split_on_boundary(text, _BOUNDARY_PATTERNS[level]):
+        pieces.extend(_split_recursive(piece, max_chars, level + 1))
+    return pieces
+
+
+def split_text(text: str, max_chars: int = 8000) -> List[str]:
+    """Splits text into ordered chunks of at most max_chars characters.
+
+    Cuts happen on the coarsest structural boundary available (paragraphs, then
+    lines, sentences and words). Joining the chunks gives back the original text.
+    """
+    chunks: List[str] = []
+    current = ""
+    for piece in _split_recursive(text, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class RatioFilter:
+    """SequenceMatcher ratios computed only for pairs that can reach a threshold
+
+    Each pair goes through cheap upper bounds of the ratio first: the length
+    ratio (``real_quick_ratio``), then the shared character histogram
+    (``quick_ratio``). The full ratio only runs when both reach the
+    threshold, so the outcome is the same as comparing every ratio.
+    ``considered`` and ``pruned`` count the pairs seen and rejected by a bound.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.considered = 0
+        self.pruned = 0
+
+    @property
+    def prune_rate(self) -> float:
+        """Share of the pairs rejected without computing the full ratio"""
+        return self.pruned / self.considered if self.considered else 0.0
+
+    def skip(self, count: int) -> None:
+        """Records pairs rejected by the caller from their lengths alone"""
+        self.considered += count
+        self.pruned += count
+
+    def ratio(self, a: str, b: str) -> Optional[float]:
+        """Returns SequenceMatcher(None, a, b).ratio() if it reaches the threshold"""
+        self.considered += 1
+        length = len(a) + len(b)
+        if length == 0:
+            return 1.0 if 1.0 >= self.threshold else None
+
+        # Same formula as SequenceMatcher, so bounds and ratio compare exactly
+        if 2.0 * min(len(a), len(b)) / length < self.threshold:
+            self.pruned += 1
+            return None
+
+        matcher = SequenceMatcher(None, a, b)
+        if matcher.quick_ratio() < self.threshold:
+            self.pruned += 1
+            return None
+
+        similarity = matcher.ratio()
+        return similarity if similarity >= self.threshold else None
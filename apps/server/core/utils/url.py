@@ -1,3 +1,4 @@
+from typing import Any, List
 from urllib.parse import urljoin, urlparse
 
 
@@ -24,3 +25,26 @@ def build_api_url(base_url: str, endpoint: str) -> str:
     # Remove leading slash from endpoint if present to avoid double slashes
     clean_endpoint = endpoint.lstrip("/")
     return urljoin(clean_base, clean_endpoint)
+
+
+def extract_urls(urls_config: Any) -> List[str]:
+    """Collect the http(s) URLs of a hierarchical urls config (as in urls.json)
+
+    Nested dicts and lists are walked in order; duplicates are dropped while
+    keeping the first occurrence.
+    """
+    urls: List[str] = []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, str):
+            if urlparse(node).scheme in ("http", "https"):
+                urls.append(node)
+        elif isinstance(node, dict):
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, (list, tuple)):
+            for value in node:
+                walk(value)
+
+    walk(urls_config)
+    return list(dict.fromkeys(urls))
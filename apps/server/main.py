@@ -13,6 +13,10 @@ from server.api import dataset, generate, q_a, openai, owui
 from server.services import langfuse
 from server.migrations.utils.db_utils import upgrade_db
 from server.core.database import SQLALCHEMY_DATABASE_URL
+from server.core.http import close_http_client
+from server.pipelines.jobs import get_job_runner
+from server.services.embeddings import close_embedding_client
+from server.services.id_filter import save_qa_id_filters
 
 logger_module.setup_logging()
 logger = logging.getLogger(__name__)
@@ -30,8 +34,16 @@ async def lifespan(app: FastAPI):
         logger.exception("Migration failed: %s", exc)
         raise exc
 
+    job_runner = get_job_runner()
+    await job_runner.resume()
+
     yield
 
+    await job_runner.shutdown()
+    await close_http_client()
+    close_embedding_client()
+    save_qa_id_filters()
+
 
 app = FastAPI(
     title="Datasets Generator API",
@@ -0,0 +1,49 @@
+"""add pipeline checkpoints
+
+Revision ID: 3c9e5a7f1d20
+Revises: b7d41e09c2a5
+Create Date: 2026-10-18 13:41:09.226871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e5a7f1d20"
+down_revision: Union[str, Sequence[str], None] = "b7d41e09c2a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "pipeline_checkpoints",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("job_id", "url", "stage"),
+    )
+    op.create_index(
+        op.f("ix_pipeline_checkpoints_job_id"),
+        "pipeline_checkpoints",
+        ["job_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_pipeline_checkpoints_job_id"), table_name="pipeline_checkpoints"
+    )
+    op.drop_table("pipeline_checkpoints")
@@ -0,0 +1,35 @@
+"""add qa sources context fingerprint
+
+Revision ID: 4f1c8b2d7e90
+Revises: c3e8f2a1d694
+Create Date: 2026-10-18 21:17:43.502816
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f1c8b2d7e90"
+down_revision: Union[str, Sequence[str], None] = "c3e8f2a1d694"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep NULL fingerprints, computed from their context when
+    # they are compared
+    op.add_column("qa_sources", sa.Column("context_hash", sa.String(), nullable=True))
+    op.add_column(
+        "qa_sources", sa.Column("context_simhash", sa.BigInteger(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("qa_sources", "context_simhash")
+    op.drop_column("qa_sources", "context_hash")
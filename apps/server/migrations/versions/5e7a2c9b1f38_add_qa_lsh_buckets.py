@@ -0,0 +1,62 @@
+"""add qa lsh buckets
+
+Revision ID: 5e7a2c9b1f38
+Revises: d2b86c4f0e17
+Create Date: 2026-10-18 17:12:40.501263
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e7a2c9b1f38"
+down_revision: Union[str, Sequence[str], None] = "d2b86c4f0e17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing records are indexed on the first similarity analysis or
+    # cleaning of their dataset (QALshBucket.ensure_index)
+    op.create_table(
+        "qa_lsh_buckets",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("qa_source_id", sa.String(), nullable=False),
+        sa.Column("dataset_id", sa.String(), nullable=True),
+        sa.Column("bucket", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["qa_source_id"], ["qa_sources.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_qa_lsh_buckets_qa_source_id"),
+        "qa_lsh_buckets",
+        ["qa_source_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_qa_lsh_buckets_dataset_id"),
+        "qa_lsh_buckets",
+        ["dataset_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_qa_lsh_buckets_bucket_dataset_id",
+        "qa_lsh_buckets",
+        ["bucket", "dataset_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_qa_lsh_buckets_bucket_dataset_id", table_name="qa_lsh_buckets")
+    op.drop_index(op.f("ix_qa_lsh_buckets_dataset_id"), table_name="qa_lsh_buckets")
+    op.drop_index(op.f("ix_qa_lsh_buckets_qa_source_id"), table_name="qa_lsh_buckets")
+    op.drop_table("qa_lsh_buckets")
@@ -0,0 +1,31 @@
+"""add cleaned text chunk size
+
+Revision ID: 7d3a9c5e2b61
+Revises: 4f1c8b2d7e90
+Create Date: 2026-10-18 22:04:11.318270
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7d3a9c5e2b61"
+down_revision: Union[str, Sequence[str], None] = "4f1c8b2d7e90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep NULL: they were cleaned from the first 10000
+    # characters of the page only, and are never reused
+    op.add_column("cleaned_text", sa.Column("chunk_size", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("cleaned_text", "chunk_size")
@@ -0,0 +1,143 @@
+"""qa sources reference cleaned text
+
+Revision ID: 8a1f0d6e4b93
+Revises: 3c9e5a7f1d20
+Create Date: 2026-10-18 15:20:51.734402
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a1f0d6e4b93"
+down_revision: Union[str, Sequence[str], None] = "3c9e5a7f1d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in sync with server.models.dataset.CONTEXT_EXCERPT_LENGTH
+CONTEXT_EXCERPT_LENGTH = 1000
+BATCH_SIZE = 500
+
+
+qa_sources = sa.table(
+    "qa_sources",
+    sa.column("id", sa.String()),
+    sa.column("page_snapshot_id", sa.String()),
+    sa.column("input", sa.JSON()),
+    sa.column("cleaned_text_id", sa.String()),
+)
+
+cleaned_text = sa.table(
+    "cleaned_text",
+    sa.column("id", sa.String()),
+    sa.column("page_snapshot_id", sa.String()),
+    sa.column("content", sa.Text()),
+)
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("qa_sources") as batch_op:
+        batch_op.add_column(sa.Column("cleaned_text_id", sa.String(), nullable=True))
+        batch_op.create_index(
+            batch_op.f("ix_qa_sources_cleaned_text_id"),
+            ["cleaned_text_id"],
+            unique=False,
+        )
+        batch_op.create_foreign_key(
+            "fk_qa_sources_cleaned_text_id",
+            "cleaned_text",
+            ["cleaned_text_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+
+    # Point rows at the cleaned text their context was copied from, and keep
+    # only an excerpt of it. Rows without a matching cleaned text are left as is.
+    connection = op.get_bind()
+    qa_ids = [
+        row[0]
+        for row in connection.execute(
+            sa.select(qa_sources.c.id).where(qa_sources.c.page_snapshot_id.isnot(None))
+        )
+    ]
+    cleaned_texts_by_snapshot: dict = {}
+
+    for offset in range(0, len(qa_ids), BATCH_SIZE):
+        rows = connection.execute(
+            sa.select(
+                qa_sources.c.id, qa_sources.c.page_snapshot_id, qa_sources.c.input
+            ).where(qa_sources.c.id.in_(qa_ids[offset : offset + BATCH_SIZE]))
+        ).fetchall()
+
+        for qa_id, page_snapshot_id, qa_input in rows:
+            qa_input = dict(qa_input or {})
+            context = qa_input.get("context") or ""
+            if len(context) <= CONTEXT_EXCERPT_LENGTH:
+                continue
+
+            if page_snapshot_id not in cleaned_texts_by_snapshot:
+                cleaned_texts_by_snapshot[page_snapshot_id] = [
+                    (text_id, _normalize(content))
+                    for text_id, content in connection.execute(
+                        sa.select(cleaned_text.c.id, cleaned_text.c.content).where(
+                            cleaned_text.c.page_snapshot_id == page_snapshot_id
+                        )
+                    )
+                ]
+
+            normalized_context = _normalize(context)
+            cleaned_text_id = next(
+                (
+                    text_id
+                    for text_id, content in cleaned_texts_by_snapshot[page_snapshot_id]
+                    if content == normalized_context
+                ),
+                None,
+            )
+            if cleaned_text_id is None:
+                continue
+
+            excerpt = context[:CONTEXT_EXCERPT_LENGTH]
+            qa_input["context"] = excerpt
+            qa_input["context_span"] = [0, len(excerpt)]
+            connection.execute(
+                qa_sources.update()
+                .where(qa_sources.c.id == qa_id)
+                .values(input=qa_input, cleaned_text_id=cleaned_text_id)
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Put the full cleaned text back into the context of the rewritten rows
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(
+            qa_sources.c.id, qa_sources.c.input, cleaned_text.c.content
+        ).select_from(
+            qa_sources.join(
+                cleaned_text, qa_sources.c.cleaned_text_id == cleaned_text.c.id
+            )
+        )
+    ).fetchall()
+    for qa_id, qa_input, content in rows:
+        qa_input = dict(qa_input or {})
+        qa_input["context"] = content
+        qa_input.pop("context_span", None)
+        connection.execute(
+            qa_sources.update().where(qa_sources.c.id == qa_id).values(input=qa_input)
+        )
+
+    with op.batch_alter_table("qa_sources") as batch_op:
+        batch_op.drop_constraint("fk_qa_sources_cleaned_text_id", type_="foreignkey")
+        batch_op.drop_index(batch_op.f("ix_qa_sources_cleaned_text_id"))
+        batch_op.drop_column("cleaned_text_id")
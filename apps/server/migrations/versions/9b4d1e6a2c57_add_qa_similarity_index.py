@@ -0,0 +1,89 @@
+"""add qa similarity index
+
+Revision ID: 9b4d1e6a2c57
+Revises: 5e7a2c9b1f38
+Create Date: 2026-10-18 19:05:13.284519
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9b4d1e6a2c57"
+down_revision: Union[str, Sequence[str], None] = "5e7a2c9b1f38"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing datasets are indexed by their next similarity analysis
+    op.create_table(
+        "qa_similarity_pairs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("dataset_id", sa.String(), nullable=False),
+        sa.Column("record1_id", sa.String(), nullable=False),
+        sa.Column("record2_id", sa.String(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["record1_id"], ["qa_sources.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["record2_id"], ["qa_sources.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_qa_similarity_pairs_dataset_id_score",
+        "qa_similarity_pairs",
+        ["dataset_id", "score"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_qa_similarity_pairs_record1_id"),
+        "qa_similarity_pairs",
+        ["record1_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_qa_similarity_pairs_record2_id"),
+        "qa_similarity_pairs",
+        ["record2_id"],
+        unique=False,
+    )
+    op.create_table(
+        "qa_similarity_fingerprints",
+        sa.Column("qa_source_id", sa.String(), nullable=False),
+        sa.Column("dataset_id", sa.String(), nullable=False),
+        sa.Column("fingerprint", sa.BigInteger(), nullable=False),
+        sa.Column("floor", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["qa_source_id"], ["qa_sources.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("qa_source_id"),
+    )
+    op.create_index(
+        op.f("ix_qa_similarity_fingerprints_dataset_id"),
+        "qa_similarity_fingerprints",
+        ["dataset_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_qa_similarity_fingerprints_dataset_id"),
+        table_name="qa_similarity_fingerprints",
+    )
+    op.drop_table("qa_similarity_fingerprints")
+    op.drop_index(
+        op.f("ix_qa_similarity_pairs_record2_id"), table_name="qa_similarity_pairs"
+    )
+    op.drop_index(
+        op.f("ix_qa_similarity_pairs_record1_id"), table_name="qa_similarity_pairs"
+    )
+    op.drop_index(
+        "ix_qa_similarity_pairs_dataset_id_score", table_name="qa_similarity_pairs"
+    )
+    op.drop_table("qa_similarity_pairs")
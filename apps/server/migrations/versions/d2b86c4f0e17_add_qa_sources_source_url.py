@@ -0,0 +1,48 @@
+"""add qa sources source url
+
+Revision ID: d2b86c4f0e17
+Revises: 8a1f0d6e4b93
+Create Date: 2026-10-18 16:05:12.918354
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2b86c4f0e17"
+down_revision: Union[str, Sequence[str], None] = "8a1f0d6e4b93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+qa_sources = sa.table(
+    "qa_sources",
+    sa.column("input", sa.JSON()),
+    sa.column("source_url", sa.String()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("qa_sources", sa.Column("source_url", sa.String(), nullable=True))
+
+    # Backfill from the JSON input before indexing
+    op.execute(
+        qa_sources.update().values(
+            source_url=qa_sources.c.input["source_url"].as_string()
+        )
+    )
+
+    op.create_index(
+        op.f("ix_qa_sources_source_url"), "qa_sources", ["source_url"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_qa_sources_source_url"), table_name="qa_sources")
+    op.drop_column("qa_sources", "source_url")
@@ -0,0 +1,61 @@
+"""add page snapshot content hash
+
+Revision ID: fea06c963acb
+Revises: f5fd665ddf39
+Create Date: 2026-10-18 09:12:44.318207
+
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fea06c963acb"
+down_revision: Union[str, Sequence[str], None] = "f5fd665ddf39"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+page_snapshots = sa.table(
+    "page_snapshots",
+    sa.column("id", sa.String()),
+    sa.column("content", sa.Text()),
+    sa.column("content_hash", sa.String()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "page_snapshots", sa.Column("content_hash", sa.String(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_page_snapshots_content_hash"),
+        "page_snapshots",
+        ["content_hash"],
+        unique=False,
+    )
+
+    # Backfill hashes so existing snapshots can be matched for cleaned text reuse
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(page_snapshots.c.id, page_snapshots.c.content)
+    ).fetchall()
+    for snapshot_id, content in rows:
+        connection.execute(
+            page_snapshots.update()
+            .where(page_snapshots.c.id == snapshot_id)
+            .values(
+                content_hash=hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+            )
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_page_snapshots_content_hash"), table_name="page_snapshots")
+    op.drop_column("page_snapshots", "content_hash")
@@ -1,12 +1,40 @@
 import uuid
 import hashlib
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Boolean
+from itertools import combinations, groupby
+from typing import Optional, Dict, Any, Iterable, List, Set, Tuple, Union
+from sqlalchemy import (
+    Column,
+    String,
+    DateTime,
+    JSON,
+    ForeignKey,
+    Boolean,
+    Integer,
+    BigInteger,
+    Float,
+    Index,
+    insert,
+    or_,
+)
 from sqlalchemy.orm import Session, relationship
-from difflib import SequenceMatcher
 
+from server.core.config import config
 from server.core.database import Base
+from server.core.utils.minhash import minhasher
+from server.core.utils.simhash import (
+    SIMHASH_GRAY_ZONE_DISTANCE,
+    SIMHASH_MAX_DISTANCE,
+    SIMHASH_MIN_SHINGLES,
+    hamming_distance,
+    shingle_count,
+    simhash,
+)
+from server.core.utils.text import RatioFilter
+from server.models.scraper import CleanedText
+
+# Characters of the cleaned page kept on a QA row when it references its CleanedText
+CONTEXT_EXCERPT_LENGTH = 1000
 
 
 class Dataset(Base):
@@ -29,6 +57,8 @@ class QASource(Base):
     id = Column(String, primary_key=True)
     dataset_name = Column(String, index=True)
     dataset_id = Column(String, ForeignKey("datasets.id"), index=True)
+    # Denormalized from input["source_url"] so duplicate lookups can use an index
+    source_url = Column(String, index=True)
     source_trace_id = Column(String)
     page_snapshot_id = Column(String, ForeignKey("page_snapshots.id"))
     input = Column(JSON, nullable=False, default=dict)
@@ -39,6 +69,15 @@ class QASource(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     human_reviewed = Column(Boolean, default=False)
+    cleaned_text_id = Column(
+        String, ForeignKey("cleaned_text.id", ondelete="SET NULL"), index=True
+    )
+    # Fingerprint of the full context, to compare contexts without loading them
+    context_hash = Column(String)
+    context_simhash = Column(BigInteger)
+
+    # Relations
+    cleaned_text = relationship("CleanedText")
 
     @staticmethod
     def compute_hash_from_content(
@@ -50,47 +89,196 @@ class QASource(Base):
         content = f"{question_normalized}|{context_normalized}|{source_url}"
         return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
+    @staticmethod
+    def compute_context_fingerprint(context: str) -> Tuple[str, int]:
+        """Returns the hash of the normalized context and its SimHash"""
+        context_normalized = " ".join((context or "").strip().split())
+        return (
+            hashlib.sha256(context_normalized.encode("utf-8")).hexdigest(),
+            simhash(context_normalized),
+        )
+
+    @staticmethod
+    def build_context_excerpt(
+        context: str, excerpt: Optional[str] = None
+    ) -> Tuple[str, Optional[List[int]]]:
+        """Returns the excerpt of the cleaned page stored on a QA row and its span
+
+        The excerpt is the passage the QA was generated from when available,
+        otherwise the beginning of the page. The span locates it in the page.
+        """
+        if excerpt:
+            excerpt = excerpt[:CONTEXT_EXCERPT_LENGTH]
+            start = context.find(excerpt)
+            if start >= 0:
+                return excerpt, [start, start + len(excerpt)]
+            return excerpt, None
+
+        excerpt = context[:CONTEXT_EXCERPT_LENGTH]
+        return excerpt, [0, len(excerpt)]
+
     @classmethod
-    def is_duplicate_by_similarity(
+    def _get_full_context(
+        cls,
+        db: Session,
+        cleaned_text_id: Optional[str],
+        context: Optional[str],
+        cleaned_texts: Dict[str, str],
+    ) -> str:
+        """Returns the full page context of a record, loading referenced texts once"""
+        if not cleaned_text_id:
+            return context or ""
+
+        if cleaned_text_id not in cleaned_texts:
+            content = (
+                db.query(CleanedText.content)
+                .filter(CleanedText.id == cleaned_text_id)
+                .scalar()
+            )
+            cleaned_texts[cleaned_text_id] = content or ""
+        return cleaned_texts[cleaned_text_id]
+
+    @classmethod
+    def _load_similarity_candidates(
+        cls, db: Session, source_url: str, bucket_keys: Optional[Set[int]] = None
+    ) -> List[Tuple[Any, ...]]:
+        """Loads (id, question, context, cleaned_text_id, context_hash,
+        context_simhash) of records for a URL
+
+        With ``bucket_keys``, only the records colliding with one of these LSH
+        buckets are loaded, plus the ones not indexed yet.
+        """
+        # Only load the columns needed for records with the same source URL,
+        # through the source_url index
+        query = db.query(
+            cls.id,
+            cls.input["question"].as_string(),
+            cls.input["context"].as_string(),
+            cls.cleaned_text_id,
+            cls.context_hash,
+            cls.context_simhash,
+        ).filter(cls.source_url == source_url)
+
+        if bucket_keys is not None:
+            query = query.filter(
+                or_(
+                    cls.id.in_(
+                        db.query(QALshBucket.qa_source_id).filter(
+                            QALshBucket.bucket.in_(bucket_keys)
+                        )
+                    ),
+                    ~db.query(QALshBucket.id)
+                    .filter(QALshBucket.qa_source_id == cls.id)
+                    .exists(),
+                )
+            )
+
+        return [tuple(row) for row in query.all()]
+
+    @classmethod
+    def _find_similar(
         cls,
         db: Session,
         question: str,
         context: str,
-        source_url: str,
-        threshold: float = 0.9,
-    ) -> Optional[str]:
-        # Retrieve all records and filter in Python
-        # This avoids issues with the .astext operator in some SQLAlchemy versions
-        all_records = db.query(cls).all()
-
-        # Manually filter records with the same source URL
-        similar_records = []
-        for record in all_records:
-            record_source_url = record.input.get("source_url", "")
-            if record_source_url == source_url:
-                similar_records.append(record)
-
-        # Check question similarity
-        for record in similar_records:
-            existing_question = record.input.get("question", "")
-            existing_context = record.input.get("context", "")
-
+        fingerprint: Tuple[str, int],
+        candidates: List[Tuple[Any, ...]],
+        threshold: float,
+        cleaned_texts: Dict[str, str],
+        context_matches: Dict[Any, bool],
+        scorer: Optional[Any] = None,
+    ) -> Optional[Tuple[str, float]]:
+        """Returns the ID and question similarity of the first similar candidate
+
+        Contexts match when their hashes are equal or their SimHashes are at
+        most SIMHASH_MAX_DISTANCE bits apart. In the gray zone up to
+        SIMHASH_GRAY_ZONE_DISTANCE bits, or when ``context`` has too few
+        shingles for its SimHash to be reliable, they match when their
+        SequenceMatcher ratio is at least 0.95. ``cleaned_texts`` and
+        ``context_matches`` are caches shared across calls for the same
+        context, so each distinct context is compared once.
+        ``scorer`` compares the questions instead of SequenceMatcher.
+        """
+        # Bounds skip the pairs that cannot reach the thresholds
+        question_filter = (
+            scorer.filter(threshold) if scorer is not None else RatioFilter(threshold)
+        )
+        context_filter = RatioFilter(0.95)
+        context_hash, context_simhash = fingerprint
+        few_shingles: Optional[bool] = None
+
+        for (
+            record_id,
+            existing_question,
+            existing_context,
+            record_cleaned_text_id,
+            existing_hash,
+            existing_simhash,
+        ) in candidates:
             # Calculate question similarity
-            question_similarity = SequenceMatcher(
-                None, question, existing_question
-            ).ratio()
-
-            # Optional: also check context similarity
-            context_similarity = SequenceMatcher(
-                None, context, existing_context
-            ).ratio()
+            question_similarity = question_filter.ratio(
+                question, existing_question or ""
+            )
+            if question_similarity is None:
+                continue
+
+            # Also check the context, once per distinct context
+            context_key = record_cleaned_text_id or ("record", record_id)
+            if context_key not in context_matches:
+                if existing_hash is None:
+                    # Records stored before fingerprints were computed
+                    existing_hash, existing_simhash = cls.compute_context_fingerprint(
+                        cls._get_full_context(
+                            db, record_cleaned_text_id, existing_context, cleaned_texts
+                        )
+                    )
+                distance = hamming_distance(existing_simhash, context_simhash)
+                if existing_hash == context_hash or distance <= SIMHASH_MAX_DISTANCE:
+                    context_matches[context_key] = True
+                else:
+                    if few_shingles is None:
+                        few_shingles = shingle_count(context) < SIMHASH_MIN_SHINGLES
+                    context_matches[context_key] = (
+                        distance <= SIMHASH_GRAY_ZONE_DISTANCE or few_shingles
+                    ) and context_filter.ratio(
+                        context,
+                        cls._get_full_context(
+                            db, record_cleaned_text_id, existing_context, cleaned_texts
+                        ),
+                    ) is not None
 
             # If the question is very similar AND the context is identical or very similar
-            if question_similarity >= threshold and context_similarity >= 0.95:
-                return record.id
+            if context_matches[context_key]:
+                return record_id, question_similarity
 
         return None
 
+    @classmethod
+    def is_duplicate_by_similarity(
+        cls,
+        db: Session,
+        question: str,
+        context: str,
+        source_url: str,
+        threshold: float = 0.9,
+        cleaned_text_id: Optional[str] = None,
+    ) -> Optional[str]:
+        context_matches: Dict[Any, bool] = {}
+        if cleaned_text_id:
+            context_matches[cleaned_text_id] = True
+
+        similar = cls._find_similar(
+            db,
+            question,
+            context,
+            cls.compute_context_fingerprint(context),
+            cls._load_similarity_candidates(db, source_url),
+            threshold,
+            {},
+            context_matches,
+        )
+        return similar[0] if similar else None
+
     @classmethod
     def check_for_duplicates(
         cls,
@@ -100,42 +288,134 @@ class QASource(Base):
         context: str,
         source_url: str,
         similarity_threshold: float = 0.9,
+        cleaned_text_id: Optional[str] = None,
+        scorer: Optional[Any] = None,
+        id_filter: Optional[Any] = None,
     ) -> Dict[str, Optional[str] | float]:
         """Checks for duplicates by exact hash AND similarity"""
+        return cls.check_for_duplicates_batch(
+            db,
+            [(question, answer)],
+            context,
+            source_url,
+            similarity_threshold,
+            cleaned_text_id,
+            scorer,
+            id_filter,
+        )[0]
 
-        # 1. Check by exact hash
-        exact_hash = cls.compute_hash_from_content(
-            question, answer, context, source_url
-        )
-        exact_duplicate = db.query(cls).filter(cls.id == exact_hash).first()
-
-        if exact_duplicate:
-            return {
-                "type": "exact",
-                "duplicate_id": exact_duplicate.id,
-                "similarity_score": 1.0,
-            }
-
-        # 2. Check by similarity
-        similar_id = cls.is_duplicate_by_similarity(
-            db, question, context, source_url, similarity_threshold
+    @classmethod
+    def check_for_duplicates_batch(
+        cls,
+        db: Session,
+        qa_pairs: List[Tuple[str, str]],
+        context: str,
+        source_url: str,
+        similarity_threshold: float = 0.9,
+        cleaned_text_id: Optional[str] = None,
+        scorer: Optional[Any] = None,
+        id_filter: Optional[Any] = None,
+    ) -> List[Dict[str, Optional[str] | float]]:
+        """Checks (question, answer) pairs generated from one context for duplicates
+
+        Runs one query for exact hashes and one for similarity candidates,
+        whatever the number of pairs. Candidates are the records of the URL
+        sharing an LSH bucket with one of the questions, or all of them below
+        DUPLICATE_LSH_MIN_THRESHOLD, where the buckets miss too many pairs.
+        Pairs are also checked against the earlier pairs of the batch, which
+        count as already stored.
+
+        With a ``scorer`` (services.embeddings.EmbeddingScorer), questions are
+        compared by embeddings: all the records of the URL are candidates, as
+        paraphrases rarely share LSH buckets, and their questions are embedded
+        in one go.
+
+        With an ``id_filter`` (services.id_filter.QAIdFilter), only the hashes
+        it may contain are looked up, usually none.
+        """
+        # 1. Check by exact hash, for the whole batch at once
+        hashes = [
+            cls.compute_hash_from_content(question, answer, context, source_url)
+            for question, answer in qa_pairs
+        ]
+        lookup = set(hashes)
+        if id_filter is not None and lookup:
+            lookup = id_filter.possibly_existing(db, lookup)
+        existing_ids = (
+            {row[0] for row in db.query(cls.id).filter(cls.id.in_(lookup))}
+            if lookup
+            else set()
         )
 
-        if similar_id:
-            # Calculate similarity score for information
-            similar_record = db.query(cls).filter(cls.id == similar_id).first()
-            existing_question = similar_record.input.get("question", "")
-            similarity_score = SequenceMatcher(
-                None, question, existing_question
-            ).ratio()
-
-            return {
-                "type": "similar",
-                "duplicate_id": similar_id,
-                "similarity_score": similarity_score,
-            }
-
-        return {"type": "new", "duplicate_id": None, "similarity_score": 0.0}
+        candidates = None
+        fingerprint = cls.compute_context_fingerprint(context)
+        cleaned_texts: Dict[str, str] = {}
+        context_matches: Dict[Any, bool] = {}
+        if cleaned_text_id:
+            context_matches[cleaned_text_id] = True
+
+        results: List[Dict[str, Optional[str] | float]] = []
+        for (question, _answer), qa_hash in zip(qa_pairs, hashes):
+            if qa_hash in existing_ids:
+                results.append(
+                    {"type": "exact", "duplicate_id": qa_hash, "similarity_score": 1.0}
+                )
+                continue
+
+            # 2. Check by similarity, loading the candidates only once
+            if candidates is None and scorer is not None:
+                candidates = cls._load_similarity_candidates(db, source_url)
+                scorer.prepare(
+                    [question for question, _answer in qa_pairs]
+                    + [candidate[1] or "" for candidate in candidates]
+                )
+            elif (
+                candidates is None
+                and similarity_threshold < config.duplicate_lsh_min_threshold
+            ):
+                candidates = cls._load_similarity_candidates(db, source_url)
+            elif candidates is None:
+                bucket_keys = {
+                    key
+                    for question, _answer in qa_pairs
+                    for key in minhasher.bucket_keys(question)
+                }
+                candidates = cls._load_similarity_candidates(
+                    db, source_url, bucket_keys
+                )
+            similar = cls._find_similar(
+                db,
+                question,
+                context,
+                fingerprint,
+                candidates,
+                similarity_threshold,
+                cleaned_texts,
+                context_matches,
+                scorer,
+            )
+            if similar:
+                results.append(
+                    {
+                        "type": "similar",
+                        "duplicate_id": similar[0],
+                        "similarity_score": similar[1],
+                    }
+                )
+                continue
+
+            # New pair: later pairs of the batch are checked against it too
+            existing_ids.add(qa_hash)
+            candidates.append(
+                (qa_hash, question, context, cleaned_text_id, *fingerprint)
+            )
+            if not cleaned_text_id:
+                context_matches[("record", qa_hash)] = True
+            results.append(
+                {"type": "new", "duplicate_id": None, "similarity_score": 0.0}
+            )
+
+        return results
 
     @classmethod
     def from_qa_generation(
@@ -149,21 +429,39 @@ class QASource(Base):
         page_snapshot_id: Optional[str] = None,
         dataset_id: Optional[str] = None,  # Added dataset_id parameter
         index: int = 0,
+        cleaned_text_id: Optional[str] = None,
+        excerpt: Optional[str] = None,
     ) -> "QASource":
+        """Builds a QA row; ``context`` is the full text the QA was generated from
+
+        When ``cleaned_text_id`` references that text, only an excerpt and its
+        span are stored on the row instead of the whole page.
+        """
         if not question or not answer:
             raise ValueError("Question and answer are required")
 
         # Generate ID based on content
         qa_id = cls.compute_hash_from_content(question, answer, context, source_url)
+        context_hash, context_simhash = cls.compute_context_fingerprint(context)
+
+        qa_input: Dict[str, Any] = {
+            "question": question,
+            "context": context,
+            "source_url": source_url,
+            "index": index,
+        }
+        if cleaned_text_id:
+            qa_input["context"], qa_input["context_span"] = cls.build_context_excerpt(
+                context, excerpt
+            )
 
         return cls(
             id=qa_id,
-            input={
-                "question": question,
-                "context": context,
-                "source_url": source_url,
-                "index": index,
-            },
+            input=qa_input,
+            source_url=source_url,
+            cleaned_text_id=cleaned_text_id,
+            context_hash=context_hash,
+            context_simhash=context_simhash,
             expected_output={"answer": answer, "confidence": float(confidence)},
             source_trace_id=source_trace_id,
             page_snapshot_id=page_snapshot_id,
@@ -189,14 +487,9 @@ class QASource(Base):
 
     @property
     def context(self) -> str:
-        """Get context from input JSON"""
+        """Get context (an excerpt when cleaned_text_id is set) from input JSON"""
         return self.input.get("context", "")
 
-    @property
-    def source_url(self) -> str:
-        """Get source_url from input JSON"""
-        return self.input.get("source_url", "")
-
     @property
     def confidence(self) -> float:
         """Get confidence from expected_output JSON"""
@@ -213,3 +506,157 @@ class QASource(Base):
             item["metadata"] = self.qa_metadata
 
         return item
+
+
+class QALshBucket(Base):
+    """MinHash LSH bucket of a QA question, one row per band
+
+    Questions sharing a bucket are near-duplicate candidates; only those pairs
+    are compared exactly. Records are indexed when they are saved, or lazily
+    by ``ensure_index`` for the ones created before the index existed.
+    """
+
+    __tablename__ = "qa_lsh_buckets"
+    __table_args__ = (
+        Index("ix_qa_lsh_buckets_bucket_dataset_id", "bucket", "dataset_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    qa_source_id = Column(
+        String,
+        ForeignKey("qa_sources.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    dataset_id = Column(String, index=True)
+    bucket = Column(BigInteger, nullable=False)
+
+    # Rows inserted per statement when indexing many records
+    BATCH_SIZE = 500
+
+    @classmethod
+    def add_records(
+        cls, db: Session, records: Iterable[Tuple[str, Optional[str], str]]
+    ) -> int:
+        """Indexes (qa_source_id, dataset_id, question) records; does not commit"""
+        rows = []
+        count = 0
+        for qa_source_id, dataset_id, question in records:
+            count += 1
+            rows.extend(
+                {"qa_source_id": qa_source_id, "dataset_id": dataset_id, "bucket": key}
+                for key in minhasher.bucket_keys(question or "")
+            )
+            if len(rows) >= cls.BATCH_SIZE * minhasher.bands:
+                db.execute(insert(cls), rows)
+                rows = []
+        if rows:
+            db.execute(insert(cls), rows)
+        return count
+
+    @classmethod
+    def remove_records(cls, db: Session, qa_source_ids: Iterable[str]) -> None:
+        """Removes records from the index; does not commit"""
+        qa_source_ids = list(qa_source_ids)
+        for offset in range(0, len(qa_source_ids), cls.BATCH_SIZE):
+            db.query(cls).filter(
+                cls.qa_source_id.in_(qa_source_ids[offset : offset + cls.BATCH_SIZE])
+            ).delete(synchronize_session=False)
+
+    @classmethod
+    def ensure_index(cls, db: Session, dataset_ids: Union[str, Iterable[str]]) -> int:
+        """Indexes the records of one or more datasets missing from the index"""
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
+        missing = (
+            db.query(
+                QASource.id, QASource.dataset_id, QASource.input["question"].as_string()
+            )
+            .filter(
+                QASource.dataset_id.in_(list(dataset_ids)),
+                ~db.query(cls.id).filter(cls.qa_source_id == QASource.id).exists(),
+            )
+            .all()
+        )
+        if not missing:
+            return 0
+
+        count = cls.add_records(db, (tuple(row) for row in missing))
+        db.commit()
+        return count
+
+    @classmethod
+    def candidate_pairs(
+        cls, db: Session, dataset_ids: Union[str, Iterable[str]]
+    ) -> Set[Tuple[str, str]]:
+        """Returns the pairs of record IDs sharing at least one bucket
+
+        With several datasets, bucket keys are shared across them, so records
+        of different datasets are paired as well.
+        """
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
+        rows = (
+            db.query(cls.bucket, cls.qa_source_id)
+            .filter(cls.dataset_id.in_(list(dataset_ids)))
+            .order_by(cls.bucket)
+        )
+        pairs: Set[Tuple[str, str]] = set()
+        for _bucket, members in groupby(rows, key=lambda row: row[0]):
+            ids = sorted({qa_source_id for _, qa_source_id in members})
+            pairs.update(combinations(ids, 2))
+        return pairs
+
+
+class QASimilarityPair(Base):
+    """Pair of QA records of a dataset whose questions are similar
+
+    Only pairs scoring at least the floor of the similarity index are stored,
+    with their SequenceMatcher ratio, once per pair.
+    """
+
+    __tablename__ = "qa_similarity_pairs"
+    __table_args__ = (
+        Index("ix_qa_similarity_pairs_dataset_id_score", "dataset_id", "score"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dataset_id = Column(String, nullable=False)
+    record1_id = Column(
+        String,
+        ForeignKey("qa_sources.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    record2_id = Column(
+        String,
+        ForeignKey("qa_sources.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    score = Column(Float, nullable=False)
+
+
+class QASimilarityFingerprint(Base):
+    """Question fingerprint of a QA record whose pairs are in the similarity index
+
+    A record without a fingerprint, or whose question or floor changed since,
+    has to be compared again.
+    """
+
+    __tablename__ = "qa_similarity_fingerprints"
+
+    qa_source_id = Column(
+        String, ForeignKey("qa_sources.id", ondelete="CASCADE"), primary_key=True
+    )
+    dataset_id = Column(String, nullable=False, index=True)
+    fingerprint = Column(BigInteger, nullable=False)
+    floor = Column(Float, nullable=False)
+
+    @staticmethod
+    def compute(question: str) -> int:
+        """Returns the fingerprint of a question, as a signed 64-bit integer"""
+        digest = hashlib.blake2b(
+            (question or "").encode("utf-8"), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "little", signed=True)
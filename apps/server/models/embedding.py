@@ -0,0 +1,22 @@
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary
+
+from server.core.database import Base
+
+
+class Embedding(Base):
+    """Embedding of a text by a model, cached by the hash of the text"""
+
+    __tablename__ = "embeddings"
+
+    model = Column(String, primary_key=True)
+    text_hash = Column(String, primary_key=True)
+    dimensions = Column(Integer, nullable=False)
+    # float32 values, native byte order
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    @staticmethod
+    def compute_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,98 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import (
+    Column,
+    String,
+    DateTime,
+    JSON,
+    Integer,
+    Float,
+    ForeignKey,
+    UniqueConstraint,
+)
+
+from server.core.database import Base
+
+
+class JobStatus:
+    """Job statuses, matching the ones reported by DatasetResult"""
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    SUCCESS = "success"
+    ERROR = "error"
+
+    ACTIVE = (PENDING, PROCESSING)
+    FINISHED = (SUCCESS, ERROR)
+
+
+class JobKind:
+    GENERATE = "generate"
+    GENERATE_BATCH = "generate_batch"
+    ANALYZE_SIMILARITIES = "analyze_similarities"
+    CLEAN_SIMILARITIES = "clean_similarities"
+    GLOBAL_DUPLICATES = "global_duplicates"
+
+    # Lists of a job result served page by page, the first one by default.
+    # The similarity lists can be very long and are left out of the job status.
+    RESULT_LISTS = {
+        GENERATE: ("qa_pairs",),
+        GENERATE_BATCH: ("results",),
+        ANALYZE_SIMILARITIES: ("similarities",),
+        CLEAN_SIMILARITIES: ("removed_items", "details"),
+        GLOBAL_DUPLICATES: ("clusters",),
+    }
+    PAGED_ONLY = (ANALYZE_SIMILARITIES, CLEAN_SIMILARITIES, GLOBAL_DUPLICATES)
+
+
+class PipelineStage:
+    """Stages of DatasetPipeline.process_url, in execution order"""
+
+    SCRAPE = "scrape"
+    CLEAN = "clean"
+    QA = "qa"
+    PERSIST = "persist"
+
+
+class Job(Base):
+    """A dataset generation run executed in the background"""
+
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=JobStatus.PENDING, index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    urls_total = Column(Integer, nullable=False, default=0)
+    urls_processed = Column(Integer, nullable=False, default=0)
+    qa_pairs_generated = Column(Integer, nullable=False, default=0)
+    progress = Column(Float, nullable=False, default=0.0)
+    errors = Column(JSON, nullable=False, default=list)
+    result = Column(JSON, nullable=True)
+    duration = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    @property
+    def rate(self) -> float:
+        """QA generation rate (QA/s)"""
+        if not self.duration:
+            return 0.0
+        return self.qa_pairs_generated / self.duration
+
+
+class PipelineCheckpoint(Base):
+    """Output of a completed pipeline stage for one URL of a job"""
+
+    __tablename__ = "pipeline_checkpoints"
+    __table_args__ = (UniqueConstraint("job_id", "url", "stage"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_id = Column(
+        String, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    url = Column(String, nullable=False)
+    stage = Column(String, nullable=False)
+    data = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
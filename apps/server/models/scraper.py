@@ -1,5 +1,6 @@
+import hashlib
 import uuid
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey
 from sqlalchemy.orm import relationship
 
 from server.core.database import Base
@@ -14,6 +15,7 @@ class PageSnapshot(Base):
     retrieved_at = Column(DateTime, nullable=False)
     content = Column(Text, nullable=False)
     url_hash = Column(String, nullable=False, index=True)
+    content_hash = Column(String, nullable=True, index=True)
     dataset_id = Column(
         String, ForeignKey("datasets.id", ondelete="CASCADE"), nullable=True
     )
@@ -26,10 +28,12 @@ class PageSnapshot(Base):
 
     @staticmethod
     def compute_hash_from_url(url: str) -> str:
-        import hashlib
-
         return hashlib.sha256(url.encode()).hexdigest()
 
+    @staticmethod
+    def compute_hash_from_content(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 
 class CleanedText(Base):
     __tablename__ = "cleaned_text"
@@ -41,6 +45,9 @@ class CleanedText(Base):
     content = Column(Text, nullable=False)
     language = Column(String, nullable=False)
     model = Column(String, nullable=False)
+    # CLEANING_CHUNK_SIZE the page was cleaned with; NULL for the texts cleaned
+    # from the beginning of the page only, before pages were split in chunks
+    chunk_size = Column(Integer, nullable=True)
 
     # Relations
     page_snapshot = relationship("PageSnapshot", back_populates="cleaned_texts")
@@ -1,23 +1,36 @@
+import asyncio
 import logging
-from typing import Any, Dict, Optional, Union
-from sqlalchemy.orm import Session
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+from sqlalchemy.orm import Session, sessionmaker
 
+from server.models.job import PipelineStage
+from server.models.scraper import PageSnapshot
 from server.services.scraper import ScraperService
 from server.services.llm import LLMService
 from server.services.dataset import DatasetService
 from server.services.qa import QAService
-from server.schemas.dataset import TargetLanguage
+from server.services.job import JobService
+from server.schemas.dataset import QA, TargetLanguage
+from server.schemas.scraper import ScrapingMetrics
+from server.core.config import config
 
 
 class DatasetPipeline:
-    """Pipeline to process a URL and generate a QA dataset"""
+    """Pipeline to process a URL and generate a QA dataset
 
-    def __init__(self, db: Session):
+    LLM and HTTP calls are awaited on the event loop, while blocking database
+    work is pushed to a worker thread so concurrent requests are not stalled.
+    When run for a job, each stage records a checkpoint so a retried or
+    resumed job continues after the last completed stage.
+    """
+
+    def __init__(self, db: Session, llm_service: Optional[LLMService] = None):
         self.db = db
         self.scraper_service = ScraperService(db)
-        self.llm_service = LLMService()
+        self.llm_service = llm_service or LLMService()
         self.dataset_service = DatasetService(db)
         self.qa_service = QAService(db)
+        self.job_service = JobService(db)
 
     async def process_url(
         self,
@@ -27,6 +40,8 @@ class DatasetPipeline:
         target_language: Union[str, TargetLanguage],
         model_qa: Union[str, Any],
         similarity_threshold: Optional[Union[float, str]] = None,
+        use_cache: bool = True,
+        job_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Executes the complete pipeline for a URL"""
         # Normalize similarity_threshold: accept float or numeric string
@@ -82,60 +97,261 @@ class DatasetPipeline:
             )
 
             # 1. Get or create the dataset
-            dataset = self.dataset_service.get_or_create_dataset(
+            dataset = await asyncio.to_thread(
+                self.dataset_service.get_or_create_dataset,
                 name=dataset_name,
                 description=f"Dataset automatically created for {url}",
             )
 
-            # 2. Scrape the URL
+            checkpoints: Dict[str, Dict[str, Any]] = {}
+            if job_id is not None:
+                checkpoints = await asyncio.to_thread(
+                    self.job_service.get_checkpoints, job_id, url
+                )
+
+            # 2. Scrape the URL, unless a previous attempt already did
             assert dataset.id is not None
             assert isinstance(dataset.id, str)
-            page_snapshot = self.scraper_service.scrape_url(url, dataset.id)
+            page_snapshot = None
+            if PipelineStage.SCRAPE in checkpoints:
+                page_snapshot = await asyncio.to_thread(
+                    self.scraper_service.get_page_snapshot,
+                    checkpoints[PipelineStage.SCRAPE]["page_snapshot_id"],
+                )
+            if page_snapshot is None:
+                checkpoints.clear()
+                page_snapshot = await self.scraper_service.scrape_url(url, dataset.id)
+                await self._checkpoint(
+                    job_id,
+                    url,
+                    PipelineStage.SCRAPE,
+                    {"page_snapshot_id": page_snapshot.id},
+                )
+            else:
+                logging.info(f"Resuming {url} from its scrape checkpoint")
 
-            # 3. Clean the text with LLM
+            # 3. Reuse the cleaned text of an identical snapshot, or clean with LLM
             assert page_snapshot.content is not None
             assert isinstance(page_snapshot.content, str)
-            cleaned_text = self.llm_service.clean_text(
-                page_snapshot.content, model_cleaning_str
-            )
-
-            # 4. Save the cleaned text
             assert page_snapshot.id is not None
             assert isinstance(page_snapshot.id, str)
-            self.scraper_service.save_cleaned_text(
-                page_snapshot_id=page_snapshot.id,
-                content=cleaned_text,
-                language=target_language_str,
-                model=model_cleaning_str,
-            )
+            cleaned_text_record = None
+            if PipelineStage.CLEAN in checkpoints:
+                cleaned_text_record = await asyncio.to_thread(
+                    self.scraper_service.get_cleaned_text,
+                    checkpoints[PipelineStage.CLEAN]["cleaned_text_id"],
+                )
+
+            if cleaned_text_record is not None:
+                cleaned_text = str(cleaned_text_record.content)
+                cleaned_text_reused = bool(
+                    checkpoints[PipelineStage.CLEAN].get("cleaned_text_reused")
+                )
+            else:
+                for stage in (PipelineStage.QA, PipelineStage.PERSIST):
+                    checkpoints.pop(stage, None)
+
+                existing_cleaned_text = None
+                if use_cache:
+                    existing_cleaned_text = await asyncio.to_thread(
+                        self.scraper_service.find_cleaned_text,
+                        PageSnapshot.compute_hash_from_content(page_snapshot.content),
+                        model_cleaning_str,
+                    )
+
+                cleaned_text_reused = existing_cleaned_text is not None
+                if existing_cleaned_text is not None:
+                    cleaned_text_record = existing_cleaned_text
+                    cleaned_text = str(existing_cleaned_text.content)
+                    logging.info(
+                        f"Reusing cleaned text {existing_cleaned_text.id} for {url}, "
+                        "skipping cleaning"
+                    )
+                else:
+                    cleaned_text = await self.llm_service.clean_text(
+                        page_snapshot.content, model_cleaning_str, use_cache=use_cache
+                    )
+
+                    # 4. Save the cleaned text
+                    cleaned_text_record = await asyncio.to_thread(
+                        self.scraper_service.save_cleaned_text,
+                        page_snapshot_id=page_snapshot.id,
+                        content=cleaned_text,
+                        language=target_language_str,
+                        model=model_cleaning_str,
+                    )
+
+                await self._checkpoint(
+                    job_id,
+                    url,
+                    PipelineStage.CLEAN,
+                    {
+                        "cleaned_text_id": getattr(cleaned_text_record, "id", None),
+                        "cleaned_text_reused": cleaned_text_reused,
+                    },
+                )
 
             # 5. Generate QA pairs
-            qa_list = self.llm_service.generate_qa(
-                cleaned_text, target_language_str, model_qa_str
-            )
+            if PipelineStage.QA in checkpoints:
+                qa_list = [
+                    QA.model_construct(**item)
+                    for item in checkpoints[PipelineStage.QA]["qa_pairs"]
+                ]
+            else:
+                checkpoints.pop(PipelineStage.PERSIST, None)
+                qa_list = await self.llm_service.generate_qa(
+                    cleaned_text,
+                    target_language_str,
+                    model_qa_str,
+                    use_cache=use_cache,
+                    similarity_threshold=similarity_threshold,
+                )
+                if job_id is not None:
+                    await self._checkpoint(
+                        job_id,
+                        url,
+                        PipelineStage.QA,
+                        {"qa_pairs": [self._qa_to_dict(qa) for qa in qa_list]},
+                    )
 
             # 6. Process and save QA pairs
-            assert dataset.id is not None
-            assert isinstance(dataset.id, str)
-            qa_stats = self.qa_service.process_qa_pairs(
-                qa_list=qa_list,
-                cleaned_text=cleaned_text,
-                url=url,
-                page_snapshot_id=page_snapshot.id,
-                dataset_name=dataset_name,
-                model=model_qa_str,
-                dataset_id=dataset.id,
-                similarity_threshold=similarity_threshold,
-            )
+            if PipelineStage.PERSIST in checkpoints:
+                qa_stats = checkpoints[PipelineStage.PERSIST]
+            else:
+                qa_stats = await asyncio.to_thread(
+                    self.qa_service.process_qa_pairs,
+                    qa_list=qa_list,
+                    cleaned_text=cleaned_text,
+                    url=url,
+                    page_snapshot_id=page_snapshot.id,
+                    dataset_name=dataset_name,
+                    model=model_qa_str,
+                    dataset_id=dataset.id,
+                    similarity_threshold=similarity_threshold,
+                    cleaned_text_id=getattr(cleaned_text_record, "id", None),
+                )
+                await self._checkpoint(job_id, url, PipelineStage.PERSIST, qa_stats)
 
             # 7. Return results
             return {
                 "qa_pairs": qa_list,
                 **qa_stats,
                 "similarity_threshold": similarity_threshold,
+                "cleaned_text_reused": cleaned_text_reused,
                 "dataset_id": dataset.id,  # Explicitly add the dataset ID to the result
             }
 
         except Exception as e:
             logging.error(f"Error in dataset pipeline: {str(e)}")
             raise e
+
+    async def _checkpoint(
+        self, job_id: Optional[str], url: str, stage: str, data: Dict[str, Any]
+    ) -> None:
+        """Records a completed stage when running for a job"""
+        if job_id is None:
+            return
+        await asyncio.to_thread(
+            self.job_service.save_checkpoint, job_id, url, stage, data
+        )
+
+    @staticmethod
+    def _qa_to_dict(qa: Any) -> Dict[str, Any]:
+        if hasattr(qa, "model_dump"):
+            return qa.model_dump()
+        return {
+            "question": qa.question,
+            "answer": qa.answer,
+            "context": getattr(qa, "context", ""),
+            "confidence": getattr(qa, "confidence", None),
+        }
+
+    async def process_urls(
+        self,
+        urls: Iterable[str],
+        dataset_name: str,
+        model_cleaning: Union[str, Any],
+        target_language: Union[str, TargetLanguage],
+        model_qa: Union[str, Any],
+        similarity_threshold: Optional[Union[float, str]] = None,
+        use_cache: bool = True,
+        concurrency: Optional[int] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        on_progress: Optional[Callable[[ScrapingMetrics], Awaitable[None]]] = None,
+        job_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Executes the pipeline for several URLs concurrently
+
+        At most ``concurrency`` URLs run at once, each in its own database
+        session and sharing this pipeline's LLM service (and so its completion
+        limit). A failing URL is recorded in the metrics without aborting the
+        others. ``on_progress`` is awaited with the metrics after each URL.
+        """
+        urls = list(dict.fromkeys(urls))
+        if session_factory is None:
+            session_factory = sessionmaker(
+                bind=self.db.get_bind(),
+                autocommit=False,
+                autoflush=False,
+                expire_on_commit=False,
+            )
+        semaphore = asyncio.Semaphore(max(1, concurrency or config.batch_concurrency))
+        metrics = ScrapingMetrics()
+        metrics.start_timer()
+
+        # Create the dataset upfront so concurrent URLs don't race to create it
+        dataset = await asyncio.to_thread(
+            self.dataset_service.get_or_create_dataset,
+            name=dataset_name,
+            description=f"Dataset automatically created for a batch of {len(urls)} URLs",
+        )
+
+        async def process_one(url: str) -> Dict[str, Any]:
+            async with semaphore:
+                db = session_factory()
+                try:
+                    pipeline = DatasetPipeline(db, llm_service=self.llm_service)
+                    result = await pipeline.process_url(
+                        url=url,
+                        dataset_name=dataset_name,
+                        model_cleaning=model_cleaning,
+                        target_language=target_language,
+                        model_qa=model_qa,
+                        similarity_threshold=similarity_threshold,
+                        use_cache=use_cache,
+                        job_id=job_id,
+                    )
+                except Exception as e:
+                    logging.error(f"Error processing {url} in batch: {str(e)}")
+                    metrics.add_error(f"{url}: {str(e)}")
+                    if on_progress is not None:
+                        await on_progress(metrics)
+                    return {"url": url, "status": "error", "error": str(e)}
+                finally:
+                    await asyncio.to_thread(db.close)
+
+                metrics.urls_processed += 1
+                metrics.qa_pairs_generated += result.get("total", 0)
+                if on_progress is not None:
+                    await on_progress(metrics)
+                return {
+                    "url": url,
+                    "status": "success",
+                    "total_questions": result.get("total", 0),
+                    "exact_duplicates": result.get("exact_duplicates", 0),
+                    "similar_duplicates": result.get("similar_duplicates", 0),
+                    "cleaned_text_reused": result.get("cleaned_text_reused", False),
+                }
+
+        results = await asyncio.gather(*(process_one(url) for url in urls))
+
+        metrics.stop_timer()
+        metrics.calculate_rate()
+        logging.info(metrics.get_summary())
+
+        return {
+            "dataset_id": dataset.id,
+            "dataset_name": dataset_name,
+            "metrics": metrics,
+            "results": list(results),
+        }
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Set
+from sqlalchemy.orm import Session
+
+from server.core.config import config
+from server.core.database import SessionLocal
+from server.models.job import JobKind
+from server.pipelines.dataset import DatasetPipeline
+from server.schemas.scraper import ScrapingMetrics
+from server.services.dataset import (
+    analyze_dataset_similarities,
+    clean_dataset_similarities,
+    find_global_duplicates,
+)
+from server.services.job import JobService
+from server.services.similarity import SimilarityMethod
+
+# Minimum seconds between two progress updates of a similarity job
+SIMILARITY_PROGRESS_INTERVAL = 1.0
+
+
+class JobRunner:
+    """In-process worker pool executing the jobs stored in the database
+
+    Jobs are persisted before being submitted, so the ones still pending or
+    interrupted by a restart are picked up again by ``resume``; the pipeline
+    checkpoints of the job let them continue after their last completed stage.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_workers: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self._semaphore = asyncio.Semaphore(max(1, max_workers or config.job_workers))
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, job_id: str) -> asyncio.Task:
+        """Schedules a job on the worker pool"""
+        task = asyncio.create_task(self.run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def resume(self) -> int:
+        """Re-submits jobs left pending or processing, e.g. after a restart"""
+        db = self.session_factory()
+        try:
+            jobs = await asyncio.to_thread(JobService(db).list_active_jobs)
+            job_ids = [job.id for job in jobs]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+        if job_ids:
+            logging.info(f"Resumed {len(job_ids)} background job(s)")
+        return len(job_ids)
+
+    async def shutdown(self) -> None:
+        """Cancels running jobs; they stay active in the database and resume later"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run(self, job_id: str) -> None:
+        """Executes a job and records its outcome"""
+        async with self._semaphore:
+            db = self.session_factory()
+            job_service = JobService(db)
+            try:
+                job = await asyncio.to_thread(job_service.start_job, job_id)
+                if job is None:
+                    logging.warning(f"Job {job_id} not found or already finished")
+                    return
+
+                kind = job.kind
+                payload = dict(job.payload or {})
+                if kind == JobKind.GENERATE:
+                    await self._run_generate(db, job_service, job_id, payload)
+                elif kind == JobKind.GENERATE_BATCH:
+                    await self._run_generate_batch(db, job_service, job_id, payload)
+                elif kind in (
+                    JobKind.ANALYZE_SIMILARITIES,
+                    JobKind.CLEAN_SIMILARITIES,
+                    JobKind.GLOBAL_DUPLICATES,
+                ):
+                    await self._run_similarity(db, job_service, job_id, kind, payload)
+                else:
+                    raise ValueError(f"Unknown job kind: {kind}")
+
+            except asyncio.CancelledError:
+                logging.info(f"Job {job_id} interrupted, it will resume on restart")
+                raise
+            except Exception as e:
+                # Drop the partial work of the job before recording its failure
+                await asyncio.to_thread(db.rollback)
+                await asyncio.to_thread(job_service.fail_job, job_id, str(e))
+            finally:
+                db.close()
+
+    async def _run_generate(
+        self,
+        db: Session,
+        job_service: JobService,
+        job_id: str,
+        payload: Dict[str, Any],
+    ) -> None:
+        pipeline = DatasetPipeline(db)
+        result = await pipeline.process_url(
+            url=payload["url"],
+            dataset_name=payload["dataset_name"],
+            model_cleaning=payload["model_cleaning"],
+            target_language=payload["target_language"],
+            model_qa=payload["model_qa"],
+            similarity_threshold=payload.get("similarity_threshold"),
+            use_cache=payload.get("use_cache", True),
+            job_id=job_id,
+        )
+
+        qa_pairs = [
+            {"question": qa.question, "answer": qa.answer}
+            if hasattr(qa, "question")
+            else {"question": qa.get("question", ""), "answer": qa.get("answer", "")}
+            for qa in result.get("qa_pairs", [])
+        ]
+        await asyncio.to_thread(
+            job_service.complete_job,
+            job_id,
+            result={
+                "dataset_id": result.get("dataset_id"),
+                "dataset_name": payload["dataset_name"],
+                "qa_pairs": qa_pairs,
+                "total": result.get("total", 0),
+                "exact_duplicates": result.get("exact_duplicates", 0),
+                "similar_duplicates": result.get("similar_duplicates", 0),
+                "cleaned_text_reused": result.get("cleaned_text_reused", False),
+            },
+            urls_processed=1,
+            qa_pairs_generated=result.get("total", 0),
+        )
+
+    async def _run_generate_batch(
+        self,
+        db: Session,
+        job_service: JobService,
+        job_id: str,
+        payload: Dict[str, Any],
+    ) -> None:
+        # Progress updates come from concurrent URLs but share one session
+        lock = asyncio.Lock()
+
+        async def on_progress(metrics: ScrapingMetrics) -> None:
+            try:
+                async with lock:
+                    await asyncio.to_thread(
+                        job_service.update_progress,
+                        job_id,
+                        metrics.urls_processed,
+                        metrics.qa_pairs_generated,
+                        metrics.errors,
+                    )
+            except Exception as e:
+                logging.warning(f"Failed to record progress of job {job_id}: {e}")
+
+        pipeline = DatasetPipeline(db)
+        result = await pipeline.process_urls(
+            urls=payload["urls"],
+            dataset_name=payload["dataset_name"],
+            model_cleaning=payload["model_cleaning"],
+            target_language=payload["target_language"],
+            model_qa=payload["model_qa"],
+            similarity_threshold=payload.get("similarity_threshold"),
+            use_cache=payload.get("use_cache", True),
+            concurrency=payload.get("concurrency"),
+            on_progress=on_progress,
+            job_id=job_id,
+        )
+
+        metrics: ScrapingMetrics = result["metrics"]
+        async with lock:
+            await asyncio.to_thread(
+                job_service.complete_job,
+                job_id,
+                result={
+                    "dataset_id": result["dataset_id"],
+                    "dataset_name": payload["dataset_name"],
+                    "results": result["results"],
+                },
+                urls_processed=metrics.urls_processed,
+                qa_pairs_generated=metrics.qa_pairs_generated,
+                errors=metrics.errors,
+            )
+
+    async def _run_similarity(
+        self,
+        db: Session,
+        job_service: JobService,
+        job_id: str,
+        kind: str,
+        payload: Dict[str, Any],
+    ) -> None:
+        if kind == JobKind.GLOBAL_DUPLICATES:
+            run = find_global_duplicates
+            args = (
+                payload.get("dataset_ids"),
+                payload["threshold"],
+                payload.get("cross_dataset_only", False),
+                payload.get("workers"),
+            )
+        else:
+            # Background analyses also store the records missing from the index
+            run = (
+                partial(analyze_dataset_similarities, update_index=True)
+                if kind == JobKind.ANALYZE_SIMILARITIES
+                else partial(
+                    clean_dataset_similarities, dry_run=payload.get("dry_run", False)
+                )
+            )
+            args = (
+                payload["dataset_id"],
+                payload["threshold"],
+                payload.get("method", SimilarityMethod.AUTO),
+                payload.get("workers"),
+            )
+        last_update = time.monotonic()
+
+        def on_progress(progress: float) -> None:
+            nonlocal last_update
+            now = time.monotonic()
+            if now - last_update < SIMILARITY_PROGRESS_INTERVAL:
+                return
+            last_update = now
+            # The session of the job holds the uncommitted work of the analysis
+            progress_db = self.session_factory()
+            try:
+                JobService(progress_db).set_progress(job_id, progress)
+            except Exception as e:
+                logging.warning(f"Failed to record progress of job {job_id}: {e}")
+            finally:
+                progress_db.close()
+
+        # The comparisons are CPU bound; they run in a thread, with the session
+        # of the job, so the event loop keeps serving requests
+        result = await asyncio.to_thread(run, db, *args, on_progress)
+        await asyncio.to_thread(
+            job_service.complete_job,
+            job_id,
+            result=result,
+            urls_processed=0,
+            qa_pairs_generated=0,
+        )
+
+
+_job_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    """Returns the process-wide job runner"""
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner()
+    return _job_runner
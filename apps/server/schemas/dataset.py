@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from enum import Enum
 from server.core.config import config
 
@@ -26,13 +26,41 @@ class DatasetResult(BaseModel):
     """Task Result of a scraping task"""
 
     task_id: str = Field(..., description="Unique ID of the task")
-    status: str = Field(..., description="Status: success, error, processing")
+    kind: Optional[str] = Field(
+        None,
+        description="Kind: generate, generate_batch, analyze_similarities, "
+        "clean_similarities",
+    )
+    status: str = Field(..., description="Status: pending, processing, success, error")
+    urls_total: int = Field(0, description="Number of URLs to process")
     urls_processed: int = Field(0, description="Number of URLs processed")
+    progress: float = Field(0.0, description="Progress of the task (0.0-1.0)")
     qa_pairs_generated: int = Field(0, description="Number of QA pairs generated")
     files_generated: List[str] = Field([], description="Paths of generated files")
     errors: List[str] = Field([], description="Potential errors")
     duration: float = Field(0.0, description="Duration of the task in seconds")
     rate: float = Field(0.0, description="QA generation rate (QA/s)")
+    eta: Optional[float] = Field(
+        None, description="Estimated seconds left while the task is processing"
+    )
+    result: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Result once the task succeeded; the lists of similarity "
+        "tasks are paged by GET /dataset/jobs/{task_id}/results",
+    )
+    created_at: Optional[str] = None
+
+
+class JobResultPage(BaseModel):
+    """Page of a list of the result of a task"""
+
+    task_id: str = Field(..., description="Unique ID of the task")
+    kind: Optional[str] = Field(None, description="Kind of the task")
+    field: str = Field(..., description="Key of the list in the task result")
+    total: int = Field(..., description="Number of items in the list")
+    offset: int = Field(..., description="Index of the first item of the page")
+    limit: int = Field(..., description="Maximum number of items per page")
+    items: List[Any] = Field([], description="Items of the page")
 
 
 class QA(BaseModel):
@@ -90,6 +118,9 @@ class SimilarityAnalysisResponse(BaseModel):
     total_records: int
     similar_pairs_found: int
     similarities: List[SimilarityPair]
+    pairs_considered: int = 0
+    pairs_pruned: int = 0
+    prune_rate: float = 0.0
 
 
 class CleanSimilarityPair(BaseModel):
@@ -113,10 +144,49 @@ class CleanSimilarityResponse(BaseModel):
     threshold: float
     total_records: int
     removed_records: int
+    dry_run: bool = False
     details: List[CleanSimilarityPair]
     removed_items: List[RemovedRecord]
 
 
+class GlobalDuplicateRecord(BaseModel):
+    id: str
+    dataset_id: str
+    dataset_name: str
+    question: str
+
+
+class GlobalDuplicateCluster(BaseModel):
+    size: int
+    similarity: float = Field(..., description="Highest score of the cluster pairs")
+    dataset_ids: List[str] = Field(..., description="Datasets of the records")
+    records: List[GlobalDuplicateRecord]
+
+
+class GlobalDuplicateDataset(BaseModel):
+    id: str
+    name: str
+    total_records: int
+    clustered_records: int = Field(
+        ..., description="Records of the dataset belonging to a cluster"
+    )
+
+
+class GlobalDuplicatesResponse(BaseModel):
+    threshold: float
+    cross_dataset_only: bool
+    total_records: int
+    datasets: List[GlobalDuplicateDataset]
+    clusters_found: int
+    cross_dataset_clusters: int
+    duplicate_records: int = Field(
+        ..., description="Records left out if one record per cluster were kept"
+    )
+    clusters: List[GlobalDuplicateCluster]
+    pairs_considered: int = 0
+    pairs_pruned: int = 0
+
+
 class DeleteDatasetResponse(BaseModel):
     message: str
     dataset_id: str
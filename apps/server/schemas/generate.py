@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, HttpUrl, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, HttpUrl, ConfigDict, model_validator
+from typing import Any, Dict, List, Optional
 
 
 class QAPair(BaseModel):
@@ -27,6 +27,16 @@ class DatasetGenerationRequest(BaseModel):
         le=1.0,
         description="Similarity threshold to detect duplicates (0.0-1.0)",
     )
+    use_cache: bool = Field(
+        default=True,
+        description="Reuse cached LLM responses and previously cleaned texts; "
+        "set to false to force fresh completions",
+    )
+    background: bool = Field(
+        default=False,
+        description="Run the generation as a background job and return 202 with "
+        "its task id instead of waiting for the result",
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -37,6 +47,7 @@ class DatasetGenerationRequest(BaseModel):
                 "target_language": "en",
                 "model_qa": "gpt-4",
                 "similarity_threshold": 0.9,
+                "use_cache": True,
             }
         }
     )
@@ -56,6 +67,11 @@ class DatasetGenerationResponse(BaseModel):
     similarity_threshold: float = Field(..., description="Similarity threshold used")
     total_questions: int = Field(..., description="Total number of generated questions")
     processing_time: float = Field(..., description="Processing time in seconds")
+    cleaned_text_reused: bool = Field(
+        False,
+        description="Whether the cleaned text of an identical snapshot was reused "
+        "instead of calling the cleaning model",
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -74,6 +90,147 @@ class DatasetGenerationResponse(BaseModel):
                 "similarity_threshold": 0.9,
                 "total_questions": 50,
                 "processing_time": 45.2,
+                "cleaned_text_reused": False,
+            }
+        }
+    )
+
+
+class DatasetBatchGenerationRequest(BaseModel):
+    """Model for batch dataset generation request"""
+
+    urls: Optional[List[HttpUrl]] = Field(None, description="List of URLs to process")
+    urls_config: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Configuration of URLs with hierarchical structure "
+        "(ScrapingTask format, as in urls.json)",
+    )
+    dataset_name: str = Field(..., description="Name of the dataset to create")
+    model_cleaning: Optional[str] = Field(
+        None, description="Model to use for text cleaning"
+    )
+    target_language: Optional[str] = Field(
+        None, description="Target language for QA generation"
+    )
+    model_qa: Optional[str] = Field(None, description="Model to use for QA generation")
+    similarity_threshold: float = Field(
+        default=0.9,
+        ge=0.0,
+        le=1.0,
+        description="Similarity threshold to detect duplicates (0.0-1.0)",
+    )
+    use_cache: bool = Field(
+        default=True,
+        description="Reuse cached LLM responses and previously cleaned texts; "
+        "set to false to force fresh completions",
+    )
+    background: bool = Field(
+        default=False,
+        description="Run the generation as a background job and return 202 with "
+        "its task id instead of waiting for the result",
+    )
+    concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        le=32,
+        description="Number of URLs processed in parallel (default: BATCH_CONCURRENCY)",
+    )
+
+    @model_validator(mode="after")
+    def check_urls_provided(self):
+        if not self.urls and not self.urls_config:
+            raise ValueError("Either 'urls' or 'urls_config' must be provided")
+        return self
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "urls": [
+                    "https://example.com/page-1",
+                    "https://example.com/page-2",
+                ],
+                "dataset_name": "my_dataset",
+                "model_cleaning": "gpt-3.5-turbo",
+                "target_language": "en",
+                "model_qa": "gpt-4",
+                "similarity_threshold": 0.9,
+                "use_cache": True,
+                "concurrency": 4,
+            }
+        }
+    )
+
+
+class UrlGenerationResult(BaseModel):
+    """Outcome of one URL of a batch generation"""
+
+    url: str = Field(..., description="Processed URL")
+    status: str = Field(..., description="'success' or 'error'")
+    total_questions: int = Field(0, description="Number of generated questions")
+    exact_duplicates: int = Field(0, description="Number of exact duplicates")
+    similar_duplicates: int = Field(0, description="Number of similar duplicates")
+    cleaned_text_reused: bool = Field(
+        False,
+        description="Whether the cleaned text of an identical snapshot was reused",
+    )
+    error: Optional[str] = Field(None, description="Error message if processing failed")
+
+
+class DatasetBatchGenerationResponse(BaseModel):
+    """Model for batch dataset generation response, with aggregated metrics"""
+
+    id: str = Field(..., description="ID of the dataset")
+    dataset_name: str = Field(..., description="Name of the dataset")
+    model_cleaning: str = Field(..., description="Model used for text cleaning")
+    target_language: str = Field(..., description="Target language used")
+    model_qa: str = Field(..., description="Model used for QA generation")
+    similarity_threshold: float = Field(..., description="Similarity threshold used")
+    urls_total: int = Field(..., description="Number of distinct URLs submitted")
+    urls_processed: int = Field(
+        ..., description="Number of URLs processed successfully"
+    )
+    qa_pairs_generated: int = Field(
+        ..., description="Total number of generated questions"
+    )
+    errors: List[str] = Field(default_factory=list, description="Per-URL errors")
+    processing_time: float = Field(..., description="Processing time in seconds")
+    rate: float = Field(..., description="Generation rate in QA pairs per second")
+    results: List[UrlGenerationResult] = Field(
+        default_factory=list, description="Outcome of each URL"
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "id": "123e4567-e89b-12d3-a456-426614174000",
+                "dataset_name": "my_dataset",
+                "model_cleaning": "gpt-3.5-turbo",
+                "target_language": "en",
+                "model_qa": "gpt-4",
+                "similarity_threshold": 0.9,
+                "urls_total": 2,
+                "urls_processed": 1,
+                "qa_pairs_generated": 25,
+                "errors": [
+                    "2024-01-01T12:00:00: https://example.com/page-2: 404 Not Found"
+                ],
+                "processing_time": 42.1,
+                "rate": 0.59,
+                "results": [
+                    {
+                        "url": "https://example.com/page-1",
+                        "status": "success",
+                        "total_questions": 25,
+                        "exact_duplicates": 0,
+                        "similar_duplicates": 1,
+                        "cleaned_text_reused": False,
+                    },
+                    {
+                        "url": "https://example.com/page-2",
+                        "status": "error",
+                        "error": "404 Not Found",
+                    },
+                ],
             }
         }
     )
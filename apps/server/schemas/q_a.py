@@ -9,7 +9,13 @@ class QAItem(BaseModel):
     id: str = Field(..., description="Unique ID of the question-answer")
     question: str = Field(..., description="Question")
     answer: str = Field(..., description="Answer")
-    context: str = Field(..., description="Source context")
+    context: str = Field(..., description="Source context (excerpt of the page)")
+    context_span: Optional[List[int]] = Field(
+        None, description="Start and end offsets of the excerpt in the cleaned text"
+    )
+    cleaned_text_id: Optional[str] = Field(
+        None, description="ID of the cleaned text the context comes from"
+    )
     source_url: Optional[str] = Field(None, description="Source URL")
     confidence: float = Field(0.0, ge=0.0, le=1.0, description="Confidence level")
     created_at: datetime = Field(..., description="Creation date")
@@ -43,7 +49,13 @@ class QAResponse(BaseModel):
     id: str = Field(..., description="Unique ID of the question-answer")
     question: str = Field(..., description="Question")
     answer: str = Field(..., description="Answer")
-    context: str = Field(..., description="Source context")
+    context: str = Field(..., description="Source context (excerpt of the page)")
+    context_span: Optional[List[int]] = Field(
+        None, description="Start and end offsets of the excerpt in the cleaned text"
+    )
+    cleaned_text_id: Optional[str] = Field(
+        None, description="ID of the cleaned text the context comes from"
+    )
     source_url: Optional[str] = Field(None, description="Source URL")
     confidence: float = Field(0.0, ge=0.0, le=1.0, description="Confidence level")
     created_at: datetime = Field(..., description="Creation date")
@@ -88,6 +88,6 @@ Scraping Summary:
 
     def calculate_rate(self):
         if self.duration > 0:
-            self.rate = self.urls_processed / self.duration
+            self.rate = self.qa_pairs_generated / self.duration
         else:
             self.rate = 0.0
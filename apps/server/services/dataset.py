@@ -1,8 +1,99 @@
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+
+import numpy as np
 from sqlalchemy.orm import Session
-from difflib import SequenceMatcher
-from server.models.dataset import Dataset, QASource
+from server.models.dataset import Dataset, QASource, QALshBucket
+from server.services.similarity import (
+    LshSimilarityEngine,
+    ProgressCallback,
+    SimilarityIndex,
+    SimilarityMethod,
+    cluster_similar_pairs,
+    get_similarity_engine,
+)
+
+# Records removed per DELETE statement when cleaning a dataset
+DELETE_BATCH_SIZE = 500
+
+# Rows fetched per round trip when loading the questions of a dataset
+LOAD_BATCH_SIZE = 1000
+
+# Similar pairs found but not yet read from a stream
+STREAM_QUEUE_SIZE = 1000
+
+
+class DatasetQuestions:
+    """Columns of a dataset needed to compare its questions, one array each
+
+    Only the ID, question, confidence and creation date are read, streamed in
+    batches, so the contexts, answers and metadata of the rows never load.
+    """
+
+    __slots__ = ("ids", "questions", "confidences", "created_at")
+
+    def __init__(
+        self,
+        ids: List[str],
+        questions: List[str],
+        confidences: np.ndarray,
+        created_at: np.ndarray,
+    ):
+        self.ids = ids
+        self.questions = questions
+        self.confidences = confidences
+        self.created_at = created_at
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, db: Session, dataset_id: str) -> "DatasetQuestions":
+        """Loads the questions of a dataset, oldest first
+
+        Pairs are scored with the older record first, as SequenceMatcher
+        ratios are not symmetric.
+        """
+        ids: List[str] = []
+        questions: List[str] = []
+        confidences: List[float] = []
+        created_at: List[Any] = []
+
+        rows = (
+            db.query(
+                QASource.id,
+                QASource.input["question"].as_string(),
+                QASource.expected_output["confidence"].as_float(),
+                QASource.created_at,
+            )
+            .filter(QASource.dataset_id == dataset_id)
+            .order_by(QASource.created_at, QASource.id)
+            .yield_per(LOAD_BATCH_SIZE)
+        )
+        for record_id, question, confidence, created in rows:
+            ids.append(record_id)
+            questions.append(question or "")
+            confidences.append(confidence or 0.0)
+            created_at.append(created)
+
+        return cls(
+            ids,
+            questions,
+            np.array(confidences, dtype=np.float64),
+            np.array(created_at, dtype="datetime64[us]"),
+        )
+
+    def keeper_sort_key(self, index: int) -> Tuple[Any, ...]:
+        """Orders records: highest confidence, then oldest, then ID"""
+        created = self.created_at[index]
+        return (
+            -self.confidences[index],
+            bool(np.isnat(created)),
+            created if not np.isnat(created) else np.datetime64(0, "us"),
+            self.ids[index],
+        )
 
 
 class DatasetService:
@@ -82,52 +173,90 @@ def get_dataset_by_id(db: Session, dataset_id: str) -> Optional[Dict[str, Any]]:
         raise
 
 
-def analyze_dataset_similarities(
-    db: Session, dataset_id: str, threshold: float = 0.8
-) -> Dict[str, Any]:
-    """Analyzes similar questions in a dataset"""
-    try:
-        # Check if dataset exists
-        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
-        if not dataset:
-            available_datasets = [d.id for d in db.query(Dataset.id).distinct().all()]
-            raise ValueError(
-                f"Dataset '{dataset_id}' not found. Available datasets: {available_datasets}"
-            )
+def _get_dataset(db: Session, dataset_id: str) -> Dataset:
+    """Returns a dataset, or raises ValueError listing the available ones"""
+    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    if not dataset:
+        available_datasets = [d.id for d in db.query(Dataset.id).distinct().all()]
+        raise ValueError(
+            f"Dataset '{dataset_id}' not found. Available datasets: {available_datasets}"
+        )
+    return dataset
 
-        # Get all records for the dataset
-        records = db.query(QASource).filter(QASource.dataset_id == dataset.id).all()
 
-        similarities = []
-        processed_pairs = set()
+def _truncate(question: str) -> str:
+    return question[:100] + "..." if len(question) > 100 else question
 
-        for i, record1 in enumerate(records):
-            for j, record2 in enumerate(records[i + 1 :], i + 1):
-                pair_key = tuple(sorted([record1.id, record2.id]))
-                if pair_key in processed_pairs:
-                    continue
 
-                question1 = record1.input.get("question", "") if record1.input else ""
-                question2 = record2.input.get("question", "") if record2.input else ""
+def _similarity_item(
+    records: DatasetQuestions, i: int, j: int, similarity: float
+) -> Dict[str, Any]:
+    return {
+        "record1_id": records.ids[i][:8],
+        "record2_id": records.ids[j][:8],
+        "similarity": round(similarity, 3),
+        "question1": _truncate(records.questions[i]),
+        "question2": _truncate(records.questions[j]),
+    }
 
-                similarity = SequenceMatcher(None, question1, question2).ratio()
 
-                if similarity >= threshold:
-                    similarities.append(
-                        {
-                            "record1_id": record1.id[:8],
-                            "record2_id": record2.id[:8],
-                            "similarity": round(similarity, 3),
-                            "question1": question1[:100] + "..."
-                            if len(question1) > 100
-                            else question1,
-                            "question2": question2[:100] + "..."
-                            if len(question2) > 100
-                            else question2,
-                        }
-                    )
+def _pruning_stats(engine: Any) -> Dict[str, Any]:
+    # Pairs rejected by cheap bounds before the full comparison
+    return {
+        "pairs_considered": engine.pairs_considered,
+        "pairs_pruned": engine.pairs_pruned,
+        "prune_rate": round(engine.pairs_pruned / engine.pairs_considered, 3)
+        if engine.pairs_considered
+        else 0.0,
+    }
+
+
+class _StreamClosed(Exception):
+    """Raised in the comparison thread when the reader of a stream went away"""
 
-                processed_pairs.add(pair_key)
+
+def analyze_dataset_similarities(
+    db: Session,
+    dataset_id: str,
+    threshold: float = 0.8,
+    method: str = SimilarityMethod.AUTO,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    update_index: bool = False,
+) -> Dict[str, Any]:
+    """Analyzes similar questions in a dataset
+
+    ``method`` selects the similarity engine: ``exact`` (SequenceMatcher ratio),
+    ``tfidf`` (n-gram cosine, for large datasets), ``lsh`` (ratio of the pairs
+    colliding in the MinHash index, for the largest ones), ``index`` (ratios
+    kept in the similarity index, only new records are compared),
+    ``embedding`` (cosine of embeddings, also finds paraphrases) or ``auto``.
+    ``workers`` processes share the comparisons (SIMILARITY_WORKERS by default)
+    and ``on_progress`` receives the completed share of them. The similarity
+    index is only read, unless ``update_index`` stores the records it lacks.
+    """
+    try:
+        dataset = _get_dataset(db, dataset_id)
+
+        # Get the questions of the dataset
+        records = DatasetQuestions.load(db, dataset.id)
+
+        engine = get_similarity_engine(
+            method,
+            len(records),
+            db,
+            dataset.id,
+            records.ids,
+            workers=workers,
+            threshold=threshold,
+            read_only=not update_index,
+        )
+        similarities = [
+            _similarity_item(records, i, j, similarity)
+            for i, j, similarity in engine.find_similar_pairs(
+                records.questions, threshold, on_progress
+            )
+        ]
 
         return {
             "dataset_id": dataset.id,
@@ -138,6 +267,7 @@ def analyze_dataset_similarities(
             "similarities": sorted(
                 similarities, key=lambda x: x["similarity"], reverse=True
             ),
+            **_pruning_stats(engine),
         }
 
     except Exception as e:
@@ -147,104 +277,224 @@ def analyze_dataset_similarities(
         raise
 
 
+def stream_dataset_similarities(
+    db: Session,
+    dataset_id: str,
+    threshold: float = 0.8,
+    method: str = SimilarityMethod.AUTO,
+    workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Analyzes similar questions in a dataset, yielding pairs as they are found
+
+    Raises ValueError right away for an unknown dataset or method. The
+    iterator then yields a ``dataset`` item, one ``pair`` item per similar
+    pair, unsorted, and a ``summary`` item; or an ``error`` item. The
+    comparisons run in a thread that waits while STREAM_QUEUE_SIZE pairs are
+    unread, so memory stays bounded whatever the number of pairs.
+    """
+    dataset = _get_dataset(db, dataset_id)
+    records = DatasetQuestions.load(db, dataset.id)
+    engine = get_similarity_engine(
+        method,
+        len(records),
+        db,
+        dataset.id,
+        records.ids,
+        workers=workers,
+        threshold=threshold,
+        read_only=True,
+    )
+
+    def generate() -> Iterator[Dict[str, Any]]:
+        items: "queue.Queue[Any]" = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        closed = threading.Event()
+        done = object()
+
+        def put(item: Any) -> None:
+            while True:
+                if closed.is_set():
+                    raise _StreamClosed()
+                try:
+                    items.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def on_pairs(pairs: List[Any]) -> None:
+            for i, j, similarity in pairs:
+                put(_similarity_item(records, i, j, similarity))
+
+        def run() -> None:
+            try:
+                engine.find_similar_pairs(
+                    records.questions, threshold, on_pairs=on_pairs
+                )
+                put(done)
+            except _StreamClosed:
+                pass
+            except Exception as e:
+                logging.error(
+                    f"Error streaming similarities for dataset {dataset_id}: {str(e)}"
+                )
+                try:
+                    put(e)
+                except _StreamClosed:
+                    pass
+
+        yield {
+            "type": "dataset",
+            "dataset_id": dataset.id,
+            "dataset_name": dataset.name,
+            "threshold": threshold,
+            "method": engine.method,
+            "total_records": len(records),
+        }
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        found = 0
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    yield {"type": "error", "detail": str(item)}
+                    return
+                found += 1
+                yield {"type": "pair", **item}
+        finally:
+            closed.set()
+            worker.join()
+
+        yield {
+            "type": "summary",
+            "similar_pairs_found": found,
+            **_pruning_stats(engine),
+        }
+
+    return generate()
+
+
+def _plan_cleaning(
+    db: Session,
+    dataset_id: str,
+    threshold: float,
+    method: str,
+    workers: Optional[int],
+    on_progress: Optional[ProgressCallback],
+) -> Tuple[Dataset, DatasetQuestions, Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+    """Loads a dataset and returns the iterator of its removal decisions
+
+    Decisions are (detail, removed item) pairs, computed cluster by cluster:
+    only one record is kept per cluster, the one with the highest
+    confidence, then the oldest.
+    """
+    dataset = _get_dataset(db, dataset_id)
+
+    # Get the questions of the dataset, in a stable order
+    records = DatasetQuestions.load(db, dataset.id)
+
+    if not len(records):
+        raise ValueError(f"No records found for dataset '{dataset_id}'")
+
+    engine = get_similarity_engine(
+        method,
+        len(records),
+        db,
+        dataset.id,
+        records.ids,
+        workers=workers,
+        threshold=threshold,
+        ratio_only=True,
+    )
+
+    def decisions() -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        questions = records.questions
+        pairs = engine.find_similar_pairs(questions, threshold, on_progress)
+
+        # Score of each pair, and best score of each record, to report removals
+        pair_scores: Dict[Tuple[int, int], float] = {}
+        best_scores: Dict[int, float] = {}
+        for i, j, similarity in pairs:
+            pair_scores[(i, j)] = similarity
+            best_scores[i] = max(best_scores.get(i, 0.0), similarity)
+            best_scores[j] = max(best_scores.get(j, 0.0), similarity)
+
+        for cluster in cluster_similar_pairs(len(records), pairs):
+            cluster.sort(key=records.keeper_sort_key)
+            keep_index = cluster[0]
+            keep_id = records.ids[keep_index]
+
+            for remove_index in cluster[1:]:
+                remove_id = records.ids[remove_index]
+                similarity = pair_scores.get(
+                    (min(keep_index, remove_index), max(keep_index, remove_index)),
+                    best_scores[remove_index],
+                )
+                yield (
+                    {
+                        "keep_id": keep_id[:8],
+                        "remove_id": remove_id[:8],
+                        "similarity": round(similarity, 3),
+                        "keep_question": questions[keep_index],
+                        "remove_question": questions[remove_index],
+                    },
+                    {
+                        "id": remove_id,
+                        "question": questions[remove_index],
+                        "similarity": round(similarity, 3),
+                        "kept_id": keep_id[:8],
+                    },
+                )
+
+    return dataset, records, decisions()
+
+
+def _remove_records(db: Session, removed_ids: List[str]) -> None:
+    """Removes records and their index entries with bulk deletes, and commits"""
+    QALshBucket.remove_records(db, removed_ids)
+    SimilarityIndex.remove_records(db, removed_ids)
+    for offset in range(0, len(removed_ids), DELETE_BATCH_SIZE):
+        db.query(QASource).filter(
+            QASource.id.in_(removed_ids[offset : offset + DELETE_BATCH_SIZE])
+        ).delete()
+    db.commit()
+
+
 def clean_dataset_similarities(
-    db: Session, dataset_id: str, threshold: float = 0.8
+    db: Session,
+    dataset_id: str,
+    threshold: float = 0.8,
+    method: str = SimilarityMethod.AUTO,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    dry_run: bool = False,
 ) -> Dict[str, Any]:
-    """Cleans similar questions in a dataset by removing duplicates"""
+    """Cleans similar questions in a dataset by removing duplicates
+
+    Similar questions are grouped into clusters and only one record is kept
+    per cluster: the one with the highest confidence, then the oldest.
+    With ``dry_run``, the records that would be removed are reported but
+    kept. ``method``, ``workers`` and ``on_progress`` are used as in
+    analyze_dataset_similarities, except that ``auto`` always keeps the
+    SequenceMatcher ratio of the threshold (index or exact engine): TF-IDF,
+    LSH and embeddings are only used when asked for.
+    """
     try:
-        # Check if dataset exists
-        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
-        if not dataset:
-            available_datasets = [d.id for d in db.query(Dataset.id).distinct().all()]
-            raise ValueError(
-                f"Dataset '{dataset_id}' not found. Available datasets: {available_datasets}"
-            )
-
-        # Get all records for the dataset
-        records = db.query(QASource).filter(QASource.dataset_id == dataset.id).all()
-
-        if not records:
-            raise ValueError(f"No records found for dataset '{dataset_id}'")
+        dataset, records, decisions = _plan_cleaning(
+            db, dataset_id, threshold, method, workers, on_progress
+        )
 
         similarities = []
-        processed_pairs = set()
         removed_records = []
+        for detail, removed in decisions:
+            similarities.append(detail)
+            removed_records.append(removed)
 
-        for i, record1 in enumerate(records):
-            for j, record2 in enumerate(records[i + 1 :], i + 1):
-                pair_key = tuple(sorted([record1.id, record2.id]))
-                if pair_key in processed_pairs:
-                    continue
-
-                question1 = record1.input.get("question", "") if record1.input else ""
-                question2 = record2.input.get("question", "") if record2.input else ""
-
-                similarity = SequenceMatcher(None, question1, question2).ratio()
-
-                if similarity >= threshold:
-                    # Decide which one to remove
-                    confidence1 = (
-                        record1.expected_output.get("confidence", 0)
-                        if record1.expected_output
-                        else 0
-                    )
-                    confidence2 = (
-                        record2.expected_output.get("confidence", 0)
-                        if record2.expected_output
-                        else 0
-                    )
-
-                    if confidence1 > confidence2:
-                        record_to_keep = record1
-                        record_to_remove = record2
-                    elif confidence2 > confidence1:
-                        record_to_keep = record2
-                        record_to_remove = record1
-                    else:
-                        # If confidences are equal, keep the oldest
-                        if record1.created_at < record2.created_at:
-                            record_to_keep = record1
-                            record_to_remove = record2
-                        else:
-                            record_to_keep = record2
-                            record_to_remove = record1
-
-                    # Check if this record hasn't already been marked for removal
-                    if record_to_remove.id not in [r["id"] for r in removed_records]:
-                        similarities.append(
-                            {
-                                "keep_id": record_to_keep.id[:8],
-                                "remove_id": record_to_remove.id[:8],
-                                "similarity": round(similarity, 3),
-                                "keep_question": question1
-                                if record_to_keep == record1
-                                else question2,
-                                "remove_question": question2
-                                if record_to_remove == record2
-                                else question1,
-                            }
-                        )
-
-                        removed_records.append(
-                            {
-                                "id": record_to_remove.id,
-                                "question": record_to_remove.input.get("question", "")
-                                if record_to_remove.input
-                                else "",
-                                "similarity": round(similarity, 3),
-                                "kept_id": record_to_keep.id[:8],
-                            }
-                        )
-
-                        # Remove the record
-                        db.query(QASource).filter(
-                            QASource.id == record_to_remove.id
-                        ).delete()
-
-                processed_pairs.add(pair_key)
-
-        # Commit the changes
-        db.commit()
+        # Remove the records and their index entries in a single transaction
+        if not dry_run:
+            _remove_records(db, [record["id"] for record in removed_records])
 
         return {
             "dataset_id": dataset.id,
@@ -252,6 +502,7 @@ def clean_dataset_similarities(
             "threshold": threshold,
             "total_records": len(records),
             "removed_records": len(removed_records),
+            "dry_run": dry_run,
             "details": sorted(
                 similarities, key=lambda x: x["similarity"], reverse=True
             ),
@@ -262,3 +513,180 @@ def clean_dataset_similarities(
         db.rollback()
         logging.error(f"Error cleaning similarities for dataset {dataset_id}: {str(e)}")
         raise
+
+
+def stream_clean_dataset_similarities(
+    db: Session,
+    dataset_id: str,
+    threshold: float = 0.8,
+    method: str = SimilarityMethod.AUTO,
+    workers: Optional[int] = None,
+    dry_run: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Cleans similar questions in a dataset, yielding removals as decided
+
+    Raises ValueError right away for an unknown or empty dataset. The
+    iterator then yields a ``dataset`` item, one ``removal`` item per record
+    to remove, then a ``summary`` item once they are removed; or an
+    ``error`` item. Nothing is removed with ``dry_run``, nor when the
+    iterator is not read to the end.
+    """
+    dataset, records, decisions = _plan_cleaning(
+        db, dataset_id, threshold, method, workers, None
+    )
+
+    def generate() -> Iterator[Dict[str, Any]]:
+        yield {
+            "type": "dataset",
+            "dataset_id": dataset.id,
+            "dataset_name": dataset.name,
+            "threshold": threshold,
+            "total_records": len(records),
+            "dry_run": dry_run,
+        }
+        removed_ids: List[str] = []
+        try:
+            for detail, removed in decisions:
+                removed_ids.append(removed["id"])
+                yield {
+                    "type": "removal",
+                    **removed,
+                    "keep_question": detail["keep_question"],
+                }
+            if not dry_run:
+                _remove_records(db, removed_ids)
+        except Exception as e:
+            db.rollback()
+            logging.error(
+                f"Error cleaning similarities for dataset {dataset_id}: {str(e)}"
+            )
+            yield {"type": "error", "detail": str(e)}
+            return
+
+        yield {
+            "type": "summary",
+            "removed_records": len(removed_ids),
+            "dry_run": dry_run,
+        }
+
+    return generate()
+
+
+def find_global_duplicates(
+    db: Session,
+    dataset_ids: Optional[List[str]] = None,
+    threshold: float = 0.8,
+    cross_dataset_only: bool = False,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """Finds clusters of similar questions across datasets
+
+    Compares the records of ``dataset_ids`` (all datasets by default) through
+    their shared LSH buckets, so only colliding pairs are scored, whatever the
+    number of datasets. With ``cross_dataset_only``, pairs of records of the
+    same dataset are skipped and clusters span several datasets. Nothing is
+    removed; ``workers`` and ``on_progress`` are used as in
+    analyze_dataset_similarities.
+    """
+    try:
+        query = db.query(Dataset.id, Dataset.name)
+        if dataset_ids is not None:
+            query = query.filter(Dataset.id.in_(dataset_ids))
+        names = dict(query.all())
+        missing = sorted(set(dataset_ids or []) - set(names))
+        if missing:
+            available_datasets = [d.id for d in db.query(Dataset.id).distinct().all()]
+            raise ValueError(
+                f"Datasets {missing} not found. Available datasets: {available_datasets}"
+            )
+
+        # Only the columns needed to compare and report the records
+        ids: List[str] = []
+        record_datasets: List[str] = []
+        questions: List[str] = []
+        rows = (
+            db.query(
+                QASource.id,
+                QASource.dataset_id,
+                QASource.input["question"].as_string(),
+            )
+            .filter(QASource.dataset_id.in_(list(names)))
+            .order_by(QASource.created_at, QASource.id)
+            .yield_per(LOAD_BATCH_SIZE)
+        )
+        for record_id, dataset_id, question in rows:
+            ids.append(record_id)
+            record_datasets.append(dataset_id)
+            questions.append(question or "")
+
+        engine = LshSimilarityEngine(
+            db,
+            list(names),
+            ids,
+            workers=workers,
+            record_groups=record_datasets if cross_dataset_only else None,
+        )
+        pairs = engine.find_similar_pairs(questions, threshold, on_progress)
+
+        best_scores: Dict[int, float] = {}
+        for i, j, similarity in pairs:
+            best_scores[i] = max(best_scores.get(i, 0.0), similarity)
+            best_scores[j] = max(best_scores.get(j, 0.0), similarity)
+
+        clusters = []
+        clustered: Dict[str, int] = {}
+        for cluster in cluster_similar_pairs(len(ids), pairs):
+            cluster_datasets = sorted({record_datasets[i] for i in cluster})
+            for i in cluster:
+                clustered[record_datasets[i]] = clustered.get(record_datasets[i], 0) + 1
+            clusters.append(
+                {
+                    "size": len(cluster),
+                    "similarity": round(max(best_scores[i] for i in cluster), 3),
+                    "dataset_ids": cluster_datasets,
+                    "records": [
+                        {
+                            "id": ids[i],
+                            "dataset_id": record_datasets[i],
+                            "dataset_name": names[record_datasets[i]],
+                            "question": questions[i],
+                        }
+                        for i in cluster
+                    ],
+                }
+            )
+
+        totals: Dict[str, int] = {}
+        for dataset_id in record_datasets:
+            totals[dataset_id] = totals.get(dataset_id, 0) + 1
+
+        return {
+            "threshold": threshold,
+            "cross_dataset_only": cross_dataset_only,
+            "total_records": len(ids),
+            "datasets": [
+                {
+                    "id": dataset_id,
+                    "name": name,
+                    "total_records": totals.get(dataset_id, 0),
+                    "clustered_records": clustered.get(dataset_id, 0),
+                }
+                for dataset_id, name in sorted(names.items(), key=lambda x: x[1])
+            ],
+            "clusters_found": len(clusters),
+            "cross_dataset_clusters": sum(
+                len(cluster["dataset_ids"]) > 1 for cluster in clusters
+            ),
+            # Records that would go if one record per cluster were kept
+            "duplicate_records": sum(cluster["size"] - 1 for cluster in clusters),
+            "clusters": sorted(
+                clusters, key=lambda x: (x["size"], x["similarity"]), reverse=True
+            ),
+            "pairs_considered": engine.pairs_considered,
+            "pairs_pruned": engine.pairs_pruned,
+        }
+
+    except Exception as e:
+        logging.error(f"Error finding global duplicates: {str(e)}")
+        raise
@@ -0,0 +1,386 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import openai
+from sqlalchemy import Insert, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from server.core.config import config
+from server.models.embedding import Embedding
+
+# Hashes looked up per query when reading cached embeddings
+LOOKUP_BATCH_SIZE = 500
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scales rows to unit length so that dot products are cosines"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+_embedding_client: Optional[openai.OpenAI] = None
+_embedding_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> openai.OpenAI:
+    """Returns the process-wide client of the embeddings endpoint
+
+    Its connection pool is shared by all the services, so pages checked for
+    duplicates one after another reuse the same connections.
+    """
+    global _embedding_client
+    with _embedding_client_lock:
+        if _embedding_client is None:
+            _embedding_client = openai.OpenAI(
+                api_key=config.embedding_api_key, base_url=config.embedding_base_url
+            )
+        return _embedding_client
+
+
+def close_embedding_client() -> None:
+    """Closes the client of the embeddings endpoint, if it was opened"""
+    global _embedding_client
+    with _embedding_client_lock:
+        client, _embedding_client = _embedding_client, None
+    if client is not None:
+        client.close()
+
+
+def _insert_ignore(session: Session) -> Insert:
+    """INSERT of embeddings skipping the rows already cached by another worker"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(Embedding).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql_insert(Embedding).on_conflict_do_nothing()
+    return insert(Embedding)
+
+
+class EmbeddingService:
+    """Embeds texts through an OpenAI-compatible endpoint
+
+    Texts missing from the ``embeddings`` table are sent in batches of
+    ``batch_size``, and their vectors cached by model and text hash, so a text
+    is only embedded once per model.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        client: Optional[Any] = None,
+        model: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.db = db
+        self.client = client or get_embedding_client()
+        self.model = model or config.embedding_model
+        self.batch_size = max(1, batch_size or config.embedding_batch_size)
+        self.requests = 0
+
+    def _load_cached(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        vectors = {}
+        for offset in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            rows = self.db.query(Embedding.text_hash, Embedding.vector).filter(
+                Embedding.model == self.model,
+                Embedding.text_hash.in_(hashes[offset : offset + LOOKUP_BATCH_SIZE]),
+            )
+            for text_hash, vector in rows:
+                vectors[text_hash] = np.frombuffer(vector, dtype=np.float32)
+        return vectors
+
+    def _request(self, texts: List[str]) -> List[np.ndarray]:
+        self.requests += 1
+        response = self.client.embeddings.create(
+            model=self.model,
+            # Endpoints reject empty inputs
+            input=[text or " " for text in texts],
+            encoding_format="float",
+        )
+        items = sorted(response.data, key=lambda item: item.index)
+        return [np.asarray(item.embedding, dtype=np.float32) for item in items]
+
+    def _store(self, rows: List[Dict[str, Any]]) -> None:
+        """Caches embeddings in their own transaction, ignoring stored ones
+
+        The caller's session may hold pending changes, which must neither be
+        committed nor rolled back here. The cache is best effort: a failed
+        write is logged and the texts are embedded again next time.
+        """
+        try:
+            with Session(bind=self.db.get_bind()) as session:
+                session.execute(_insert_ignore(session), rows)
+                session.commit()
+        except SQLAlchemyError as e:
+            logging.warning(f"Failed to cache {len(rows)} embedding(s): {e}")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Returns the unit-length embeddings of texts, one float32 row each"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hashes = [Embedding.compute_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        vectors = self._load_cached(list(unique))
+        missing = [text_hash for text_hash in unique if text_hash not in vectors]
+
+        for offset in range(0, len(missing), self.batch_size):
+            batch = missing[offset : offset + self.batch_size]
+            embedded = self._request([unique[text_hash] for text_hash in batch])
+            rows = []
+            for text_hash, vector in zip(batch, embedded):
+                vectors[text_hash] = vector
+                rows.append(
+                    {
+                        "model": self.model,
+                        "text_hash": text_hash,
+                        "dimensions": len(vector),
+                        "vector": vector.tobytes(),
+                    }
+                )
+            self._store(rows)
+
+        if missing:
+            logging.info(
+                f"Embedded {len(missing)} text(s), {len(unique) - len(missing)} cached"
+            )
+        return _normalize_rows(np.stack([vectors[text_hash] for text_hash in hashes]))
+
+
+class CosineFilter:
+    """Cosine similarity of embeddings reaching a threshold, like RatioFilter"""
+
+    def __init__(self, scorer: "EmbeddingScorer", threshold: float):
+        self.scorer = scorer
+        self.threshold = threshold
+
+    def ratio(self, a: str, b: str) -> Optional[float]:
+        """Returns the cosine of the embeddings of two texts if it reaches the threshold"""
+        self.scorer.prepare([a, b])
+        similarity = float(self.scorer.vectors[a] @ self.scorer.vectors[b])
+        return similarity if similarity >= self.threshold else None
+
+
+class EmbeddingScorer:
+    """Compares questions by embeddings in QASource.check_for_duplicates_batch
+
+    ``prepare`` embeds the texts of a batch with as few requests as possible;
+    ``filter`` replaces the RatioFilter of the question similarity.
+    """
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+        self.vectors: Dict[str, np.ndarray] = {}
+
+    def prepare(self, texts: List[str]) -> None:
+        """Embeds the texts not seen yet"""
+        missing = [text for text in dict.fromkeys(texts) if text not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.service.embed(missing)))
+
+    def filter(self, threshold: float) -> CosineFilter:
+        return CosineFilter(self, threshold)
+
+
+def get_duplicate_scorer(db: Session) -> Optional[EmbeddingScorer]:
+    """Returns the embedding scorer when DUPLICATE_SCORER=embedding, else None"""
+    if config.duplicate_scorer != "embedding":
+        return None
+    return EmbeddingScorer(EmbeddingService(db))
+
+
+def _kmeans(
+    vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 1
+) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns unit-length centroids"""
+    generator = np.random.default_rng(seed)
+    centroids = vectors[generator.choice(len(vectors), n_lists, replace=False)]
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        # Empty lists keep their previous centroid
+        empty = ~np.bincount(assignments, minlength=n_lists).astype(bool)
+        sums[empty] = centroids[empty]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class VectorIndex:
+    """Question embeddings of a dataset in a memory-mapped ``.npy`` file
+
+    Row k holds the embedding of ``record_ids[k]``; the IDs and the model are
+    stored next to it, so the file is only rewritten when the records of the
+    dataset change. From ``ivf_min_records`` vectors, an IVF partition
+    (k-means centroids) restricts each search to the ``probes`` nearest lists
+    instead of scanning every vector.
+    """
+
+    # Rows of vectors multiplied at a time, to bound memory
+    BLOCK_SIZE = 1024
+    # Training sample per list of the IVF partition
+    IVF_SAMPLE_PER_LIST = 64
+
+    def __init__(
+        self,
+        dataset_id: str,
+        directory: Optional[str] = None,
+        ivf_min_records: Optional[int] = None,
+        probes: Optional[int] = None,
+    ):
+        directory = directory or config.vectors_dir
+        self.vectors_path = os.path.join(directory, f"{dataset_id}.npy")
+        self.meta_path = os.path.join(directory, f"{dataset_id}.json")
+        self.ivf_path = os.path.join(directory, f"{dataset_id}.ivf.npz")
+        self.ivf_min_records = (
+            config.embedding_ivf_min_records
+            if ivf_min_records is None
+            else ivf_min_records
+        )
+        self.probes = max(1, probes or config.embedding_ivf_probes)
+        self.pairs_scored = 0
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.vectors_path):
+            return None
+        with open(self.meta_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def sync(
+        self, record_ids: List[str], texts: List[str], service: EmbeddingService
+    ) -> np.ndarray:
+        """Returns the memory-mapped vectors of the records, rewritten if stale"""
+        meta = self._read_meta()
+        if meta and meta["model"] == service.model and meta["ids"] == record_ids:
+            return np.load(self.vectors_path, mmap_mode="r")
+
+        vectors = service.embed(texts)
+        directory = os.path.dirname(self.vectors_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Unique per call, so concurrent syncs of a dataset do not share it
+        with tempfile.NamedTemporaryFile(
+            dir=directory, suffix=".tmp.npy", delete=False
+        ) as f:
+            temporary = f.name
+        try:
+            mapped = np.lib.format.open_memmap(
+                temporary, mode="w+", dtype=np.float32, shape=vectors.shape
+            )
+            mapped[:] = vectors
+            mapped.flush()
+            del mapped
+            os.replace(temporary, self.vectors_path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model": service.model, "ids": record_ids}, f)
+        if os.path.exists(self.ivf_path):
+            os.remove(self.ivf_path)
+        return np.load(self.vectors_path, mmap_mode="r")
+
+    def delete(self) -> None:
+        """Removes the files of the index"""
+        for path in (self.vectors_path, self.meta_path, self.ivf_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _partition(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the IVF centroids and the list of each vector, built once"""
+        if os.path.exists(self.ivf_path):
+            with np.load(self.ivf_path) as stored:
+                return stored["centroids"], stored["assignments"]
+
+        n_lists = max(1, int(np.sqrt(len(vectors))))
+        generator = np.random.default_rng(1)
+        sample_size = min(len(vectors), n_lists * self.IVF_SAMPLE_PER_LIST)
+        sample = np.asarray(
+            vectors[np.sort(generator.choice(len(vectors), sample_size, replace=False))]
+        )
+        centroids = _kmeans(sample, n_lists)
+        assignments = np.concatenate(
+            [
+                np.argmax(
+                    vectors[start : start + self.BLOCK_SIZE] @ centroids.T, axis=1
+                )
+                for start in range(0, len(vectors), self.BLOCK_SIZE)
+            ]
+        )
+        np.savez(self.ivf_path, centroids=centroids, assignments=assignments)
+        return centroids, assignments
+
+    def similar_pairs(
+        self,
+        vectors: np.ndarray,
+        threshold: float,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> List[Tuple[int, int, float]]:
+        """Returns the pairs (i, j), i < j, whose cosine reaches the threshold"""
+        n = len(vectors)
+        self.pairs_scored = 0
+        if n < 2:
+            return []
+        if n < self.ivf_min_records:
+            return self._brute_force_pairs(vectors, threshold, on_progress)
+        return self._ivf_pairs(vectors, threshold, on_progress)
+
+    def _brute_force_pairs(self, vectors, threshold, on_progress):
+        n = len(vectors)
+        pairs = []
+        for start in range(0, n, self.BLOCK_SIZE):
+            end = min(n, start + self.BLOCK_SIZE)
+            scores = np.asarray(vectors[start:end]) @ np.asarray(vectors[start:]).T
+            # Only keep j > i
+            mask = np.triu(scores >= threshold - 1e-6, k=1)
+            for i, j in zip(*np.nonzero(mask)):
+                pairs.append(
+                    (start + int(i), start + int(j), min(1.0, float(scores[i, j])))
+                )
+            # Rows i of the block are scored against the n - i - 1 next ones
+            rows = end - start
+            self.pairs_scored += rows * (n - 1) - (start + end - 1) * rows // 2
+            if on_progress:
+                on_progress(1.0 - (n - end) * (n - end - 1) / (n * (n - 1)))
+        return pairs
+
+    def _ivf_pairs(self, vectors, threshold, on_progress):
+        centroids, assignments = self._partition(vectors)
+        probes = min(self.probes, len(centroids))
+        probed = np.concatenate(
+            [
+                np.argsort(
+                    -(vectors[start : start + self.BLOCK_SIZE] @ centroids.T), axis=1
+                )[:, :probes]
+                for start in range(0, len(vectors), self.BLOCK_SIZE)
+            ]
+        )
+
+        # A pair is found when either vector probes the list of the other
+        found: Dict[Tuple[int, int], float] = {}
+        for list_id in range(len(centroids)):
+            members = np.nonzero(assignments == list_id)[0]
+            queries = np.nonzero((probed == list_id).any(axis=1))[0]
+            if len(members) and len(queries):
+                member_vectors = np.asarray(vectors[members])
+                for start in range(0, len(queries), self.BLOCK_SIZE):
+                    block = queries[start : start + self.BLOCK_SIZE]
+                    scores = np.asarray(vectors[block]) @ member_vectors.T
+                    self.pairs_scored += scores.size
+                    for q, m in zip(*np.nonzero(scores >= threshold - 1e-6)):
+                        i, j = int(block[q]), int(members[m])
+                        if i != j:
+                            found[(min(i, j), max(i, j))] = min(
+                                1.0, float(scores[q, m])
+                            )
+            if on_progress:
+                on_progress((list_id + 1) / len(centroids))
+
+        return [(i, j, similarity) for (i, j), similarity in found.items()]
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from server.core.config import config
+from server.core.utils.bloom import BloomFilter
+from server.models.dataset import QASource
+
+# Rows fetched per round trip when reading the IDs of the records
+LOAD_BATCH_SIZE = 10000
+
+# Records created this long before a saved filter may have been committed
+# after it, so they are read again when the filter is loaded
+CATCH_UP_MARGIN = timedelta(minutes=10)
+
+
+class QAIdFilter:
+    """Bloom filter of the IDs of the QA records of a database
+
+    Built lazily from the database, then kept up to date by the inserts of
+    this process, so an ID the filter does not contain is not in the
+    database and needs no lookup. Records inserted by other processes are
+    only seen when the filter is built again; a missed exact duplicate is
+    still found by the similarity check, with a score of 1.0.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        self.engine_url = engine.url.render_as_string(hide_password=True)
+        self.capacity = capacity or config.qa_id_filter_capacity
+        self.error_rate = error_rate or config.qa_id_filter_error_rate
+        self.path = path if path is not None else config.qa_id_filter_path
+        self.built_at: Optional[datetime] = None
+        self._bloom: Optional[BloomFilter] = None
+        # IDs added while a build reads the records, merged into the new filter
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_built(self) -> bool:
+        return self._bloom is not None
+
+    def _read_ids(self, db: Session, since: Optional[datetime] = None) -> List[str]:
+        query = db.query(QASource.id)
+        if since is not None:
+            query = query.filter(QASource.created_at >= since)
+        return [row[0] for row in query.yield_per(LOAD_BATCH_SIZE)]
+
+    def _load(self, db: Session) -> Optional[BloomFilter]:
+        """Loads the saved filter and adds the records created since it was built"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            bloom, metadata = BloomFilter.load(self.path)
+        except Exception as e:
+            logging.warning(f"Ignoring the QA ID filter saved in {self.path}: {e}")
+            return None
+        if metadata.get("engine_url") != self.engine_url or bloom.is_full:
+            return None
+
+        built_at = datetime.fromisoformat(metadata["built_at"])
+        # created_at is stored without a time zone
+        since = built_at.replace(tzinfo=None) - CATCH_UP_MARGIN
+        bloom.update(self._read_ids(db, since))
+        return bloom
+
+    def build(self, db: Session) -> None:
+        """Reads the IDs of all the records, or loads the saved filter"""
+        built_at = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending = []
+        try:
+            bloom = self._load(db)
+            if bloom is None:
+                ids = self._read_ids(db)
+                bloom = BloomFilter(max(self.capacity, 2 * len(ids)), self.error_rate)
+                bloom.update(ids)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            # Records flushed during the read may be missing from it
+            bloom.update(self._pending)
+            self._bloom, self._pending, self.built_at = bloom, None, built_at
+        logging.info(f"Built the QA ID filter with {len(bloom)} records")
+        self.save()
+
+    def save(self) -> None:
+        """Writes the filter to QA_ID_FILTER_PATH, when set"""
+        if not self.path or self._bloom is None:
+            return
+        with self._lock:
+            self._bloom.save(
+                self.path,
+                {
+                    "engine_url": self.engine_url,
+                    "built_at": self.built_at.isoformat(),
+                },
+            )
+
+    def possibly_existing(self, db: Session, ids: Iterable[str]) -> Set[str]:
+        """Returns the IDs that may be stored; the others are certainly not"""
+        if self._bloom is None or self._bloom.is_full:
+            self.build(db)
+        with self._lock:
+            return {qa_id for qa_id in ids if qa_id in self._bloom}
+
+    def add(self, ids: Iterable[str]) -> None:
+        ids = list(ids)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(ids)
+            if self._bloom is not None:
+                self._bloom.update(ids)
+
+
+_filters: "weakref.WeakKeyDictionary[Engine, QAIdFilter]" = weakref.WeakKeyDictionary()
+_filters_lock = threading.Lock()
+
+
+def get_qa_id_filter(db: Session) -> Optional[QAIdFilter]:
+    """Returns the process-wide QA ID filter of the session's database,
+    or None when QA_ID_FILTER_ENABLED is off"""
+    if not config.qa_id_filter_enabled:
+        return None
+    engine = db.get_bind()
+    with _filters_lock:
+        if engine not in _filters:
+            _filters[engine] = QAIdFilter(engine)
+        return _filters[engine]
+
+
+def save_qa_id_filters() -> None:
+    """Writes the filters built by this process, to load them on the next start"""
+    with _filters_lock:
+        filters = list(_filters.values())
+    for id_filter in filters:
+        try:
+            id_filter.save()
+        except Exception as e:
+            logging.warning(f"Failed to save the QA ID filter: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _add_inserted_ids(session: Session, flush_context) -> None:
+    """Adds the QA records inserted by a flush to the filter of their database"""
+    ids = [obj.id for obj in session.new if isinstance(obj, QASource)]
+    if not ids:
+        return
+    id_filter = _filters.get(session.get_bind())
+    if id_filter is not None:
+        id_filter.add(ids)
@@ -0,0 +1,253 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from server.models.job import Job, JobKind, JobStatus, PipelineCheckpoint
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite returns naive datetimes; treat them as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class JobService:
+    """Persists background jobs, their status and progress"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_job(self, kind: str, payload: Dict[str, Any], urls_total: int) -> Job:
+        """Creates a pending job"""
+        job = Job(
+            kind=kind,
+            status=JobStatus.PENDING,
+            payload=payload,
+            urls_total=urls_total,
+            errors=[],
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        logging.info(f"Created {kind} job {job.id}")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Retrieves a job by ID"""
+        return self.db.query(Job).filter(Job.id == job_id).first()
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Lists the most recent jobs, optionally filtered by status"""
+        query = self.db.query(Job)
+        if status:
+            query = query.filter(Job.status == status)
+        return query.order_by(Job.created_at.desc()).limit(limit).all()
+
+    def list_active_jobs(self) -> List[Job]:
+        """Lists jobs that were queued or interrupted while running"""
+        return (
+            self.db.query(Job)
+            .filter(Job.status.in_(JobStatus.ACTIVE))
+            .order_by(Job.created_at)
+            .all()
+        )
+
+    def start_job(self, job_id: str) -> Optional[Job]:
+        """Marks a job as processing; returns None if it is unknown or finished"""
+        job = self.get_job(job_id)
+        if job is None or job.status in JobStatus.FINISHED:
+            return None
+
+        job.status = JobStatus.PROCESSING
+        if job.started_at is None:
+            job.started_at = datetime.now(timezone.utc)
+        self.db.commit()
+        return job
+
+    def update_progress(
+        self,
+        job_id: str,
+        urls_processed: int,
+        qa_pairs_generated: int,
+        errors: Optional[List[str]] = None,
+    ) -> Optional[Job]:
+        """Records the progress of a running job"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        job.urls_processed = urls_processed
+        job.qa_pairs_generated = qa_pairs_generated
+        if errors is not None:
+            job.errors = list(errors)
+        if job.urls_total:
+            done = urls_processed + len(job.errors or [])
+            job.progress = min(1.0, done / job.urls_total)
+        self._update_duration(job)
+        self.db.commit()
+        return job
+
+    def set_progress(self, job_id: str, progress: float) -> Optional[Job]:
+        """Records the completed share of a job that does not process URLs"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        job.progress = min(1.0, max(0.0, progress))
+        self._update_duration(job)
+        self.db.commit()
+        return job
+
+    def complete_job(
+        self,
+        job_id: str,
+        result: Dict[str, Any],
+        urls_processed: int,
+        qa_pairs_generated: int,
+        errors: Optional[List[str]] = None,
+    ) -> Optional[Job]:
+        """Marks a job as successfully finished"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        job.status = JobStatus.SUCCESS
+        job.result = result
+        job.urls_processed = urls_processed
+        job.qa_pairs_generated = qa_pairs_generated
+        if errors is not None:
+            job.errors = list(errors)
+        job.progress = 1.0
+        job.finished_at = datetime.now(timezone.utc)
+        self._update_duration(job)
+        self.db.commit()
+        logging.info(f"Job {job_id} completed")
+        return job
+
+    def fail_job(self, job_id: str, error: str) -> Optional[Job]:
+        """Marks a job as failed"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        job.status = JobStatus.ERROR
+        job.errors = [*(job.errors or []), error]
+        job.finished_at = datetime.now(timezone.utc)
+        self._update_duration(job)
+        self.db.commit()
+        logging.error(f"Job {job_id} failed: {error}")
+        return job
+
+    def retry_job(self, job_id: str) -> Optional[Job]:
+        """Puts a failed job back in the queue; completed stages are kept"""
+        job = self.get_job(job_id)
+        if job is None or job.status != JobStatus.ERROR:
+            return None
+
+        job.status = JobStatus.PENDING
+        job.errors = []
+        job.finished_at = None
+        self.db.commit()
+        logging.info(f"Job {job_id} queued for retry")
+        return job
+
+    def get_checkpoints(self, job_id: str, url: str) -> Dict[str, Dict[str, Any]]:
+        """Returns the data of the completed stages of a URL, keyed by stage"""
+        checkpoints = (
+            self.db.query(PipelineCheckpoint)
+            .filter(
+                PipelineCheckpoint.job_id == job_id,
+                PipelineCheckpoint.url == url,
+            )
+            .all()
+        )
+        return {checkpoint.stage: dict(checkpoint.data) for checkpoint in checkpoints}
+
+    def save_checkpoint(
+        self, job_id: str, url: str, stage: str, data: Dict[str, Any]
+    ) -> PipelineCheckpoint:
+        """Records the output of a completed stage, replacing a previous one"""
+        checkpoint = (
+            self.db.query(PipelineCheckpoint)
+            .filter(
+                PipelineCheckpoint.job_id == job_id,
+                PipelineCheckpoint.url == url,
+                PipelineCheckpoint.stage == stage,
+            )
+            .first()
+        )
+        if checkpoint is None:
+            checkpoint = PipelineCheckpoint(job_id=job_id, url=url, stage=stage)
+            self.db.add(checkpoint)
+        checkpoint.data = data
+        self.db.commit()
+        return checkpoint
+
+    @staticmethod
+    def _update_duration(job: Job) -> None:
+        if job.started_at is None:
+            return
+        end = job.finished_at or datetime.now(timezone.utc)
+        job.duration = (_as_utc(end) - _as_utc(job.started_at)).total_seconds()
+
+    @staticmethod
+    def eta(job: Job) -> Optional[float]:
+        """Estimated seconds left for a running job, from its progress so far"""
+        if job.status != JobStatus.PROCESSING or not job.progress or not job.duration:
+            return None
+        return job.duration * (1.0 - job.progress) / job.progress
+
+    @staticmethod
+    def get_result_page(
+        job: Job, field: Optional[str] = None, offset: int = 0, limit: int = 100
+    ) -> Optional[Dict[str, Any]]:
+        """Returns a page of a list of the job result
+
+        ``field`` defaults to the main list of the job kind; returns None when
+        the result has no such list.
+        """
+        fields = JobKind.RESULT_LISTS.get(job.kind, ())
+        field = field or (fields[0] if fields else None)
+        items = (job.result or {}).get(field) if field else None
+        if not isinstance(items, list):
+            return None
+
+        return {
+            "task_id": job.id,
+            "kind": job.kind,
+            "field": field,
+            "total": len(items),
+            "offset": offset,
+            "limit": limit,
+            "items": items[offset : offset + limit],
+        }
+
+    @staticmethod
+    def to_result(job: Job) -> Dict[str, Any]:
+        """Serializes a job in the DatasetResult format"""
+        result = job.result
+        if result is not None and job.kind in JobKind.PAGED_ONLY:
+            # Lists are fetched with GET /dataset/jobs/{task_id}/results
+            result = {
+                key: value
+                for key, value in result.items()
+                if not isinstance(value, list)
+            }
+
+        return {
+            "task_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "urls_total": job.urls_total or 0,
+            "urls_processed": job.urls_processed or 0,
+            "qa_pairs_generated": job.qa_pairs_generated or 0,
+            "progress": job.progress or 0.0,
+            "errors": list(job.errors or []),
+            "duration": job.duration or 0.0,
+            "rate": job.rate,
+            "eta": JobService.eta(job),
+            "result": result,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+        }
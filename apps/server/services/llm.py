@@ -1,8 +1,13 @@
+import asyncio
+import json
 import logging
 import openai
 import instructor
-from typing import Any, List, Dict, Optional, cast
+from difflib import SequenceMatcher
+from typing import Any, List, Dict, Optional, Sequence, cast
+from server.core.cache import LLMCache, get_llm_cache
 from server.core.config import config
+from server.core.utils.text import split_text
 from server.schemas.dataset import QA
 
 
@@ -46,65 +51,184 @@ class PromptManager:
 
 
 class LLMService:
-    def __init__(self):
-        self.client = openai.OpenAI(
+    def __init__(self, cache: Optional[LLMCache] = None):
+        self.client = openai.AsyncOpenAI(
             api_key=config.openai_api_key, base_url=config.openai_base_url
         )
         self.instructor_client = cast(
             Any, instructor.from_openai(self.client, mode=instructor.Mode.MD_JSON)
         )
         self.prompt_manager = PromptManager()
+        self.cache = cache if cache is not None else get_llm_cache()
+        # Bounds the number of in-flight completions issued by this service
+        self._semaphore = asyncio.Semaphore(max(1, config.llm_max_concurrency))
 
-    def clean_text(self, text: str, model: Optional[str] = None) -> str:
-        """Clean text using provided model or fallback to config.model_cleaning."""
+    async def _cache_get(self, key: str, use_cache: bool) -> Optional[Any]:
+        if not use_cache or self.cache is None:
+            return None
+        return await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_set(self, key: str, value: Any, use_cache: bool) -> None:
+        if not use_cache or self.cache is None:
+            return
+        await asyncio.to_thread(self.cache.set, key, value)
+
+    async def clean_text(
+        self, text: str, model: Optional[str] = None, use_cache: bool = True
+    ) -> str:
+        """Clean text using provided model or fallback to config.model_cleaning.
+
+        Pages longer than config.cleaning_chunk_size are split on structural
+        boundaries, cleaned concurrently and reassembled in their original order.
+        """
         model = model or config.model_cleaning
+        chunks = split_text(text, config.cleaning_chunk_size)
+        if len(chunks) <= 1:
+            return await self._clean_chunk(text, model, use_cache)
+
+        logging.info(f"Cleaning text in {len(chunks)} chunks")
+        cleaned_chunks = await asyncio.gather(
+            *(self._clean_chunk(chunk, model, use_cache) for chunk in chunks)
+        )
+        return "\n\n".join(chunk for chunk in cleaned_chunks if chunk)
+
+    async def _clean_chunk(self, text: str, model: str, use_cache: bool) -> str:
+        cache_key = LLMCache.make_key(
+            "clean",
+            model,
+            self.prompt_manager.CLEANING_PROMPT,
+            text,
+            config.temperature,
+            config.max_tokens_cleaning,
+        )
+        cached = await self._cache_get(cache_key, use_cache)
+        if cached is not None:
+            logging.info("Cleaned text served from LLM cache")
+            return cached
+
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": self.prompt_manager.CLEANING_PROMPT},
-                    {"role": "user", "content": text[:10000]},
-                ],
-                max_tokens=config.max_tokens_cleaning,
-                temperature=config.temperature,
-            )
-            return response.choices[0].message.content.strip() or text.strip()
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": self.prompt_manager.CLEANING_PROMPT,
+                        },
+                        {"role": "user", "content": text},
+                    ],
+                    max_tokens=config.max_tokens_cleaning,
+                    temperature=config.temperature,
+                )
+            cleaned = response.choices[0].message.content.strip() or text.strip()
         except Exception as e:
             logging.error(f"Text cleaning failed: {e}")
             return text
 
-    def generate_qa(
+        await self._cache_set(cache_key, cleaned, use_cache)
+        return cleaned
+
+    async def generate_qa(
         self,
         text: str,
         target_language: Optional[str] = None,
         model: Optional[str] = None,
+        use_cache: bool = True,
+        similarity_threshold: float = 0.9,
     ) -> List[QA]:
-        """Generate QA using optional target_language and model; fall back to config."""
+        """Generate QA using optional target_language and model; fall back to config.
+
+        Texts longer than config.qa_chunk_size are fanned out: QA pairs are
+        generated per chunk concurrently, then merged with in-batch duplicates
+        (questions at or above similarity_threshold) removed.
+        """
         target_language = target_language or config.target_language
         model = model or config.model_qa
-        try:
-            result = self.instructor_client.chat.completions.create(
-                model=model,
-                response_model=list[QA],
-                messages=[
-                    {
-                        "role": "user",
-                        "content": self.prompt_manager.get_qa_prompt(
-                            text, target_language
-                        ),
-                    }
-                ],
-                max_tokens=config.max_tokens_qa,
+        chunks = split_text(text, config.qa_chunk_size)
+        if len(chunks) <= 1:
+            return await self._generate_qa_chunk(
+                text, target_language, model, use_cache
+            )
+
+        logging.info(f"Generating QA pairs from {len(chunks)} chunks")
+        qa_lists = await asyncio.gather(
+            *(
+                self._generate_qa_chunk(chunk, target_language, model, use_cache)
+                for chunk in chunks
             )
-            return result
+        )
+        return self._merge_qa_lists(qa_lists, similarity_threshold)
+
+    @staticmethod
+    def _merge_qa_lists(
+        qa_lists: Sequence[List[QA]], similarity_threshold: float
+    ) -> List[QA]:
+        """Concatenates per-chunk QA lists in order, dropping in-batch duplicates"""
+        merged: List[QA] = []
+        seen_questions: List[str] = []
+        for qa_list in qa_lists:
+            for qa in qa_list:
+                question = " ".join(qa.question.lower().split())
+                if any(
+                    question == seen
+                    or SequenceMatcher(None, question, seen).ratio()
+                    >= similarity_threshold
+                    for seen in seen_questions
+                ):
+                    logging.info(f"Dropping in-batch duplicate question: {qa.question}")
+                    continue
+                seen_questions.append(question)
+                merged.append(qa)
+        return merged
+
+    async def _generate_qa_chunk(
+        self, text: str, target_language: str, model: str, use_cache: bool
+    ) -> List[QA]:
+        # The prompt rendered without source text identifies the template, the
+        # response schema is part of it since it shapes the structured output
+        prompt_template = self.prompt_manager.get_qa_prompt("", target_language)
+        cache_key = LLMCache.make_key(
+            "qa",
+            model,
+            prompt_template + json.dumps(QA.model_json_schema(), sort_keys=True),
+            text,
+            None,
+            config.max_tokens_qa,
+        )
+        cached = await self._cache_get(cache_key, use_cache)
+        if cached is not None:
+            logging.info("QA pairs served from LLM cache")
+            return [QA.model_validate(item) for item in cached]
+
+        try:
+            async with self._semaphore:
+                result = await self.instructor_client.chat.completions.create(
+                    model=model,
+                    response_model=list[QA],
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": self.prompt_manager.get_qa_prompt(
+                                text, target_language
+                            ),
+                        }
+                    ],
+                    max_tokens=config.max_tokens_qa,
+                )
         except Exception as e:
             logging.error(f"QA generation failed: {e}")
             return []
 
-    def get_models(self) -> List[Dict]:
+        if all(isinstance(item, QA) for item in result):
+            await self._cache_set(
+                cache_key, [item.model_dump() for item in result], use_cache
+            )
+        return result
+
+    async def get_models(self) -> List[Dict]:
         """Returns the list of available models from the OpenAI API."""
         try:
-            resp = self.client.models.list()
+            resp = await self.client.models.list()
             # resp.data contains model objects; we return a reduced list
             models = [
                 {"id": m.id, "object": getattr(m, "object", None)} for m in resp.data
@@ -1,7 +1,11 @@
 import logging
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from server.models.dataset import QASource
+from server.core.config import config
+from server.models.dataset import QASource, QALshBucket
+from server.services.embeddings import get_duplicate_scorer
+from server.services.id_filter import get_qa_id_filter
+from server.services.similarity import SimilarityIndex
 
 
 class QAService:
@@ -19,6 +23,8 @@ class QAService:
         """Deletes a QASource record from the database"""
         qa_source = self.db.query(QASource).filter(QASource.id == id).first()
         if qa_source:
+            QALshBucket.remove_records(self.db, [id])
+            SimilarityIndex.remove_records(self.db, [id])
             self.db.delete(qa_source)
             self.db.commit()
             logging.info(f"Deleted QASource: {id}")
@@ -31,6 +37,17 @@ class QAService:
 
         for key, value in updates.items():
             setattr(qa_source, key, value)
+        if "input" in updates:
+            # The question may have changed; it is indexed again when needed
+            QALshBucket.remove_records(self.db, [id])
+            SimilarityIndex.remove_records(self.db, [id])
+            if not qa_source.cleaned_text_id:
+                # The stored context is the full context
+                qa_source.context_hash, qa_source.context_simhash = (
+                    QASource.compute_context_fingerprint(
+                        qa_source.input.get("context", "")
+                    )
+                )
 
         self.db.commit()
         self.db.refresh(qa_source)
@@ -43,6 +60,28 @@ class QAService:
             raise ValueError(f"QASource with id {id} not found")
         return qa_source
 
+    def update_similarity_index(self, dataset_id: str, record_ids: List[str]) -> bool:
+        """Compares the records added to a dataset with the others and commits
+
+        Only the other records whose question length can reach the floor of
+        the index are loaded. Returns False when the dataset has more
+        unindexed records than SIMILARITY_INDEX_MAX_PENDING; its next cleaning
+        or background analysis indexes them. Failures are logged only, the
+        next cleaning catches up.
+        """
+        try:
+            updated = SimilarityIndex(self.db, dataset_id).add_records(
+                record_ids, max_pending=config.similarity_index_max_pending
+            )
+            self.db.commit()
+            return updated
+        except Exception as e:
+            self.db.rollback()
+            logging.warning(
+                f"Failed to update the similarity index of dataset {dataset_id}: {e}"
+            )
+            return False
+
     def process_qa_pairs(
         self,
         qa_list: List[Any],
@@ -53,22 +92,30 @@ class QAService:
         model: str,
         dataset_id: Optional[str] = None,
         similarity_threshold: float = 0.9,
+        cleaned_text_id: Optional[str] = None,
     ) -> Dict[str, int]:
-        """Processes and saves QA pairs, checking for duplicates"""
+        """Processes and saves QA pairs, checking for duplicates
+
+        With ``cleaned_text_id``, rows reference the cleaned text and only keep
+        the passage each QA was generated from instead of the whole page.
+        """
         qa_records = []
         exact_duplicates = 0
         similar_duplicates = 0
 
-        for i, qa_item in enumerate(qa_list):
-            duplicate_check = QASource.check_for_duplicates(
-                db=self.db,
-                question=qa_item.question,
-                answer=qa_item.answer,
-                context=cleaned_text,
-                source_url=url,
-                similarity_threshold=similarity_threshold,
-            )
+        # Check the whole page at once, including duplicates within the batch
+        duplicate_checks = QASource.check_for_duplicates_batch(
+            db=self.db,
+            qa_pairs=[(qa_item.question, qa_item.answer) for qa_item in qa_list],
+            context=cleaned_text,
+            source_url=url,
+            similarity_threshold=similarity_threshold,
+            cleaned_text_id=cleaned_text_id,
+            scorer=get_duplicate_scorer(self.db),
+            id_filter=get_qa_id_filter(self.db),
+        )
 
+        for i, (qa_item, duplicate_check) in enumerate(zip(qa_list, duplicate_checks)):
             if duplicate_check["type"] == "exact":
                 exact_duplicates += 1
                 dup_id = duplicate_check.get("duplicate_id")
@@ -85,6 +132,7 @@ class QAService:
                 )
 
             else:  # new
+                excerpt = getattr(qa_item, "context", None)
                 qa_record = QASource.from_qa_generation(
                     question=qa_item.question,
                     answer=qa_item.answer,
@@ -94,6 +142,8 @@ class QAService:
                     page_snapshot_id=page_snapshot_id,
                     dataset_id=dataset_id,  # Passage du dataset_id
                     index=i,
+                    cleaned_text_id=cleaned_text_id,
+                    excerpt=excerpt if isinstance(excerpt, str) else None,
                 )
 
                 qa_record.dataset_name = dataset_name
@@ -101,8 +151,21 @@ class QAService:
                 qa_records.append(qa_record)
                 self.db.add(qa_record)
 
+        new_ids = [record.id for record in qa_records]
+        if qa_records:
+            self.db.flush()
+            QALshBucket.add_records(
+                self.db,
+                (
+                    (record.id, record.dataset_id, record.question)
+                    for record in qa_records
+                ),
+            )
         self.db.commit()
 
+        if qa_records and dataset_id:
+            self.update_similarity_index(dataset_id, new_ids)
+
         logging.info(
             f"Added {len(qa_records)} new QA pairs, "
             f"skipped {exact_duplicates} exact duplicates, "
@@ -1,33 +1,75 @@
+import asyncio
 import logging
-import requests
+import httpx
 import re
-import time
 from scrapy import Selector
 from fake_useragent import UserAgent
 from sqlalchemy.orm import Session
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
 
 from server.core.config import config
+from server.core.http import get_http_client
 from server.models.scraper import PageSnapshot, CleanedText
 
 
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+RETRY_BACKOFF_FACTOR = 0.3
+
+
+def retry_after_delay(response: httpx.Response) -> Optional[float]:
+    """Returns the wait asked by a Retry-After header, in seconds or as a date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
 class ScraperService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, client: Optional[httpx.AsyncClient] = None):
         self.db = db
-
-    def _setup_session(self) -> requests.Session:
-        session = requests.Session()
-        retries = Retry(
-            total=config.max_retries,
-            backoff_factor=0.3,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=frozenset(["GET", "POST"]),
-        )
-        session.mount("https://", HTTPAdapter(max_retries=retries))
-        session.mount("http://", HTTPAdapter(max_retries=retries))
-        return session
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The given client, or the process-wide one shared by all the scrapes"""
+        return self._client or get_http_client()
+
+    async def _fetch(self, url: str, headers: dict) -> httpx.Response:
+        """GET a URL, retrying on 429 and 5xx responses
+
+        Waits as long as the Retry-After header asks, up to
+        HTTP_MAX_RETRY_DELAY, or with exponential backoff without one.
+        """
+        for attempt in range(config.max_retries + 1):
+            response = await self.client.get(url, headers=headers)
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == config.max_retries
+            ):
+                break
+            delay = retry_after_delay(response)
+            if delay is None:
+                delay = RETRY_BACKOFF_FACTOR * (2**attempt)
+            delay = min(delay, config.http_max_retry_delay)
+            logging.warning(
+                f"Got {response.status_code} for {url}, retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+        response.raise_for_status()
+        return response
 
     def _get_user_agent(self) -> str:
         try:
@@ -51,22 +93,21 @@ class ScraperService:
         self.db.commit()
         self.db.refresh(page_snapshot)
 
-    def scrape_url(self, url: str, dataset_id: str) -> PageSnapshot:
+    async def scrape_url(self, url: str, dataset_id: str) -> PageSnapshot:
         logging.info(f"Scraping URL: {url}")
 
-        session = self._setup_session()
         user_agent = self._get_user_agent()
         headers = {"User-Agent": user_agent}
 
         try:
-            response = session.get(url, headers=headers, timeout=config.timeout)
-            response.raise_for_status()
-        except requests.RequestException as e:
+            response = await self._fetch(url, headers)
+        except httpx.HTTPError as e:
             logging.error(f"Error scraping {url}: {e}")
             raise
 
-        text = self._extract_text(response.text)
-        time.sleep(config.scrape_delay)
+        # HTML parsing and DB writes are blocking, keep them off the event loop
+        text = await asyncio.to_thread(self._extract_text, response.text)
+        await asyncio.sleep(config.scrape_delay)
 
         url_hash = PageSnapshot.compute_hash_from_url(url)
         page_snapshot = PageSnapshot(
@@ -75,15 +116,44 @@ class ScraperService:
             content=text,
             retrieved_at=datetime.now(timezone.utc),
             url_hash=url_hash,
+            content_hash=PageSnapshot.compute_hash_from_content(text),
             dataset_id=dataset_id,
         )
-
-        self.db.add(page_snapshot)
-        self.db.commit()
-        self.db.refresh(page_snapshot)
+        await asyncio.to_thread(self.add_page_snapshot, page_snapshot)
 
         return page_snapshot
 
+    def get_page_snapshot(self, page_snapshot_id: str) -> Optional[PageSnapshot]:
+        """Retrieves a PageSnapshot by ID"""
+        return (
+            self.db.query(PageSnapshot)
+            .filter(PageSnapshot.id == page_snapshot_id)
+            .first()
+        )
+
+    def get_cleaned_text(self, cleaned_text_id: str) -> Optional[CleanedText]:
+        """Retrieves a CleanedText by ID"""
+        return (
+            self.db.query(CleanedText).filter(CleanedText.id == cleaned_text_id).first()
+        )
+
+    def find_cleaned_text(self, content_hash: str, model: str) -> Optional[CleanedText]:
+        """Finds a cleaned text produced by the same model for identical page content
+
+        Only texts cleaned in chunks of the current CLEANING_CHUNK_SIZE are
+        reused; older ones may miss the end of the page.
+        """
+        return (
+            self.db.query(CleanedText)
+            .join(PageSnapshot, CleanedText.page_snapshot_id == PageSnapshot.id)
+            .filter(
+                PageSnapshot.content_hash == content_hash,
+                CleanedText.model == model,
+                CleanedText.chunk_size == config.cleaning_chunk_size,
+            )
+            .first()
+        )
+
     def save_cleaned_text(
         self, page_snapshot_id: str, content: str, language: str, model: str
     ) -> CleanedText:
@@ -93,6 +163,7 @@ class ScraperService:
             content=content,
             language=language,
             model=model,
+            chunk_size=config.cleaning_chunk_size,
         )
 
         self.db.add(cleaned_text_record)
@@ -0,0 +1,934 @@
+import math
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from server.core.config import config
+from server.core.utils.minhash import normalize_text
+from server.core.utils.text import RatioFilter
+from server.services.embeddings import EmbeddingService, VectorIndex
+from server.models.dataset import (
+    QALshBucket,
+    QASimilarityFingerprint,
+    QASimilarityPair,
+    QASource,
+)
+
+# (index of the first text, index of the second text, similarity score)
+SimilarPair = Tuple[int, int, float]
+
+# Called with the completed share of the comparisons, from 0.0 to 1.0
+ProgressCallback = Callable[[float], None]
+
+# Called with the similar pairs as they are found, which are then not returned
+PairsCallback = Callable[[List[SimilarPair]], None]
+
+# Bins of the character histograms bounding the ratio of new rows; characters
+# sharing a bin only loosen the bound
+HISTOGRAM_BINS = 128
+
+
+class SimilarityMethod:
+    """Engines available to compare the questions of a dataset"""
+
+    AUTO = "auto"
+    EXACT = "exact"
+    TFIDF = "tfidf"
+    LSH = "lsh"
+    INDEX = "index"
+    EMBEDDING = "embedding"
+
+    ALL = (AUTO, EXACT, TFIDF, LSH, INDEX, EMBEDDING)
+
+
+# Texts shared with the worker processes of a sharded comparison
+_worker_texts: List[str] = []
+_worker_order: List[int] = []
+
+
+def _pack_texts(texts: List[str]) -> Tuple[str, np.ndarray]:
+    """Packs texts into one string and their offsets, sent once per worker"""
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+    return "".join(texts), offsets
+
+
+def _init_worker(joined: str, offsets: np.ndarray, order: np.ndarray) -> None:
+    global _worker_texts, _worker_order
+    bounds = offsets.tolist()
+    _worker_texts = [joined[bounds[k] : bounds[k + 1]] for k in range(len(bounds) - 1)]
+    _worker_order = order.tolist()
+
+
+def _scan_sorted_rows(
+    texts: List[str], order: List[int], start: int, end: int, threshold: float
+) -> Tuple[List[SimilarPair], int, int]:
+    """Compares rows [start, end) of the length order with the longer texts
+
+    Returns the similar pairs and the numbers of pairs considered and pruned.
+    """
+    ratio_filter = RatioFilter(threshold)
+    pairs = []
+
+    for position in range(start, end):
+        i = order[position]
+        length_i = len(texts[i])
+        for offset in range(position + 1, len(order)):
+            j = order[offset]
+            length = length_i + len(texts[j])
+            if length and 2.0 * length_i / length < threshold:
+                # Longer texts only lower the length bound further
+                ratio_filter.skip(len(order) - offset)
+                break
+
+            first, second = min(i, j), max(i, j)
+            similarity = ratio_filter.ratio(texts[first], texts[second])
+            if similarity is not None:
+                pairs.append((first, second, similarity))
+
+    return pairs, ratio_filter.considered, ratio_filter.pruned
+
+
+def _score_pairs(
+    texts: List[str], candidates: np.ndarray, threshold: float
+) -> Tuple[List[SimilarPair], int, int]:
+    """Compares candidate pairs (rows of i, j indices, i < j)"""
+    ratio_filter = RatioFilter(threshold)
+    pairs = []
+    for i, j in candidates.tolist():
+        similarity = ratio_filter.ratio(texts[i], texts[j])
+        if similarity is not None:
+            pairs.append((i, j, similarity))
+    return pairs, ratio_filter.considered, ratio_filter.pruned
+
+
+def _char_histograms(texts: List[str]) -> np.ndarray:
+    """Counts the characters of each text, code points binned modulo HISTOGRAM_BINS"""
+    histograms = np.zeros((len(texts), HISTOGRAM_BINS), dtype=np.int32)
+    for index, text in enumerate(texts):
+        if text:
+            codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+            histograms[index] = np.bincount(
+                codes % HISTOGRAM_BINS, minlength=HISTOGRAM_BINS
+            )
+    return histograms
+
+
+def _scan_new_rows(
+    texts: List[str],
+    pending: List[int],
+    threshold: float,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Tuple[List[SimilarPair], int, int]:
+    """Compares the ``pending`` rows (sorted) with all the others
+
+    Each pair is compared once. The texts whose length can reach the threshold
+    against a pending text are found by bisection, then the shared character
+    histogram bound of quick_ratio is computed for all of them at once; only
+    the remaining pairs go through RatioFilter.
+    """
+    ratio_filter = RatioFilter(threshold)
+    order = np.array(
+        sorted(range(len(texts)), key=lambda index: len(texts[index])), dtype=np.int64
+    )
+    text_lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    lengths = text_lengths[order]
+    histograms = _char_histograms(texts)
+    is_pending = np.zeros(len(texts), dtype=bool)
+    is_pending[pending] = True
+    pairs = []
+
+    for rank, i in enumerate(pending):
+        length_i = len(texts[i])
+        # 2 * min / (a + b) >= threshold bounds the length of the other text
+        low = length_i * threshold / (2.0 - threshold) if threshold < 2.0 else 0.0
+        high = length_i * (2.0 - threshold) / threshold if threshold > 0 else math.inf
+        window = order[
+            np.searchsorted(lengths, low - 1e-9, side="left") : np.searchsorted(
+                lengths, high + 1e-9, side="right"
+            )
+        ]
+        # Pairs with the pending rows before this one were already compared
+        window = window[(window != i) & ~((window < i) & is_pending[window])]
+
+        shared = np.minimum(histograms[window], histograms[i]).sum(axis=1)
+        total = text_lengths[window] + length_i
+        candidates = window[(total == 0) | (2.0 * shared >= threshold * total - 1e-9)]
+        ratio_filter.skip(len(texts) - 1 - rank - len(candidates))
+
+        for j in candidates.tolist():
+            first, second = min(i, j), max(i, j)
+            similarity = ratio_filter.ratio(texts[first], texts[second])
+            if similarity is not None:
+                pairs.append((first, second, similarity))
+
+        if on_progress:
+            on_progress((rank + 1) / len(pending))
+
+    return pairs, ratio_filter.considered, ratio_filter.pruned
+
+
+def _scan_sorted_rows_worker(start: int, end: int, threshold: float):
+    return _scan_sorted_rows(_worker_texts, _worker_order, start, end, threshold)
+
+
+def _score_pairs_worker(candidates: np.ndarray, threshold: float):
+    return _score_pairs(_worker_texts, candidates, threshold)
+
+
+def _run_shards(
+    texts: List[str],
+    scan: Callable,
+    worker: Callable,
+    tasks: List[Tuple[Any, ...]],
+    weights: List[int],
+    workers: int,
+    order: Optional[List[int]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    on_pairs: Optional[PairsCallback] = None,
+) -> Tuple[List[SimilarPair], int, int]:
+    """Runs comparison shards and merges their results
+
+    With several ``workers`` and shards, shards run on a process pool: texts
+    are sent once to each worker as a packed string and offsets, tasks only
+    carry row bounds or index arrays. Otherwise ``scan`` runs them in turn.
+    ``weights`` (pairs per shard) drive the progress reported after each one,
+    and ``on_pairs`` receives the pairs of each shard instead of the result.
+    """
+    pairs: List[SimilarPair] = []
+    considered = pruned = done = 0
+    total = sum(weights) or 1
+
+    def merge(result: Tuple[List[SimilarPair], int, int], weight: int) -> None:
+        nonlocal considered, pruned, done
+        if on_pairs:
+            on_pairs(sorted(result[0]))
+        else:
+            pairs.extend(result[0])
+        considered += result[1]
+        pruned += result[2]
+        done += weight
+        if on_progress:
+            on_progress(done / total)
+
+    if workers > 1 and len(tasks) > 1:
+        joined, offsets = _pack_texts(texts)
+        # Spawned workers do not inherit the threads and connections of the server
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(joined, offsets, np.asarray(order or [], dtype=np.int64)),
+        ) as executor:
+            for result, weight in zip(executor.map(worker, *zip(*tasks)), weights):
+                merge(result, weight)
+    else:
+        for task, weight in zip(tasks, weights):
+            merge(scan(*task), weight)
+
+    return pairs, considered, pruned
+
+
+class ExactSimilarityEngine:
+    """Compares every pair of texts with SequenceMatcher (quadratic, exact)
+
+    Texts are visited by increasing length, so once a text is too long to
+    reach the threshold against another, all the following ones are skipped;
+    the remaining pairs go through the bounds of RatioFilter. With several
+    ``workers``, shards of ``chunk_size`` rows run on a process pool.
+    """
+
+    method = SimilarityMethod.EXACT
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workers = max(1, workers or config.similarity_workers)
+        self.chunk_size = max(1, chunk_size or config.similarity_chunk_size)
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float,
+        on_progress: Optional[ProgressCallback] = None,
+        on_pairs: Optional[PairsCallback] = None,
+    ) -> List[SimilarPair]:
+        """Returns the pairs (i, j), i < j, whose ratio reaches the threshold"""
+        n = len(texts)
+        order = sorted(range(n), key=lambda index: len(texts[index]))
+
+        bounds = [
+            (start, min(n, start + self.chunk_size))
+            for start in range(0, n, self.chunk_size)
+        ]
+        # Row p of the length order is compared with the n - p - 1 next ones
+        weights = [
+            sum(n - position - 1 for position in range(start, end))
+            for start, end in bounds
+        ]
+        pairs, considered, pruned = _run_shards(
+            texts,
+            partial(_scan_sorted_rows, texts, order),
+            _scan_sorted_rows_worker,
+            [(start, end, threshold) for start, end in bounds],
+            weights,
+            self.workers,
+            order,
+            on_progress,
+            on_pairs,
+        )
+
+        self.pairs_considered = considered
+        self.pairs_pruned = pruned
+        return sorted(pairs)
+
+
+class TfidfSimilarityEngine:
+    """Cosine similarity of character n-gram TF-IDF vectors
+
+    Vectors are stored sparse and densified one block of rows at a time, so
+    the pairwise scores are computed by matrix products of
+    ``block_size x max_features`` tiles and memory stays bounded whatever the
+    number of texts. N-grams found in a single text cannot contribute to a
+    pair and are only used for the norms.
+
+    Scores are cosines, not SequenceMatcher ratios: small edits cost more, so
+    thresholds are usually set a little lower than in exact mode.
+    """
+
+    method = SimilarityMethod.TFIDF
+
+    # Absorbs float32 rounding so that identical texts reach a threshold of 1.0
+    EPSILON = 1e-6
+
+    def __init__(
+        self,
+        ngram_size: int = 3,
+        block_size: Optional[int] = None,
+        max_features: Optional[int] = None,
+    ):
+        self.ngram_size = ngram_size
+        self.block_size = max(1, block_size or config.similarity_block_size)
+        self.max_features = max(1, max_features or config.similarity_max_features)
+        # Every pair is scored by the matrix products, none is pruned
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def _ngrams(self, text: str) -> List[str]:
+        # Case and punctuation do not make two questions different
+        text = f" {normalize_text(text)} "
+        if len(text) <= self.ngram_size:
+            return [text]
+        return [
+            text[i : i + self.ngram_size]
+            for i in range(len(text) - self.ngram_size + 1)
+        ]
+
+    def vectorize(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Builds the L2-normalized TF-IDF matrix in CSR form (indptr, indices, data)"""
+        counts = [Counter(self._ngrams(text)) for text in texts]
+        document_frequency: Counter = Counter()
+        for text_counts in counts:
+            document_frequency.update(text_counts.keys())
+
+        n = len(texts)
+        idf = {
+            ngram: math.log((1 + n) / (1 + df)) + 1
+            for ngram, df in document_frequency.items()
+        }
+        shared = [ngram for ngram, df in document_frequency.items() if df > 1]
+        shared.sort(key=lambda ngram: (-document_frequency[ngram], ngram))
+        vocabulary: Dict[str, int] = {
+            ngram: index for index, ngram in enumerate(shared[: self.max_features])
+        }
+
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for text_counts in counts:
+            weights = {ngram: tf * idf[ngram] for ngram, tf in text_counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            for ngram, weight in weights.items():
+                index = vocabulary.get(ngram)
+                if index is not None:
+                    indices.append(index)
+                    data.append(weight / norm)
+            indptr.append(len(indices))
+
+        return (
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64),
+            np.asarray(data, dtype=np.float32),
+        )
+
+    @staticmethod
+    def _densify(
+        matrix: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        start: int,
+        end: int,
+        n_features: int,
+    ) -> np.ndarray:
+        indptr, indices, data = matrix
+        block = np.zeros((end - start, n_features), dtype=np.float32)
+        lo, hi = indptr[start], indptr[end]
+        rows = np.repeat(np.arange(end - start), np.diff(indptr[start : end + 1]))
+        block[rows, indices[lo:hi]] = data[lo:hi]
+        return block
+
+    def find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float,
+        on_progress: Optional[ProgressCallback] = None,
+        on_pairs: Optional[PairsCallback] = None,
+    ) -> List[SimilarPair]:
+        """Returns the pairs (i, j), i < j, whose cosine reaches the threshold"""
+        n = len(texts)
+        if n < 2:
+            return []
+
+        self.pairs_considered = n * (n - 1) // 2
+        matrix = self.vectorize(texts)
+        n_features = max(1, int(matrix[1].max()) + 1) if len(matrix[1]) else 1
+        pairs: List[SimilarPair] = []
+
+        for row_start in range(0, n, self.block_size):
+            row_end = min(n, row_start + self.block_size)
+            rows = self._densify(matrix, row_start, row_end, n_features)
+            block_pairs: List[SimilarPair] = []
+
+            for col_start in range(row_start, n, self.block_size):
+                col_end = min(n, col_start + self.block_size)
+                cols = (
+                    rows
+                    if col_start == row_start
+                    else self._densify(matrix, col_start, col_end, n_features)
+                )
+                scores = rows @ cols.T
+                mask = scores >= threshold - self.EPSILON
+                if col_start == row_start:
+                    # Only keep j > i inside a diagonal tile
+                    mask = np.triu(mask, k=1)
+
+                for i, j in zip(*np.nonzero(mask)):
+                    block_pairs.append(
+                        (
+                            row_start + int(i),
+                            col_start + int(j),
+                            min(1.0, float(scores[i, j])),
+                        )
+                    )
+
+            if on_pairs:
+                on_pairs(block_pairs)
+            else:
+                pairs.extend(block_pairs)
+            if on_progress:
+                # Pairs of the rows done so far, out of n * (n - 1) / 2
+                on_progress(1.0 - (n - row_end) * (n - row_end - 1) / (n * (n - 1)))
+
+        return pairs
+
+
+class LshSimilarityEngine:
+    """Compares exactly only the pairs colliding in the MinHash LSH index
+
+    Uses the index persisted for a dataset (``QALshBucket``), so the work is
+    roughly linear in the number of records. ``dataset_id`` may also be a list
+    of datasets compared together, through their shared bucket keys.
+    ``record_ids`` are the IDs of the texts, in the same order. With
+    ``record_groups`` (one key per text, e.g. its dataset), only the pairs of
+    texts from different groups are compared. With several ``workers``,
+    shards of ``chunk_size`` candidate pairs run on a process pool.
+    """
+
+    method = SimilarityMethod.LSH
+
+    def __init__(
+        self,
+        db: Session,
+        dataset_id: Union[str, List[str]],
+        record_ids: List[str],
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        record_groups: Optional[List[Any]] = None,
+    ):
+        self.db = db
+        self.dataset_id = dataset_id
+        self.record_ids = record_ids
+        self.record_groups = record_groups
+        self.workers = max(1, workers or config.similarity_workers)
+        self.chunk_size = max(1, chunk_size or config.similarity_chunk_size)
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float,
+        on_progress: Optional[ProgressCallback] = None,
+        on_pairs: Optional[PairsCallback] = None,
+    ) -> List[SimilarPair]:
+        """Returns the colliding pairs (i, j), i < j, whose ratio reaches the threshold"""
+        QALshBucket.ensure_index(self.db, self.dataset_id)
+        positions = {record_id: i for i, record_id in enumerate(self.record_ids)}
+
+        groups = self.record_groups
+        candidates = np.array(
+            sorted(
+                sorted((positions[id1], positions[id2]))
+                for id1, id2 in QALshBucket.candidate_pairs(self.db, self.dataset_id)
+                if id1 in positions
+                and id2 in positions
+                and (groups is None or groups[positions[id1]] != groups[positions[id2]])
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+
+        shards = [
+            candidates[start : start + self.chunk_size]
+            for start in range(0, len(candidates), self.chunk_size)
+        ]
+        pairs, considered, pruned = _run_shards(
+            texts,
+            partial(_score_pairs, texts),
+            _score_pairs_worker,
+            [(shard, threshold) for shard in shards],
+            [len(shard) for shard in shards],
+            self.workers,
+            on_progress=on_progress,
+            on_pairs=on_pairs,
+        )
+
+        self.pairs_considered = considered
+        self.pairs_pruned = pruned
+        return sorted(pairs)
+
+
+class SimilarityIndex:
+    """Similar pairs of a dataset scoring at least a floor, kept up to date
+
+    Each indexed record has a fingerprint of its question. Records without one
+    (new) or with another one (edited, or indexed with another floor) are
+    compared with every other record by ``refresh`` and their pairs reaching
+    the floor are stored, so an analysis at any threshold at or above the
+    floor only compares the records added since the previous one.
+    """
+
+    # Rows inserted or deleted per statement
+    BATCH_SIZE = 500
+
+    def __init__(self, db: Session, dataset_id: str, floor: Optional[float] = None):
+        self.db = db
+        self.dataset_id = dataset_id
+        self.floor = config.similarity_index_floor if floor is None else floor
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def indexed_count(self) -> int:
+        """Returns the number of records indexed with the current floor"""
+        return (
+            self.db.query(QASimilarityFingerprint)
+            .filter(
+                QASimilarityFingerprint.dataset_id == self.dataset_id,
+                QASimilarityFingerprint.floor == self.floor,
+            )
+            .count()
+        )
+
+    def pending(self, record_ids: List[str], texts: List[str]) -> List[int]:
+        """Returns the positions of the records missing from the index or stale"""
+        indexed = dict(
+            self.db.query(
+                QASimilarityFingerprint.qa_source_id,
+                QASimilarityFingerprint.fingerprint,
+            ).filter(
+                QASimilarityFingerprint.dataset_id == self.dataset_id,
+                QASimilarityFingerprint.floor == self.floor,
+            )
+        )
+        return [
+            position
+            for position, (record_id, text) in enumerate(zip(record_ids, texts))
+            if indexed.get(record_id) != QASimilarityFingerprint.compute(text)
+        ]
+
+    def refresh(
+        self,
+        record_ids: List[str],
+        texts: List[str],
+        max_pending: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> bool:
+        """Indexes the pending records of the dataset; does not commit
+
+        ``record_ids`` and ``texts`` are all the records of the dataset.
+        Returns False, leaving the index as is, when more than ``max_pending``
+        records are pending.
+        """
+        pending = self.pending(record_ids, texts)
+        if not pending:
+            return True
+        if max_pending is not None and len(pending) > max_pending:
+            return False
+
+        self._index(record_ids, texts, pending, on_progress)
+        return True
+
+    def add_records(
+        self, new_ids: List[str], max_pending: Optional[int] = None
+    ) -> bool:
+        """Indexes records just added to the dataset; does not commit
+
+        Unlike ``refresh``, only the new records and the records whose
+        question length lets them reach the floor against one of them are
+        loaded, so the cost grows with the number of new records rather than
+        with the dataset. Returns False, leaving the index as is, when the
+        dataset has more than ``max_pending`` unindexed records.
+        """
+        if not new_ids:
+            return True
+        if max_pending is not None:
+            indexed = (
+                self.db.query(QASimilarityFingerprint.qa_source_id)
+                .filter(
+                    QASimilarityFingerprint.qa_source_id == QASource.id,
+                    QASimilarityFingerprint.floor == self.floor,
+                )
+                .exists()
+            )
+            unindexed = (
+                self.db.query(func.count(QASource.id))
+                .filter(QASource.dataset_id == self.dataset_id, ~indexed)
+                .scalar()
+            )
+            if unindexed > max_pending:
+                return False
+
+        question = QASource.input["question"].as_string()
+        length = func.coalesce(func.length(question), 0)
+        new_lengths = [
+            row[0]
+            for row in self.db.query(length).filter(
+                QASource.dataset_id == self.dataset_id, QASource.id.in_(new_ids)
+            )
+        ]
+        if not new_lengths:
+            return True
+        # 2 * min / (a + b) >= floor bounds the length of the other question
+        in_window = length >= math.floor(
+            min(new_lengths) * self.floor / (2.0 - self.floor)
+        )
+        if self.floor > 0:
+            in_window &= length <= math.ceil(
+                max(new_lengths) * (2.0 - self.floor) / self.floor
+            )
+
+        # Same order as DatasetQuestions, so pairs are scored the same way round
+        rows = (
+            self.db.query(QASource.id, question)
+            .filter(
+                QASource.dataset_id == self.dataset_id,
+                or_(QASource.id.in_(new_ids), in_window),
+            )
+            .order_by(QASource.created_at, QASource.id)
+            .all()
+        )
+        record_ids = [row[0] for row in rows]
+        texts = [row[1] or "" for row in rows]
+        new = set(new_ids)
+        self._index(
+            record_ids,
+            texts,
+            [
+                position
+                for position, record_id in enumerate(record_ids)
+                if record_id in new
+            ],
+        )
+        return True
+
+    def _index(
+        self,
+        record_ids: List[str],
+        texts: List[str],
+        pending: List[int],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        """Stores the pairs of the ``pending`` records with all the ``texts``"""
+        # Compared before any write, so no lock is held while progress is reported
+        pairs, self.pairs_considered, self.pairs_pruned = _scan_new_rows(
+            texts, pending, self.floor, on_progress
+        )
+        pending_ids = [record_ids[position] for position in pending]
+        self.remove_records(self.db, pending_ids)
+
+        rows = [
+            {
+                "dataset_id": self.dataset_id,
+                "record1_id": record_ids[i],
+                "record2_id": record_ids[j],
+                "score": similarity,
+            }
+            for i, j, similarity in pairs
+        ]
+        for offset in range(0, len(rows), self.BATCH_SIZE):
+            self.db.execute(
+                insert(QASimilarityPair), rows[offset : offset + self.BATCH_SIZE]
+            )
+
+        fingerprints = [
+            {
+                "qa_source_id": record_ids[position],
+                "dataset_id": self.dataset_id,
+                "fingerprint": QASimilarityFingerprint.compute(texts[position]),
+                "floor": self.floor,
+            }
+            for position in pending
+        ]
+        for offset in range(0, len(fingerprints), self.BATCH_SIZE):
+            self.db.execute(
+                insert(QASimilarityFingerprint),
+                fingerprints[offset : offset + self.BATCH_SIZE],
+            )
+
+    def pairs(self, threshold: float) -> List[Tuple[str, str, float]]:
+        """Returns the indexed (record1_id, record2_id, score) reaching a threshold"""
+        if threshold < self.floor:
+            raise ValueError(
+                f"The similarity index only holds pairs scoring at least {self.floor}"
+            )
+        return [
+            tuple(row)
+            for row in self.db.query(
+                QASimilarityPair.record1_id,
+                QASimilarityPair.record2_id,
+                QASimilarityPair.score,
+            ).filter(
+                QASimilarityPair.dataset_id == self.dataset_id,
+                QASimilarityPair.score >= threshold,
+            )
+        ]
+
+    @classmethod
+    def remove_records(cls, db: Session, qa_source_ids: List[str]) -> None:
+        """Removes records and their pairs from the index; does not commit"""
+        for offset in range(0, len(qa_source_ids), cls.BATCH_SIZE):
+            batch = qa_source_ids[offset : offset + cls.BATCH_SIZE]
+            db.query(QASimilarityPair).filter(
+                or_(
+                    QASimilarityPair.record1_id.in_(batch),
+                    QASimilarityPair.record2_id.in_(batch),
+                )
+            ).delete(synchronize_session=False)
+            db.query(QASimilarityFingerprint).filter(
+                QASimilarityFingerprint.qa_source_id.in_(batch)
+            ).delete(synchronize_session=False)
+
+
+class IndexedSimilarityEngine:
+    """Reads the similar pairs from the persisted similarity index
+
+    Only the records added or edited since the index was last refreshed are
+    compared, with SequenceMatcher, before the pairs reaching the threshold
+    are read. Scores are the same as in exact mode; the threshold cannot be
+    lower than the floor of the index. ``record_ids`` are the IDs of the
+    texts, in the same order. The pending records are stored in the index and
+    committed, unless ``read_only``: their pairs are then only kept in memory.
+    """
+
+    method = SimilarityMethod.INDEX
+
+    def __init__(
+        self,
+        db: Session,
+        dataset_id: str,
+        record_ids: List[str],
+        floor: Optional[float] = None,
+        read_only: bool = False,
+    ):
+        self.index = SimilarityIndex(db, dataset_id, floor)
+        self.record_ids = record_ids
+        self.read_only = read_only
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float,
+        on_progress: Optional[ProgressCallback] = None,
+        on_pairs: Optional[PairsCallback] = None,
+    ) -> List[SimilarPair]:
+        """Returns the indexed pairs (i, j), i < j, whose ratio reaches the threshold"""
+        if threshold < self.index.floor:
+            raise ValueError(
+                f"The index similarity method needs a threshold of at least "
+                f"{self.index.floor}"
+            )
+        if self.read_only:
+            pending = self.index.pending(self.record_ids, texts)
+            pairs, self.pairs_considered, self.pairs_pruned = (
+                _scan_new_rows(texts, pending, threshold, on_progress)
+                if pending
+                else ([], 0, 0)
+            )
+            # The indexed pairs of the pending records may be stale
+            stale = {self.record_ids[position] for position in pending}
+        else:
+            self.index.refresh(self.record_ids, texts, on_progress=on_progress)
+            self.index.db.commit()
+            self.pairs_considered = self.index.pairs_considered
+            self.pairs_pruned = self.index.pairs_pruned
+            pairs, stale = [], set()
+
+        positions = {record_id: i for i, record_id in enumerate(self.record_ids)}
+        for id1, id2, similarity in self.index.pairs(threshold):
+            if id1 in positions and id2 in positions and not {id1, id2} & stale:
+                i, j = sorted((positions[id1], positions[id2]))
+                pairs.append((i, j, similarity))
+        if on_pairs:
+            on_pairs(sorted(pairs))
+            return []
+        return sorted(pairs)
+
+
+class EmbeddingSimilarityEngine:
+    """Cosine similarity of question embeddings, which also catches paraphrases
+
+    Embeddings come from the embeddings endpoint, cached by text hash, and
+    are kept in the memory-mapped vector file of the dataset; large datasets
+    are searched through its IVF partition. ``record_ids`` are the IDs of the
+    texts, in the same order.
+    """
+
+    method = SimilarityMethod.EMBEDDING
+
+    def __init__(
+        self,
+        db: Session,
+        dataset_id: str,
+        record_ids: List[str],
+        service: Optional[EmbeddingService] = None,
+        index: Optional[VectorIndex] = None,
+    ):
+        self.record_ids = record_ids
+        self.service = service or EmbeddingService(db)
+        self.index = index or VectorIndex(dataset_id)
+        self.pairs_considered = 0
+        self.pairs_pruned = 0
+
+    def find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float,
+        on_progress: Optional[ProgressCallback] = None,
+        on_pairs: Optional[PairsCallback] = None,
+    ) -> List[SimilarPair]:
+        """Returns the pairs (i, j), i < j, whose cosine reaches the threshold"""
+        vectors = self.index.sync(self.record_ids, texts, self.service)
+        pairs = self.index.similar_pairs(vectors, threshold, on_progress)
+
+        n = len(texts)
+        self.pairs_considered = n * (n - 1) // 2
+        # Pairs outside the probed IVF lists are never scored
+        self.pairs_pruned = max(0, self.pairs_considered - self.index.pairs_scored)
+        if on_pairs:
+            on_pairs(sorted(pairs))
+            return []
+        return sorted(pairs)
+
+
+def cluster_similar_pairs(n: int, pairs: List[SimilarPair]) -> List[List[int]]:
+    """Groups texts linked by similar pairs (union-find); returns clusters of 2+
+
+    Clusters are transitive: if a ~ b and b ~ c, a, b and c are grouped even
+    when a and c are not similar themselves.
+    """
+    parents = list(range(n))
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            # Path halving keeps the trees flat
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def get_similarity_engine(
+    method: str = SimilarityMethod.AUTO,
+    n_texts: int = 0,
+    db: Optional[Session] = None,
+    dataset_id: Optional[str] = None,
+    record_ids: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    threshold: Optional[float] = None,
+    ratio_only: bool = False,
+    read_only: bool = False,
+):
+    """Returns the engine for a method
+
+    ``auto`` reads the similarity index when the threshold is at or above its
+    floor and the dataset is small or already (nearly) indexed. Otherwise it
+    keeps exact scores for small datasets, then uses TF-IDF and, for the
+    largest datasets, the LSH index. With ``ratio_only``, ``auto`` keeps the
+    SequenceMatcher ratio whatever the size: the index when the threshold
+    allows it, exact scores otherwise. ``read_only`` keeps the index engine
+    from storing the records it compares. The index, LSH and embedding engines
+    need the session, dataset and record IDs. ``workers`` overrides SIMILARITY_WORKERS
+    for the engines comparing pairs with SequenceMatcher.
+    """
+    if method not in SimilarityMethod.ALL:
+        raise ValueError(
+            f"Unknown similarity method '{method}'. "
+            f"Available methods: {list(SimilarityMethod.ALL)}"
+        )
+
+    can_use_index = db is not None and dataset_id is not None and record_ids is not None
+    if method == SimilarityMethod.AUTO:
+        if (
+            can_use_index
+            and threshold is not None
+            and threshold >= config.similarity_index_floor
+            and (
+                ratio_only
+                or n_texts <= config.similarity_exact_max_records
+                or SimilarityIndex(db, dataset_id).indexed_count()
+                >= n_texts - config.similarity_index_max_pending
+            )
+        ):
+            method = SimilarityMethod.INDEX
+        elif ratio_only or n_texts <= config.similarity_exact_max_records:
+            method = SimilarityMethod.EXACT
+        elif n_texts <= config.similarity_tfidf_max_records or not can_use_index:
+            method = SimilarityMethod.TFIDF
+        else:
+            method = SimilarityMethod.LSH
+
+    if method == SimilarityMethod.EXACT:
+        return ExactSimilarityEngine(workers=workers)
+    if method == SimilarityMethod.TFIDF:
+        return TfidfSimilarityEngine()
+    if not can_use_index:
+        raise ValueError(f"The {method} similarity method needs a dataset")
+    if method == SimilarityMethod.INDEX:
+        return IndexedSimilarityEngine(db, dataset_id, record_ids, read_only=read_only)
+    if method == SimilarityMethod.EMBEDDING:
+        return EmbeddingSimilarityEngine(db, dataset_id, record_ids)
+    return LshSimilarityEngine(db, dataset_id, record_ids, workers=workers)
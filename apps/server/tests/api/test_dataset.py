@@ -2,10 +2,25 @@
 Tests for dataset API endpoints.
 """
 
+import json
+from unittest.mock import Mock, patch
+
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from server.models.dataset import Dataset, QASource
+from server.models.dataset import Dataset, QASimilarityFingerprint, QASource
+from server.models.job import JobKind, JobStatus
+from server.services.job import JobService
+
+
+@pytest.fixture
+def mock_job_runner():
+    """Mock the background job runner"""
+    with patch("server.api.generate.get_job_runner") as mock:
+        runner = Mock()
+        mock.return_value = runner
+        yield runner
 
 
 def test_create_dataset_success(client: TestClient, sample_dataset_data: dict):
@@ -240,6 +255,115 @@ def test_analyze_similarities_success(
     assert data["dataset_id"] == dataset.id
 
 
+def test_analyze_similarities_tfidf_method(
+    client: TestClient, test_db: Session, sample_dataset_data: dict
+):
+    """Test analyze similarities with the TF-IDF engine."""
+    dataset = Dataset(name=sample_dataset_data["name"])
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+
+    for question in ["What is Python?", "What is Python ?", "How do planes fly?"]:
+        test_db.add(
+            QASource.from_qa_generation(
+                question=question,
+                answer="An answer",
+                context="A context",
+                confidence=0.9,
+                source_url="https://example.com",
+                dataset_id=str(dataset.id),
+            )
+        )
+    test_db.commit()
+
+    response = client.get(
+        f"/dataset/{dataset.id}/analyze-similarities",
+        params={"threshold": 0.9, "method": "tfidf"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["similar_pairs_found"] == 1
+    assert {
+        data["similarities"][0]["question1"],
+        data["similarities"][0]["question2"],
+    } == {
+        "What is Python?",
+        "What is Python ?",
+    }
+
+
+def test_analyze_similarities_does_not_write_index(
+    client: TestClient, test_db: Session, sample_dataset_data: dict
+):
+    """Test analyzing reads the similarity index, only cleaning updates it."""
+    dataset = Dataset(name=sample_dataset_data["name"])
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+
+    for question in ["What is Python?", "What is Python ?", "How do planes fly?"]:
+        test_db.add(
+            QASource.from_qa_generation(
+                question=question,
+                answer="An answer",
+                context="A context",
+                confidence=0.9,
+                source_url="https://example.com",
+                dataset_id=str(dataset.id),
+            )
+        )
+    test_db.commit()
+
+    for method in ("auto", "index"):
+        response = client.get(
+            f"/dataset/{dataset.id}/analyze-similarities",
+            params={"threshold": 0.9, "method": method},
+        )
+        assert response.status_code == 200
+        assert response.json()["similar_pairs_found"] == 1
+    assert test_db.query(QASimilarityFingerprint).count() == 0
+
+    response = client.post(
+        f"/dataset/{dataset.id}/clean-similarities",
+        params={"threshold": 0.9, "method": "index", "dry_run": True},
+    )
+    assert response.status_code == 200
+    assert test_db.query(QASimilarityFingerprint).count() == 3
+
+
+def test_analyze_similarities_unknown_method(
+    client: TestClient, test_db: Session, sample_dataset_data: dict
+):
+    """Test analyze similarities rejects an unknown engine."""
+    dataset = Dataset(name=sample_dataset_data["name"])
+    test_db.add(dataset)
+    test_db.commit()
+
+    response = client.get(
+        f"/dataset/{dataset.id}/analyze-similarities", params={"method": "fuzzy"}
+    )
+    assert response.status_code == 422
+
+
+def test_similarities_invalid_workers(
+    client: TestClient, test_db: Session, sample_dataset_data: dict
+):
+    """Test analyze and clean reject a worker count below one."""
+    dataset = Dataset(name=sample_dataset_data["name"])
+    test_db.add(dataset)
+    test_db.commit()
+
+    response = client.get(
+        f"/dataset/{dataset.id}/analyze-similarities", params={"workers": 0}
+    )
+    assert response.status_code == 422
+    response = client.post(
+        f"/dataset/{dataset.id}/clean-similarities", params={"workers": 0}
+    )
+    assert response.status_code == 422
+
+
 def test_clean_similarities_success(
     client: TestClient, test_db: Session, sample_dataset_data: dict
 ):
@@ -272,3 +396,233 @@ def test_clean_similarities_success(
     data = response.json()
     assert "dataset_id" in data
     assert "removed_records" in data
+
+
+def test_analyze_similarities_in_background(
+    client: TestClient, test_db: Session, mock_job_runner
+):
+    """Test background=true schedules an analysis job and returns 202."""
+    dataset = Dataset(name="background_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+
+    response = client.get(
+        f"/dataset/{dataset.id}/analyze-similarities",
+        params={"threshold": 0.7, "method": "tfidf", "background": True},
+    )
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data["kind"] == JobKind.ANALYZE_SIMILARITIES
+    assert data["status"] == JobStatus.PENDING
+    assert response.headers["location"] == f"/dataset/jobs/{data['task_id']}"
+    mock_job_runner.submit.assert_called_once_with(data["task_id"])
+
+    job = JobService(test_db).get_job(data["task_id"])
+    assert job.payload == {
+        "dataset_id": dataset.id,
+        "threshold": 0.7,
+        "method": "tfidf",
+        "workers": None,
+    }
+
+
+def test_clean_similarities_in_background_dataset_not_found(
+    client: TestClient, mock_job_runner
+):
+    """Test no job is scheduled for an unknown dataset."""
+    response = client.post(
+        "/dataset/nonexistent-id/clean-similarities", params={"background": True}
+    )
+
+    assert response.status_code == 404
+    mock_job_runner.submit.assert_not_called()
+
+
+def _add_similar_records(test_db: Session) -> Dataset:
+    dataset = Dataset(name="stream_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    for index, question in enumerate(["What is Python?", "What is Python ?"]):
+        test_db.add(
+            QASource.from_qa_generation(
+                question=question,
+                answer="A programming language",
+                context=f"Context {index}",
+                source_url="https://example.com",
+                dataset_id=dataset.id,
+            )
+        )
+    test_db.commit()
+    return dataset
+
+
+def test_analyze_similarities_stream(client: TestClient, test_db: Session):
+    """Test stream=true answers with NDJSON lines."""
+    dataset = _add_similar_records(test_db)
+
+    response = client.get(
+        f"/dataset/{dataset.id}/analyze-similarities",
+        params={"threshold": 0.9, "stream": True},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["dataset", "pair", "summary"]
+    assert lines[1]["question1"] in ("What is Python?", "What is Python ?")
+
+
+def test_analyze_similarities_stream_not_found(client: TestClient):
+    """Test an unknown dataset is a 404, not a stream."""
+    response = client.get(
+        "/dataset/nonexistent-id/analyze-similarities", params={"stream": True}
+    )
+
+    assert response.status_code == 404
+
+
+def test_clean_similarities_stream_dry_run(client: TestClient, test_db: Session):
+    """Test a streamed dry run lists the removal and keeps the records."""
+    dataset = _add_similar_records(test_db)
+
+    response = client.post(
+        f"/dataset/{dataset.id}/clean-similarities",
+        params={"threshold": 0.9, "stream": True, "dry_run": True},
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["dataset", "removal", "summary"]
+    assert lines[-1]["dry_run"] is True
+    assert test_db.query(QASource).count() == 2
+
+
+def test_clean_similarities_dry_run(client: TestClient, test_db: Session):
+    """Test dry_run=true reports the removals without deleting."""
+    dataset = _add_similar_records(test_db)
+
+    response = client.post(
+        f"/dataset/{dataset.id}/clean-similarities",
+        params={"threshold": 0.9, "dry_run": True},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dry_run"] is True
+    assert data["removed_records"] == 1
+    assert test_db.query(QASource).count() == 2
+
+
+def test_similarities_stream_and_background(client: TestClient, mock_job_runner):
+    """Test a stream cannot also be a background job."""
+    response = client.get(
+        "/dataset/some-id/analyze-similarities",
+        params={"stream": True, "background": True},
+    )
+
+    assert response.status_code == 400
+    mock_job_runner.submit.assert_not_called()
+
+
+def test_global_duplicates(client: TestClient, test_db: Session):
+    """Test duplicate clusters are reported across datasets."""
+    datasets = []
+    for name in ("first", "second"):
+        dataset = Dataset(name=name)
+        test_db.add(dataset)
+        test_db.commit()
+        test_db.add(
+            QASource.from_qa_generation(
+                question="What is Python?",
+                answer="A programming language",
+                context=f"{name} context",
+                source_url="https://example.com",
+                dataset_id=dataset.id,
+            )
+        )
+        datasets.append(dataset)
+    test_db.commit()
+
+    response = client.get(
+        "/dataset/global-duplicates",
+        params={"dataset_ids": [d.id for d in datasets], "threshold": 0.9},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["clusters_found"] == data["cross_dataset_clusters"] == 1
+    assert {r["dataset_name"] for r in data["clusters"][0]["records"]} == {
+        "first",
+        "second",
+    }
+
+
+def test_global_duplicates_dataset_not_found(client: TestClient, mock_job_runner):
+    """Test unknown datasets are rejected, with or without a background job."""
+    response = client.get(
+        "/dataset/global-duplicates", params={"dataset_ids": ["missing"]}
+    )
+    assert response.status_code == 404
+
+    response = client.get(
+        "/dataset/global-duplicates",
+        params={"dataset_ids": ["missing"], "background": True},
+    )
+    assert response.status_code == 404
+    mock_job_runner.submit.assert_not_called()
+
+
+def test_global_duplicates_in_background(
+    client: TestClient, test_db: Session, mock_job_runner
+):
+    """Test background=true schedules a global duplicates job."""
+    response = client.get(
+        "/dataset/global-duplicates",
+        params={"cross_dataset_only": True, "background": True},
+    )
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data["kind"] == JobKind.GLOBAL_DUPLICATES
+    job = JobService(test_db).get_job(data["task_id"])
+    assert job.payload == {
+        "dataset_ids": None,
+        "threshold": 0.8,
+        "cross_dataset_only": True,
+        "workers": None,
+    }
+
+
+def test_get_similarity_job_results_by_page(client: TestClient, test_db: Session):
+    """Test the similarities of a finished job are paged."""
+    service = JobService(test_db)
+    job = service.create_job(JobKind.ANALYZE_SIMILARITIES, {"dataset_id": "d1"}, 0)
+    similarities = [{"record1_id": str(i), "similarity": 0.9} for i in range(5)]
+
+    response = client.get(f"/dataset/jobs/{job.id}/results")
+    assert response.status_code == 409
+
+    service.complete_job(
+        job.id,
+        result={"similar_pairs_found": 5, "similarities": similarities},
+        urls_processed=0,
+        qa_pairs_generated=0,
+    )
+
+    status_response = client.get(f"/dataset/jobs/{job.id}")
+    assert status_response.json()["result"] == {"similar_pairs_found": 5}
+
+    response = client.get(
+        f"/dataset/jobs/{job.id}/results", params={"offset": 2, "limit": 2}
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert page["field"] == "similarities"
+    assert page["total"] == 5
+    assert page["items"] == similarities[2:4]
+
+    response = client.get(
+        f"/dataset/jobs/{job.id}/results", params={"field": "unknown"}
+    )
+    assert response.status_code == 404
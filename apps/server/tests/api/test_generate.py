@@ -6,6 +6,8 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from server.main import app
+from server.models.job import JobKind, JobStatus
+from server.schemas.scraper import ScrapingMetrics
 
 client = TestClient(app)
 
@@ -16,6 +18,7 @@ def mock_pipeline():
     with patch("server.api.generate.DatasetPipeline") as mock:
         pipeline_instance = Mock()
         pipeline_instance.process_url = AsyncMock()
+        pipeline_instance.process_urls = AsyncMock()
         mock.return_value = pipeline_instance
         yield pipeline_instance
 
@@ -303,3 +306,225 @@ class TestGenerateDataset:
 
         assert response.status_code == 500
         assert "dataset id" in response.json()["detail"].lower()
+
+    def test_create_dataset_reports_cleaned_text_reuse(
+        self, mock_pipeline, valid_request_data, db: Session
+    ):
+        """Test that cleaned text reuse is reported in the response"""
+        mock_pipeline.process_url.return_value = {
+            "qa_pairs": [],
+            "total": 0,
+            "exact_duplicates": 0,
+            "similar_duplicates": 0,
+            "cleaned_text_reused": True,
+            "dataset_id": "test-id-reuse",
+        }
+
+        response = client.post("/dataset/generate", json=valid_request_data)
+
+        assert response.status_code == 201
+        assert response.json()["cleaned_text_reused"] is True
+
+
+class TestGenerateDatasetBatch:
+    """Tests for the batch generate dataset endpoint"""
+
+    @staticmethod
+    def _batch_result(urls):
+        metrics = ScrapingMetrics(
+            urls_processed=len(urls) - 1,
+            qa_pairs_generated=4,
+            errors=[f"{urls[-1]}: boom"],
+            duration=2.0,
+            rate=2.0,
+        )
+        results = [
+            {"url": url, "status": "success", "total_questions": 4} for url in urls[:-1]
+        ]
+        results.append({"url": urls[-1], "status": "error", "error": "boom"})
+        return {
+            "dataset_id": "batch-id",
+            "dataset_name": "batch_dataset",
+            "metrics": metrics,
+            "results": results,
+        }
+
+    def test_batch_with_url_list(self, mock_pipeline, db: Session):
+        """Test batch generation from a list of URLs"""
+        urls = ["https://example.com/a", "https://example.com/b"]
+        mock_pipeline.process_urls.return_value = self._batch_result(urls)
+
+        response = client.post(
+            "/dataset/generate/batch",
+            json={"urls": urls, "dataset_name": "batch_dataset", "concurrency": 2},
+        )
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data["id"] == "batch-id"
+        assert data["urls_total"] == 2
+        assert data["urls_processed"] == 1
+        assert data["qa_pairs_generated"] == 4
+        assert data["rate"] == 2.0
+        assert len(data["errors"]) == 1
+        assert data["results"][1]["status"] == "error"
+
+        kwargs = mock_pipeline.process_urls.call_args.kwargs
+        assert kwargs["urls"] == urls
+        assert kwargs["concurrency"] == 2
+
+    def test_batch_with_urls_config(self, mock_pipeline, db: Session):
+        """Test batch generation from a hierarchical urls config"""
+        urls_config = {
+            "docs": [
+                {"url": "https://example.com/a", "description": "A"},
+                {"url": "https://example.com/b", "description": "B"},
+            ]
+        }
+        mock_pipeline.process_urls.return_value = self._batch_result(
+            ["https://example.com/a", "https://example.com/b"]
+        )
+
+        response = client.post(
+            "/dataset/generate/batch",
+            json={"urls_config": urls_config, "dataset_name": "batch_dataset"},
+        )
+
+        assert response.status_code == 201
+        assert mock_pipeline.process_urls.call_args.kwargs["urls"] == [
+            "https://example.com/a",
+            "https://example.com/b",
+        ]
+
+    def test_batch_without_urls(self, mock_pipeline, db: Session):
+        """Test batch request without URLs is rejected"""
+        response = client.post(
+            "/dataset/generate/batch", json={"dataset_name": "batch_dataset"}
+        )
+
+        assert response.status_code == 422
+        mock_pipeline.process_urls.assert_not_called()
+
+    def test_batch_config_without_valid_url(self, mock_pipeline, db: Session):
+        """Test urls config containing no URL is rejected"""
+        response = client.post(
+            "/dataset/generate/batch",
+            json={"urls_config": {"a": "not a url"}, "dataset_name": "batch"},
+        )
+
+        assert response.status_code == 400
+        mock_pipeline.process_urls.assert_not_called()
+
+    def test_batch_invalid_model(self, mock_pipeline, db: Session):
+        """Test batch request with an unavailable model"""
+        response = client.post(
+            "/dataset/generate/batch",
+            json={
+                "urls": ["https://example.com/a"],
+                "dataset_name": "batch_dataset",
+                "model_qa": "invalid-model",
+            },
+        )
+
+        assert response.status_code == 400
+        assert "not in available models" in response.json()["detail"]
+
+
+@pytest.fixture
+def mock_job_runner():
+    """Mock the background job runner"""
+    with patch("server.api.generate.get_job_runner") as mock:
+        runner = Mock()
+        mock.return_value = runner
+        yield runner
+
+
+class TestGenerateDatasetJobs:
+    """Tests for background generation jobs"""
+
+    def test_generate_in_background(
+        self, client, mock_pipeline, mock_job_runner, valid_request_data
+    ):
+        """Test background=true returns 202 with a task id"""
+        response = client.post(
+            "/dataset/generate", json={**valid_request_data, "background": True}
+        )
+
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == JobStatus.PENDING
+        assert data["kind"] == JobKind.GENERATE
+        assert response.headers["location"] == f"/dataset/jobs/{data['task_id']}"
+        mock_job_runner.submit.assert_called_once_with(data["task_id"])
+        mock_pipeline.process_url.assert_not_called()
+
+        job = client.get(f"/dataset/jobs/{data['task_id']}")
+        assert job.status_code == 200
+        assert job.json()["urls_total"] == 1
+
+    def test_generate_batch_in_background(self, client, mock_job_runner):
+        """Test a background batch stores the flattened URLs in its payload"""
+        response = client.post(
+            "/dataset/generate/batch",
+            json={
+                "urls_config": {"docs": ["https://example.com/a"]},
+                "urls": ["https://example.com/b"],
+                "dataset_name": "batch_dataset",
+                "background": True,
+            },
+        )
+
+        assert response.status_code == 202
+        assert response.json()["urls_total"] == 2
+
+        jobs = client.get("/dataset/jobs").json()
+        assert [job["task_id"] for job in jobs] == [response.json()["task_id"]]
+
+    def test_get_unknown_job(self, client):
+        """Test polling an unknown job"""
+        response = client.get("/dataset/jobs/missing")
+
+        assert response.status_code == 404
+
+    def test_stream_job_events(self, client, test_db: Session):
+        """Test the event stream ends with the finished job status"""
+        from server.services.job import JobService
+
+        service = JobService(test_db)
+        job = service.create_job(JobKind.GENERATE, {}, 1)
+        service.complete_job(
+            job.id, result={"dataset_id": "d1"}, urls_processed=1, qa_pairs_generated=2
+        )
+
+        response = client.get(f"/dataset/jobs/{job.id}/events")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.text.splitlines() if line]
+        assert len(events) == 1
+        assert events[0].startswith("data: ")
+        assert '"status": "success"' in events[0]
+
+    def test_retry_failed_job(self, client, mock_job_runner, test_db: Session):
+        """Test a failed job is queued again"""
+        from server.services.job import JobService
+
+        service = JobService(test_db)
+        job = service.create_job(JobKind.GENERATE, {}, 1)
+        service.fail_job(job.id, "LLM down")
+
+        response = client.post(f"/dataset/jobs/{job.id}/retry")
+
+        assert response.status_code == 202
+        assert response.json()["status"] == JobStatus.PENDING
+        mock_job_runner.submit.assert_called_once_with(job.id)
+
+    def test_retry_job_not_failed(self, client, mock_job_runner, test_db: Session):
+        """Test retrying a job that has not failed is rejected"""
+        from server.services.job import JobService
+
+        job = JobService(test_db).create_job(JobKind.GENERATE, {}, 1)
+
+        assert client.post(f"/dataset/jobs/{job.id}/retry").status_code == 409
+        assert client.post("/dataset/jobs/missing/retry").status_code == 404
+        mock_job_runner.submit.assert_not_called()
@@ -55,3 +55,32 @@ def test_list_openai_models_exception(client: TestClient):
 
         with pytest.raises(Exception):
             client.get("/openai/models")
+
+
+def test_llm_cache_stats_disabled(client: TestClient):
+    """Test cache stats when the cache is disabled."""
+    with patch("server.api.openai.get_llm_cache", return_value=None):
+        response = client.get("/openai/cache")
+        assert response.status_code == 200
+        assert response.json() == {"enabled": False}
+
+
+def test_llm_cache_stats_and_clear(client: TestClient):
+    """Test cache stats and clearing through the API."""
+    from server.core.cache import LLMCache
+
+    cache = LLMCache()
+    cache.set("key", "value")
+    cache.get("key")
+
+    with patch("server.api.openai.get_llm_cache", return_value=cache):
+        response = client.get("/openai/cache")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enabled"] is True
+        assert data["hits"] == 1
+        assert data["entries"] == 1
+
+        response = client.delete("/openai/cache")
+        assert response.status_code == 200
+        assert cache.stats()["entries"] == 0
@@ -239,3 +239,30 @@ def test_qa_response_includes_metadata(
     assert "context_length" in metadata
     assert "question_length" in metadata
     assert "answer_length" in metadata
+
+
+def test_get_qa_by_id_returns_context_excerpt(client: TestClient, test_db: Session):
+    """Test a Q&A referencing its cleaned text returns the excerpt and its span."""
+    dataset = Dataset(name="excerpt_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+
+    page = "Paris is the capital of France. " * 300
+    qa = QASource.from_qa_generation(
+        question="What is the capital of France?",
+        answer="Paris",
+        context=page,
+        source_url="https://example.com/france",
+        dataset_id=str(dataset.id),
+        cleaned_text_id="cleaned-1",
+        excerpt="Paris is the capital of France.",
+    )
+    test_db.add(qa)
+    test_db.commit()
+
+    response = client.get(f"/q_a/id/{qa.id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["context"] == "Paris is the capital of France."
+    assert data["context_span"] == [0, len(data["context"])]
+    assert data["cleaned_text_id"] == "cleaned-1"
@@ -12,6 +12,7 @@ os.environ["AVAILABLE_LLMS"] = (
 )
 os.environ["DEFAULT_CLEANING_MODEL"] = "gpt-4o-mini"
 os.environ["DEFAULT_QA_MODEL"] = "gpt-4o-mini"
+os.environ["LLM_CACHE_ENABLED"] = "false"
 
 import pytest
 from typing import Generator
@@ -0,0 +1,55 @@
+"""Tests for the Bloom filter"""
+
+import pytest
+from server.core.utils.bloom import BloomFilter
+
+
+class TestBloomFilter:
+    """Tests for BloomFilter class"""
+
+    def test_added_keys_are_found(self):
+        """Test there are no false negatives"""
+        bloom = BloomFilter(1000)
+        keys = [f"key-{i}" for i in range(1000)]
+        bloom.update(keys[:500])
+        for key in keys[500:]:
+            bloom.add(key)
+
+        assert len(bloom) == 1000
+        assert all(key in bloom for key in keys)
+        assert not bloom.is_full
+
+    def test_false_positive_rate(self):
+        """Test the false positive rate stays near error_rate at capacity"""
+        bloom = BloomFilter(10000, error_rate=0.01)
+        bloom.update(f"key-{i}" for i in range(10000))
+
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+
+        assert false_positives < 200
+
+    def test_is_full(self):
+        """Test a filter past its capacity reports it"""
+        bloom = BloomFilter(2)
+        bloom.update(["a", "b", "c"])
+
+        assert bloom.is_full
+
+    def test_save_and_load(self, tmp_path):
+        """Test a saved filter is loaded with its keys and metadata"""
+        path = str(tmp_path / "bloom.npz")
+        bloom = BloomFilter(100, error_rate=0.05)
+        bloom.update(["a", "b"])
+        bloom.save(path, {"source": "test"})
+
+        loaded, metadata = BloomFilter.load(path)
+
+        assert metadata == {"source": "test"}
+        assert (loaded.capacity, loaded.error_rate, len(loaded)) == (100, 0.05, 2)
+        assert "a" in loaded and "b" in loaded
+
+    @pytest.mark.parametrize("capacity, error_rate", [(0, 0.01), (10, 0), (10, 1)])
+    def test_invalid_parameters(self, capacity, error_rate):
+        """Test capacity and error rate are validated"""
+        with pytest.raises(ValueError):
+            BloomFilter(capacity, error_rate)
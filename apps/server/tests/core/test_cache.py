@@ -0,0 +1,105 @@
+"""Tests for the LLM response cache"""
+
+from unittest.mock import patch
+
+from server.core.cache import LLMCache
+
+
+class TestLLMCache:
+    """Tests for the LLMCache class"""
+
+    def test_make_key_is_stable(self):
+        """Test that identical inputs produce the same key"""
+        key1 = LLMCache.make_key("clean", "gpt-4o-mini", "prompt", "text", 0.0, 100)
+        key2 = LLMCache.make_key("clean", "gpt-4o-mini", "prompt", "text", 0.0, 100)
+
+        assert key1 == key2
+
+    def test_make_key_depends_on_every_field(self):
+        """Test that changing any field changes the key"""
+        base = ("clean", "gpt-4o-mini", "prompt", "text", 0.0, 100)
+        variants = [
+            ("qa", "gpt-4o-mini", "prompt", "text", 0.0, 100),
+            ("clean", "gpt-4", "prompt", "text", 0.0, 100),
+            ("clean", "gpt-4o-mini", "other prompt", "text", 0.0, 100),
+            ("clean", "gpt-4o-mini", "prompt", "other text", 0.0, 100),
+            ("clean", "gpt-4o-mini", "prompt", "text", 0.7, 100),
+            ("clean", "gpt-4o-mini", "prompt", "text", 0.0, 200),
+        ]
+
+        keys = {LLMCache.make_key(*variant) for variant in variants}
+
+        assert LLMCache.make_key(*base) not in keys
+        assert len(keys) == len(variants)
+
+    def test_get_miss_and_hit(self):
+        """Test hit/miss counters"""
+        cache = LLMCache()
+
+        assert cache.get("missing") is None
+        cache.set("key", {"answer": 42})
+        assert cache.get("key") == {"answer": 42}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_ttl_expiration(self):
+        """Test that expired entries are treated as misses"""
+        cache = LLMCache(ttl=10)
+
+        with patch("server.core.cache.time.time", return_value=1000.0):
+            cache.set("key", "value")
+        with patch("server.core.cache.time.time", return_value=1020.0):
+            assert cache.get("key") is None
+
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = LLMCache(max_entries=2)
+
+        with patch("server.core.cache.time.time", return_value=1.0):
+            cache.set("a", "A")
+        with patch("server.core.cache.time.time", return_value=2.0):
+            cache.set("b", "B")
+        with patch("server.core.cache.time.time", return_value=3.0):
+            cache.get("a")
+        with patch("server.core.cache.time.time", return_value=4.0):
+            cache.set("c", "C")
+
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        assert cache.get("c") == "C"
+
+    def test_eviction_by_size(self):
+        """Test that entries are evicted when the byte limit is exceeded"""
+        cache = LLMCache(max_bytes=50)
+
+        cache.set("a", "x" * 30)
+        cache.set("b", "y" * 30)
+
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["size_bytes"] <= 50
+
+    def test_clear(self):
+        """Test clearing the cache resets entries and counters"""
+        cache = LLMCache()
+        cache.set("key", "value")
+        cache.get("key")
+
+        cache.clear()
+
+        stats = cache.stats()
+        assert stats["entries"] == 0
+        assert stats["hits"] == 0
+
+    def test_persistence_across_instances(self, tmp_path):
+        """Test that entries survive a restart when backed by a file"""
+        path = str(tmp_path / "llm_cache.db")
+        LLMCache(path=path).set("key", ["persisted"])
+
+        assert LLMCache(path=path).get("key") == ["persisted"]
@@ -0,0 +1,88 @@
+"""
+Tests for the shared HTTP client, against a local keep-alive HTTP server.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from server.core import http
+from server.core.config import config
+
+
+@pytest.fixture
+def http_server():
+    """Runs a slow HTTP/1.1 server; yields its URL and the client ports seen"""
+    ports = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            ports.append(self.client_address[1])
+            time.sleep(0.1)
+            payload = b"<html><body>Page</body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", ports
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+async def test_client_is_shared_per_event_loop():
+    """Test the client is reused until closed, then opened again."""
+    client = http.get_http_client()
+    assert http.get_http_client() is client
+
+    await http.close_http_client()
+    assert client.is_closed
+    reopened = http.get_http_client()
+    assert reopened is not client
+    await http.close_http_client()
+
+
+async def test_same_host_requests_reuse_connections(http_server):
+    """Test sequential requests share a connection and concurrent ones overlap."""
+    url, ports = http_server
+    client = http.get_http_client()
+    try:
+        for page in range(3):
+            (await client.get(f"{url}/page/{page}")).raise_for_status()
+        assert len(set(ports)) == 1
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(client.get(f"{url}/page/{page}") for page in range(5))
+        )
+        assert all(response.status_code == 200 for response in responses)
+        # Five requests of 0.1s each, in parallel over the pool
+        assert time.perf_counter() - start < 0.4
+    finally:
+        await http.close_http_client()
+
+
+async def test_http2_requires_h2(monkeypatch):
+    """Test HTTP/2 falls back to HTTP/1.1 when h2 is not installed."""
+    monkeypatch.setattr(config, "http2_enabled", True)
+    monkeypatch.setattr(http, "http2_available", lambda: False)
+
+    client = http.create_http_client()
+    try:
+        assert client._transport._pool._http2 is False
+    finally:
+        await client.aclose()
@@ -0,0 +1,61 @@
+"""Tests for MinHash utilities"""
+
+import pytest
+from server.core.utils.minhash import MinHasher, minhasher, normalize_text
+
+
+class TestNormalizeText:
+    """Tests for normalize_text function"""
+
+    def test_case_and_punctuation(self):
+        """Test case, punctuation and whitespace are normalized"""
+        assert normalize_text("  What is   PYTHON ?!") == "what is python"
+
+    def test_empty(self):
+        """Test None and empty strings"""
+        assert normalize_text(None) == ""
+        assert normalize_text("") == ""
+
+
+class TestMinHasher:
+    """Tests for MinHasher class"""
+
+    def test_signature_is_deterministic(self):
+        """Test two hashers with the same seed give the same signature"""
+        signature1 = MinHasher(seed=7).signature("What is Python?")
+        signature2 = MinHasher(seed=7).signature("What is Python?")
+
+        assert len(signature1) == 128
+        assert (signature1 == signature2).all()
+
+    def test_normalized_variants_share_all_buckets(self):
+        """Test texts equal once normalized have the same bucket keys"""
+        assert minhasher.bucket_keys("What is Python?") == minhasher.bucket_keys(
+            "what is python ?"
+        )
+
+    def test_near_duplicates_share_a_bucket(self):
+        """Test near duplicates collide in at least one band"""
+        keys1 = set(minhasher.bucket_keys("What is the capital city of France?"))
+        keys2 = set(minhasher.bucket_keys("What is the capital of France?"))
+
+        assert keys1 & keys2
+
+    def test_unrelated_texts_do_not_collide(self):
+        """Test unrelated texts share no bucket"""
+        keys1 = set(minhasher.bucket_keys("What is the capital city of France?"))
+        keys2 = set(minhasher.bucket_keys("How do airplanes stay in the air?"))
+
+        assert not keys1 & keys2
+
+    def test_bucket_keys_are_per_band(self):
+        """Test one signed 64-bit key per band"""
+        keys = minhasher.bucket_keys("What is Python?")
+
+        assert len(keys) == minhasher.bands
+        assert all(-(2**63) <= key < 2**63 for key in keys)
+
+    def test_invalid_bands(self):
+        """Test num_perm must be divisible by bands"""
+        with pytest.raises(ValueError):
+            MinHasher(num_perm=100, bands=32)
@@ -0,0 +1,57 @@
+"""Tests for SimHash utilities"""
+
+from server.core.utils.simhash import (
+    SIMHASH_MAX_DISTANCE,
+    SIMHASH_MIN_SHINGLES,
+    hamming_distance,
+    shingle_count,
+    simhash,
+)
+
+PAGE = " ".join(
+    f"Python release {i} improved web development for {i * 7 % 13} frameworks."
+    for i in range(100)
+)
+
+
+class TestSimHash:
+    """Tests for simhash and hamming_distance functions"""
+
+    def test_is_signed_64_bit(self):
+        """Test fingerprints fit a signed 64-bit column"""
+        for text in ("", "x", PAGE):
+            assert -(2**63) <= simhash(text) < 2**63
+
+    def test_normalized_variants_are_equal(self):
+        """Test case, punctuation and whitespace do not change the fingerprint"""
+        assert simhash("What is  Python?") == simhash("what is python")
+
+    def test_near_duplicates_are_close(self):
+        """Test a page with a small edit stays within the distance"""
+        edited = PAGE.replace("release 42", "version 42") + " Updated."
+
+        assert hamming_distance(simhash(PAGE), simhash(edited)) <= (
+            SIMHASH_MAX_DISTANCE
+        )
+
+    def test_different_texts_are_far(self):
+        """Test unrelated pages are far apart"""
+        other = " ".join(
+            f"Rust release {i} improved systems programming for {i * 5 % 11} targets."
+            for i in range(100)
+        )
+
+        assert hamming_distance(simhash(PAGE), simhash(other)) > SIMHASH_MAX_DISTANCE
+
+    def test_hamming_distance_of_signed_values(self):
+        """Test the distance counts bits of negative values on 64 bits"""
+        assert hamming_distance(-1, 0) == 64
+        assert hamming_distance(-1, -2) == 1
+
+    def test_shingle_count_of_repeated_text(self):
+        """Test repeated text has few distinct shingles, whatever its length"""
+        repeated = "Python is great for web development. " * 100
+
+        assert shingle_count(repeated) == 6 < SIMHASH_MIN_SHINGLES
+        assert shingle_count(PAGE) > SIMHASH_MIN_SHINGLES
+        assert shingle_count("") == 1
@@ -1,6 +1,10 @@
 """Tests for text utility functions"""
 
-from server.core.utils.text import chunk_text
+import random
+from difflib import SequenceMatcher
+
+import pytest
+from server.core.utils.text import RatioFilter, chunk_text, split_text
 
 
 class TestChunkText:
@@ -95,3 +99,99 @@ class TestChunkText:
         # Test large chunks
         chunks_large = chunk_text(text, chunk_size=5000, overlap=1000)
         assert len(chunks_large) == 3
+
+
+class TestSplitText:
+    """Tests for the split_text function"""
+
+    def test_split_text_short_text_single_chunk(self):
+        """Test that short text is returned as a single chunk"""
+        assert split_text("Hello World", max_chars=100) == ["Hello World"]
+
+    def test_split_text_empty_string(self):
+        """Test splitting an empty string"""
+        assert split_text("", max_chars=100) == []
+
+    def test_split_text_prefers_paragraph_boundaries(self):
+        """Test that paragraphs are kept whole when they fit"""
+        paragraphs = ["a" * 40, "b" * 40, "c" * 40]
+        text = "\n\n".join(paragraphs)
+
+        chunks = split_text(text, max_chars=50)
+
+        assert len(chunks) == 3
+        assert [chunk.strip() for chunk in chunks] == paragraphs
+
+    def test_split_text_falls_back_to_sentences(self):
+        """Test that flat text is cut between sentences"""
+        text = "First sentence here. Second sentence here. Third sentence here."
+
+        chunks = split_text(text, max_chars=25)
+
+        assert all(len(chunk) <= 25 for chunk in chunks)
+        assert chunks[0].strip() == "First sentence here."
+
+    def test_split_text_hard_cuts_long_words(self):
+        """Test that a single token longer than the limit is cut"""
+        chunks = split_text("x" * 25, max_chars=10)
+
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+    def test_split_text_preserves_content_and_order(self):
+        """Test that joining the chunks gives back the original text"""
+        text = ("Paragraph with a few sentences. Another one! A question?\n" * 20) + (
+            "\n\nTrailing paragraph." * 10
+        )
+
+        chunks = split_text(text, max_chars=120)
+
+        assert "".join(chunks) == text
+        assert all(len(chunk) <= 120 for chunk in chunks)
+
+
+class TestRatioFilter:
+    """Tests for RatioFilter class"""
+
+    @pytest.mark.parametrize("threshold", [0.5, 0.8, 0.9])
+    def test_same_results_as_full_ratio(self, threshold):
+        """Test pruning never changes which pairs reach the threshold"""
+        rng = random.Random(42)
+        texts = [
+            "".join(rng.choice("abcde ") for _ in range(rng.randint(0, 30)))
+            for _ in range(60)
+        ]
+        ratio_filter = RatioFilter(threshold)
+
+        for a in texts:
+            for b in texts:
+                expected = SequenceMatcher(None, a, b).ratio()
+                result = ratio_filter.ratio(a, b)
+                if expected >= threshold:
+                    assert result == expected
+                else:
+                    assert result is None
+
+        assert ratio_filter.considered == len(texts) ** 2
+        assert 0 < ratio_filter.pruned < ratio_filter.considered
+
+    def test_length_bound_prunes(self):
+        """Test texts of very different lengths are rejected by the length bound"""
+        ratio_filter = RatioFilter(0.8)
+
+        assert ratio_filter.ratio("short", "a much longer question text") is None
+        assert ratio_filter.pruned == 1
+        assert ratio_filter.prune_rate == 1.0
+
+    def test_empty_texts(self):
+        """Test two empty texts are identical"""
+        assert RatioFilter(0.9).ratio("", "") == 1.0
+
+    def test_skip(self):
+        """Test pairs skipped by the caller are counted as pruned"""
+        ratio_filter = RatioFilter(0.9)
+        ratio_filter.skip(3)
+        ratio_filter.ratio("same", "same")
+
+        assert ratio_filter.considered == 4
+        assert ratio_filter.pruned == 3
+        assert ratio_filter.prune_rate == 0.75
@@ -1,7 +1,7 @@
 """Tests for URL utilities"""
 
 import pytest
-from server.core.utils.url import clean_base_url, build_api_url
+from server.core.utils.url import clean_base_url, build_api_url, extract_urls
 
 
 class TestCleanBaseUrl:
@@ -60,3 +60,38 @@ class TestBuildApiUrl:
         """Test complex endpoint path"""
         result = build_api_url("https://api.example.com/", "v1/knowledge/123")
         assert result == "https://api.example.com/v1/knowledge/123"
+
+
+class TestExtractUrls:
+    """Tests for extract_urls function"""
+
+    def test_hierarchical_config(self):
+        """Test URLs are collected from nested dicts and lists in order"""
+        urls_config = {
+            "docs": {
+                "guides": [
+                    {"url": "https://example.com/a", "description": "Guide A"},
+                    {"url": "https://example.com/b", "description": "Guide B"},
+                ],
+                "faq": "https://example.com/faq",
+            },
+            "blog": ["https://example.com/post"],
+        }
+        assert extract_urls(urls_config) == [
+            "https://example.com/a",
+            "https://example.com/b",
+            "https://example.com/faq",
+            "https://example.com/post",
+        ]
+
+    def test_ignores_non_urls_and_duplicates(self):
+        """Test descriptions, numbers and repeated URLs are skipped"""
+        urls_config = {
+            "a": {"url": "https://example.com", "description": "Home", "depth": 2},
+            "b": ["https://example.com", "ftp://example.com/file", "not a url"],
+        }
+        assert extract_urls(urls_config) == ["https://example.com"]
+
+    def test_empty_config(self):
+        """Test empty config returns no URL"""
+        assert extract_urls({}) == []
@@ -4,9 +4,18 @@ Tests for Dataset and QASource models.
 
 import pytest
 from datetime import datetime
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from server.models.dataset import Dataset, QASource
+from server.models.dataset import (
+    CONTEXT_EXCERPT_LENGTH,
+    Dataset,
+    QALshBucket,
+    QASource,
+)
+from server.core.config import config
+from server.core.utils.minhash import minhasher
+from server.models.scraper import CleanedText, PageSnapshot
 
 
 def test_dataset_creation(test_db: Session):
@@ -279,3 +288,441 @@ def test_qa_source_metadata_generation(test_db: Session):
     assert metadata["context_length"] == len(context)
     assert metadata["question_length"] == len(question)
     assert metadata["answer_length"] == len(answer)
+
+
+def _create_cleaned_text(test_db: Session, content: str) -> CleanedText:
+    snapshot = PageSnapshot(
+        url="https://example.com",
+        user_agent="Test Agent",
+        retrieved_at=datetime.now(),
+        content=content,
+        url_hash=PageSnapshot.compute_hash_from_url("https://example.com"),
+    )
+    test_db.add(snapshot)
+    test_db.commit()
+    cleaned_text = CleanedText(
+        page_snapshot_id=snapshot.id, content=content, language="en", model="m"
+    )
+    test_db.add(cleaned_text)
+    test_db.commit()
+    return cleaned_text
+
+
+def test_qa_source_references_cleaned_text(test_db: Session):
+    """Test that only an excerpt of the page is stored with cleaned_text_id."""
+    page = (
+        "Intro. " * 500 + "Python was created by Guido van Rossum. " + "Outro. " * 500
+    )
+    cleaned_text = _create_cleaned_text(test_db, page)
+
+    qa = QASource.from_qa_generation(
+        question="Who created Python?",
+        answer="Guido van Rossum",
+        context=page,
+        source_url="https://example.com",
+        cleaned_text_id=cleaned_text.id,
+        excerpt="Python was created by Guido van Rossum.",
+    )
+
+    start = page.index("Python was created")
+    assert qa.cleaned_text_id == cleaned_text.id
+    assert qa.context == "Python was created by Guido van Rossum."
+    assert qa.input["context_span"] == [start, start + len(qa.context)]
+    # The ID still identifies the QA within the full page
+    assert qa.id == QASource.compute_hash_from_content(
+        "Who created Python?", "Guido van Rossum", page, "https://example.com"
+    )
+    assert qa.qa_metadata["context_length"] == len(page)
+
+
+def test_build_context_excerpt_without_passage():
+    """Test the excerpt falls back to the beginning of the page."""
+    page = "x" * (CONTEXT_EXCERPT_LENGTH * 3)
+
+    excerpt, span = QASource.build_context_excerpt(page)
+
+    assert excerpt == page[:CONTEXT_EXCERPT_LENGTH]
+    assert span == [0, CONTEXT_EXCERPT_LENGTH]
+
+
+def test_build_context_excerpt_passage_not_in_page():
+    """Test a passage that is not verbatim in the page has no span."""
+    excerpt, span = QASource.build_context_excerpt("Some page.", "Paraphrased.")
+
+    assert excerpt == "Paraphrased."
+    assert span is None
+
+
+def test_similarity_check_uses_referenced_cleaned_text(test_db: Session):
+    """Test similar duplicates are found against the full referenced page."""
+    page = "Python is great for web development. " * 100
+    cleaned_text = _create_cleaned_text(test_db, page)
+    qa = QASource.from_qa_generation(
+        question="What is Python good for?",
+        answer="Web development",
+        context=page,
+        source_url="https://example.com",
+        cleaned_text_id=cleaned_text.id,
+    )
+    test_db.add(qa)
+    test_db.commit()
+
+    # A re-scraped page that is almost identical, not yet stored
+    duplicate_check = QASource.check_for_duplicates(
+        test_db,
+        question="What is Python good for ?",
+        answer="Web development",
+        context=page + "Updated.",
+        source_url="https://example.com",
+    )
+
+    assert duplicate_check["type"] == "similar"
+    assert duplicate_check["duplicate_id"] == qa.id
+
+
+def test_qa_source_stores_context_fingerprint(test_db: Session):
+    """Test the fingerprint is computed from the full page, not the excerpt."""
+    page = "Python is a programming language. " * 100
+    cleaned_text = _create_cleaned_text(test_db, page)
+    qa = QASource.from_qa_generation(
+        question="What is Python?",
+        answer="A programming language",
+        context=page,
+        source_url="https://example.com",
+        cleaned_text_id=cleaned_text.id,
+    )
+
+    assert qa.input["context"] != page
+    assert (qa.context_hash, qa.context_simhash) == (
+        QASource.compute_context_fingerprint(page)
+    )
+    # Whitespace does not change the fingerprint
+    assert QASource.compute_context_fingerprint(
+        " Some  page\n"
+    ) == QASource.compute_context_fingerprint("Some page")
+
+
+def test_similarity_check_compares_context_fingerprints(test_db: Session):
+    """Test contexts are compared by fingerprint, without loading cleaned texts."""
+    page = " ".join(
+        f"Python release {i} improved web development for {i * 7 % 13} frameworks."
+        for i in range(100)
+    )
+    cleaned_text = _create_cleaned_text(test_db, page)
+    qa = QASource.from_qa_generation(
+        question="What is Python good for?",
+        answer="Web development",
+        context=page,
+        source_url="https://example.com",
+        cleaned_text_id=cleaned_text.id,
+    )
+    test_db.add(qa)
+    test_db.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        similar = QASource.check_for_duplicates(
+            test_db,
+            question="What is Python good for ?",
+            answer="Web development",
+            context=page.replace("release 42", "version 42"),
+            source_url="https://example.com",
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert similar["type"] == "similar"
+    assert similar["duplicate_id"] == qa.id
+    assert not any("FROM cleaned_text" in statement for statement in statements)
+
+    # A short page has too few shingles for its SimHash, so it is compared in full
+    different = QASource.check_for_duplicates(
+        test_db,
+        question="What is Python good for ?",
+        answer="Web development",
+        context="An unrelated page about Python snakes and their habitats.",
+        source_url="https://example.com",
+    )
+    assert different["type"] == "new"
+
+
+def test_similarity_check_gray_zone_compares_full_contexts(test_db: Session):
+    """Test contexts a few SimHash bits apart are compared by their ratio."""
+    page = " ".join(
+        f"Python release {i} improved web development for {i * 7 % 13} frameworks."
+        for i in range(100)
+    )
+
+    def edit(count):
+        edited = page
+        for i in range(count):
+            edited = edited.replace(
+                f"Python release {i} improved", f"Python release {i} changed", 1
+            )
+        return edited
+
+    qa = QASource.from_qa_generation(
+        question="What is Python good for?",
+        answer="Web development",
+        context=page,
+        source_url="https://example.com",
+    )
+    test_db.add(qa)
+    test_db.commit()
+
+    # 7 and 8 bits apart, with ratios of 0.964 and 0.946
+    results = [
+        QASource.check_for_duplicates(
+            test_db,
+            question="What is Python good for ?",
+            answer="Web development",
+            context=context,
+            source_url="https://example.com",
+        )
+        for context in (edit(40), edit(60))
+    ]
+
+    assert [result["type"] for result in results] == ["similar", "new"]
+    assert results[0]["duplicate_id"] == qa.id
+
+
+def test_similarity_check_without_stored_fingerprint(test_db: Session):
+    """Test records stored before fingerprints are compared by their context."""
+    qa = QASource.from_qa_generation(
+        question="What is Python?",
+        answer="A programming language",
+        context="Python context",
+        source_url="https://example.com",
+    )
+    qa.context_hash = qa.context_simhash = None
+    test_db.add(qa)
+    test_db.commit()
+
+    result = QASource.check_for_duplicates(
+        test_db,
+        question="What is Python ?",
+        answer="A programming language",
+        context="Python context",
+        source_url="https://example.com",
+    )
+
+    assert result["type"] == "similar"
+    assert result["duplicate_id"] == qa.id
+
+
+def test_qa_source_source_url_column(test_db: Session):
+    """Test source_url is stored as a column for indexed lookups."""
+    qa = QASource.from_qa_generation(
+        question="What is Python?",
+        answer="A programming language",
+        context="Python context",
+        source_url="https://example.com/python",
+    )
+    test_db.add(qa)
+    test_db.commit()
+
+    found = (
+        test_db.query(QASource)
+        .filter(QASource.source_url == "https://example.com/python")
+        .one()
+    )
+    assert found.id == qa.id
+    assert found.input["source_url"] == "https://example.com/python"
+
+
+def test_similarity_check_only_queries_same_url(test_db: Session):
+    """Test the similarity check filters by source_url in SQL."""
+    for url in ("https://example.com/a", "https://example.com/b"):
+        test_db.add(
+            QASource.from_qa_generation(
+                question="What is Python?",
+                answer="A programming language",
+                context="Python context",
+                source_url=url,
+            )
+        )
+    test_db.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        similar_id = QASource.is_duplicate_by_similarity(
+            test_db,
+            question="What is Python ?",
+            context="Python context",
+            source_url="https://example.com/c",
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert similar_id is None
+    assert len(statements) == 1
+    assert "qa_sources.source_url = ?" in statements[0]
+    assert "qa_sources.expected_output" not in statements[0]
+
+
+def test_check_for_duplicates_batch(test_db: Session):
+    """Test batch duplicate check against stored rows and earlier batch items."""
+    stored = QASource.from_qa_generation(
+        question="What is Python?",
+        answer="A programming language",
+        context="Python context",
+        source_url="https://example.com",
+    )
+    test_db.add(stored)
+    test_db.commit()
+
+    results = QASource.check_for_duplicates_batch(
+        test_db,
+        [
+            ("What is Python?", "A programming language"),
+            ("What is Java?", "Another programming language"),
+            ("What is Java ?", "A language for the JVM"),
+        ],
+        context="Python context",
+        source_url="https://example.com",
+    )
+
+    assert [r["type"] for r in results] == ["exact", "new", "similar"]
+    assert results[0]["duplicate_id"] == stored.id
+    assert results[2]["duplicate_id"] == QASource.compute_hash_from_content(
+        "What is Java?",
+        "Another programming language",
+        "Python context",
+        "https://example.com",
+    )
+    assert results[2]["similarity_score"] >= 0.9
+
+
+def test_check_for_duplicates_batch_empty(test_db: Session):
+    """Test an empty batch runs no query."""
+    assert (
+        QASource.check_for_duplicates_batch(
+            test_db, [], context="ctx", source_url="https://example.com"
+        )
+        == []
+    )
+
+
+def _add_qa(
+    test_db: Session, question: str, dataset_id=None, url="https://example.com"
+):
+    qa = QASource.from_qa_generation(
+        question=question,
+        answer="An answer",
+        context="Python context",
+        source_url=url,
+        dataset_id=dataset_id,
+    )
+    test_db.add(qa)
+    test_db.commit()
+    return qa
+
+
+def test_lsh_index_candidate_pairs(test_db: Session):
+    """Test only near-duplicate questions of a dataset collide in the index."""
+    qa1 = _add_qa(test_db, "What is the capital of France?", "d1")
+    qa2 = _add_qa(test_db, "What is the capital city of France?", "d1")
+    qa3 = _add_qa(test_db, "How do airplanes stay in the air?", "d1")
+    _add_qa(test_db, "What is the capital of France ?", "d2")
+
+    assert QALshBucket.ensure_index(test_db, "d1") == 3
+    assert QALshBucket.ensure_index(test_db, "d1") == 0
+
+    pairs = QALshBucket.candidate_pairs(test_db, "d1")
+    assert pairs == {tuple(sorted((qa1.id, qa2.id)))}
+    assert all(qa3.id not in pair for pair in pairs)
+
+
+def test_lsh_index_candidate_pairs_across_datasets(test_db: Session):
+    """Test records of several datasets collide through shared bucket keys."""
+    qa1 = _add_qa(test_db, "What is the capital of France?", "d1")
+    qa2 = _add_qa(test_db, "What is the capital of France ?", "d2")
+    _add_qa(test_db, "What is the capital of France?!", "d3")
+
+    assert QALshBucket.ensure_index(test_db, ["d1", "d2"]) == 2
+
+    pairs = QALshBucket.candidate_pairs(test_db, ["d1", "d2"])
+    assert pairs == {tuple(sorted((qa1.id, qa2.id)))}
+
+
+def test_lsh_index_remove_records(test_db: Session):
+    """Test removed records are indexed again by ensure_index."""
+    qa = _add_qa(test_db, "What is Python?", "d1")
+    QALshBucket.ensure_index(test_db, "d1")
+
+    QALshBucket.remove_records(test_db, [qa.id])
+    test_db.commit()
+
+    assert test_db.query(QALshBucket).count() == 0
+    assert QALshBucket.ensure_index(test_db, "d1") == 1
+
+
+def test_check_for_duplicates_only_verifies_lsh_collisions(test_db: Session):
+    """Test indexed rows outside the question's buckets are not loaded."""
+    colliding = _add_qa(test_db, "What is the capital of France?", "d1")
+    unrelated = _add_qa(test_db, "How do airplanes stay in the air?", "d1")
+    not_indexed = _add_qa(test_db, "Who wrote the first compiler?", "d1")
+    QALshBucket.add_records(
+        test_db,
+        [
+            (colliding.id, "d1", colliding.question),
+            (unrelated.id, "d1", unrelated.question),
+        ],
+    )
+    test_db.commit()
+
+    candidates = QASource._load_similarity_candidates(
+        test_db,
+        "https://example.com",
+        set(minhasher.bucket_keys("What is the capital of France ?")),
+    )
+    assert {candidate[0] for candidate in candidates} == {colliding.id, not_indexed.id}
+
+    result = QASource.check_for_duplicates(
+        test_db,
+        question="What is the capital of France ?",
+        answer="Paris",
+        context="Python context",
+        source_url="https://example.com",
+    )
+    assert result["type"] == "similar"
+    assert result["duplicate_id"] == colliding.id
+
+
+def test_check_for_duplicates_below_lsh_threshold_loads_all(
+    test_db: Session, monkeypatch
+):
+    """Test low thresholds compare the questions outside the LSH buckets too."""
+    existing = _add_qa(test_db, "How do airplanes stay in the air?", "d1")
+    QALshBucket.add_records(test_db, [(existing.id, "d1", existing.question)])
+    test_db.commit()
+
+    def check():
+        # Ratio of 0.742, without a shared bucket
+        return QASource.check_for_duplicates(
+            test_db,
+            question="How do aeroplanes stay aloft?",
+            answer="Lift",
+            context="Python context",
+            source_url="https://example.com",
+            similarity_threshold=0.7,
+        )
+
+    result = check()
+    assert result["type"] == "similar"
+    assert result["duplicate_id"] == existing.id
+
+    monkeypatch.setattr(config, "duplicate_lsh_min_threshold", 0.7)
+    assert check()["type"] == "new"
@@ -1,12 +1,18 @@
 """Tests for dataset pipeline"""
 
+import asyncio
+from datetime import datetime, timezone
+
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from sqlalchemy.orm import Session
 
 from server.pipelines.dataset import DatasetPipeline
 from server.models.dataset import Dataset
-from server.schemas.dataset import TargetLanguage
+from server.models.job import JobKind, PipelineStage
+from server.models.scraper import PageSnapshot
+from server.schemas.dataset import QA, TargetLanguage
+from server.services.job import JobService
 
 
 @pytest.fixture
@@ -53,17 +59,18 @@ class TestDatasetPipeline:
         mock_page_snapshot.content = "Original scraped content"
 
         mock_scraper_service = Mock()
-        mock_scraper_service.scrape_url.return_value = mock_page_snapshot
+        mock_scraper_service.scrape_url = AsyncMock(return_value=mock_page_snapshot)
+        mock_scraper_service.find_cleaned_text.return_value = None
         mock_scraper_service.save_cleaned_text.return_value = Mock()
         mock_scraper_service_class.return_value = mock_scraper_service
 
         mock_llm_service = Mock()
-        mock_llm_service.clean_text.return_value = "Cleaned text content"
+        mock_llm_service.clean_text = AsyncMock(return_value="Cleaned text content")
 
         mock_qa_item = Mock()
         mock_qa_item.question = "What is this?"
         mock_qa_item.answer = "This is a test"
-        mock_llm_service.generate_qa.return_value = [mock_qa_item]
+        mock_llm_service.generate_qa = AsyncMock(return_value=[mock_qa_item])
         mock_llm_service_class.return_value = mock_llm_service
 
         mock_qa_service = Mock()
@@ -447,11 +454,17 @@ class TestDatasetPipeline:
                             # Verify all services were called
                             mock_scrape.assert_called_once()
                             mock_clean.assert_called_once_with(
-                                "Raw content from web page", "gpt-4o-mini"
+                                "Raw content from web page",
+                                "gpt-4o-mini",
+                                use_cache=True,
                             )
                             mock_save.assert_called_once()
                             mock_gen_qa.assert_called_once_with(
-                                "Cleaned and formatted content", "fr", "gpt-4o-mini"
+                                "Cleaned and formatted content",
+                                "fr",
+                                "gpt-4o-mini",
+                                use_cache=True,
+                                similarity_threshold=0.85,
                             )
                             mock_process.assert_called_once()
 
@@ -553,3 +566,375 @@ class TestDatasetPipeline:
                             )
                             # Should use default 0.9
                             assert result["similarity_threshold"] == 0.9
+
+    @pytest.mark.asyncio
+    async def test_process_url_does_not_block_event_loop(
+        self, pipeline: DatasetPipeline
+    ):
+        """Test that slow LLM calls yield control back to the event loop"""
+        ticks = []
+        ticks_during_clean = []
+
+        async def slow_clean(text, model, use_cache=True):
+            await asyncio.sleep(0.05)
+            ticks_during_clean.append(len(ticks))
+            return "cleaned"
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        with patch.object(pipeline.scraper_service, "scrape_url") as mock_scrape:
+            mock_page = Mock()
+            mock_page.id = "1"
+            mock_page.content = "content"
+            mock_scrape.return_value = mock_page
+
+            with patch.object(pipeline.llm_service, "clean_text", new=slow_clean):
+                with patch.object(pipeline.scraper_service, "save_cleaned_text"):
+                    with patch.object(
+                        pipeline.llm_service, "generate_qa"
+                    ) as mock_gen_qa:
+                        mock_gen_qa.return_value = []
+
+                        with patch.object(
+                            pipeline.qa_service, "process_qa_pairs"
+                        ) as mock_process_qa:
+                            mock_process_qa.return_value = {
+                                "total": 0,
+                                "exact_duplicates": 0,
+                                "similar_duplicates": 0,
+                            }
+
+                            await asyncio.gather(
+                                pipeline.process_url(
+                                    url="https://example.com",
+                                    dataset_name="non_blocking",
+                                    model_cleaning="gpt-4o-mini",
+                                    target_language="fr",
+                                    model_qa="gpt-4o-mini",
+                                ),
+                                ticker(),
+                            )
+
+                            # The ticker kept running while cleaning was in flight
+                            assert ticks_during_clean == [3]
+
+    @pytest.mark.asyncio
+    async def test_process_url_reuses_existing_cleaned_text(
+        self, pipeline: DatasetPipeline
+    ):
+        """Test that an identical snapshot's cleaned text skips the LLM call"""
+        existing = Mock()
+        existing.id = "cleaned-1"
+        existing.content = "Previously cleaned content"
+
+        with patch.object(pipeline.scraper_service, "scrape_url") as mock_scrape:
+            mock_page = Mock()
+            mock_page.id = "1"
+            mock_page.content = "content"
+            mock_scrape.return_value = mock_page
+
+            with (
+                patch.object(
+                    pipeline.scraper_service,
+                    "find_cleaned_text",
+                    return_value=existing,
+                ),
+                patch.object(pipeline.llm_service, "clean_text") as mock_clean,
+                patch.object(
+                    pipeline.scraper_service, "save_cleaned_text"
+                ) as mock_save,
+                patch.object(pipeline.llm_service, "generate_qa") as mock_gen_qa,
+                patch.object(
+                    pipeline.qa_service, "process_qa_pairs"
+                ) as mock_process_qa,
+            ):
+                mock_gen_qa.return_value = []
+                mock_process_qa.return_value = {
+                    "total": 0,
+                    "exact_duplicates": 0,
+                    "similar_duplicates": 0,
+                }
+
+                result = await pipeline.process_url(
+                    url="https://example.com",
+                    dataset_name="reuse_dataset",
+                    model_cleaning="gpt-4o-mini",
+                    target_language="fr",
+                    model_qa="gpt-4o-mini",
+                )
+
+                mock_clean.assert_not_called()
+                mock_save.assert_not_called()
+                assert mock_gen_qa.call_args[0][0] == "Previously cleaned content"
+                assert result["cleaned_text_reused"] is True
+
+    @pytest.mark.asyncio
+    async def test_process_url_skips_reuse_when_cache_disabled(
+        self, pipeline: DatasetPipeline
+    ):
+        """Test that use_cache=False always cleans the text again"""
+        with patch.object(pipeline.scraper_service, "scrape_url") as mock_scrape:
+            mock_page = Mock()
+            mock_page.id = "1"
+            mock_page.content = "content"
+            mock_scrape.return_value = mock_page
+
+            with (
+                patch.object(
+                    pipeline.scraper_service, "find_cleaned_text"
+                ) as mock_find,
+                patch.object(
+                    pipeline.llm_service, "clean_text", return_value="cleaned"
+                ) as mock_clean,
+                patch.object(pipeline.scraper_service, "save_cleaned_text"),
+                patch.object(pipeline.llm_service, "generate_qa", return_value=[]),
+                patch.object(
+                    pipeline.qa_service,
+                    "process_qa_pairs",
+                    return_value={
+                        "total": 0,
+                        "exact_duplicates": 0,
+                        "similar_duplicates": 0,
+                    },
+                ),
+            ):
+                result = await pipeline.process_url(
+                    url="https://example.com",
+                    dataset_name="no_reuse_dataset",
+                    model_cleaning="gpt-4o-mini",
+                    target_language="fr",
+                    model_qa="gpt-4o-mini",
+                    use_cache=False,
+                )
+
+                mock_find.assert_not_called()
+                mock_clean.assert_called_once()
+                assert result["cleaned_text_reused"] is False
+
+
+class TestDatasetPipelineBatch:
+    """Tests for DatasetPipeline.process_urls"""
+
+    @pytest.mark.asyncio
+    async def test_process_urls_aggregates_metrics_and_isolates_errors(
+        self, pipeline: DatasetPipeline
+    ):
+        """Test that a failing URL is reported without aborting the others"""
+
+        async def fake_process_url(self, url, **kwargs):
+            if url.endswith("/broken"):
+                raise RuntimeError("404 Not Found")
+            return {
+                "qa_pairs": [],
+                "total": 3,
+                "exact_duplicates": 1,
+                "similar_duplicates": 0,
+                "cleaned_text_reused": False,
+                "dataset_id": "ignored",
+            }
+
+        with patch.object(DatasetPipeline, "process_url", fake_process_url):
+            result = await pipeline.process_urls(
+                urls=[
+                    "https://example.com/a",
+                    "https://example.com/broken",
+                    "https://example.com/b",
+                    "https://example.com/a",
+                ],
+                dataset_name="batch_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="fr",
+                model_qa="gpt-4o-mini",
+            )
+
+        metrics = result["metrics"]
+        assert result["dataset_id"] is not None
+        assert metrics.urls_processed == 2
+        assert metrics.qa_pairs_generated == 6
+        assert len(metrics.errors) == 1
+        assert "https://example.com/broken" in metrics.errors[0]
+        assert [item["status"] for item in result["results"]] == [
+            "success",
+            "error",
+            "success",
+        ]
+        assert result["results"][0]["total_questions"] == 3
+
+    @pytest.mark.asyncio
+    async def test_process_urls_bounds_concurrency(self, pipeline: DatasetPipeline):
+        """Test that at most `concurrency` URLs are processed at once"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_process_url(self, url, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"total": 1, "exact_duplicates": 0, "similar_duplicates": 0}
+
+        with patch.object(DatasetPipeline, "process_url", fake_process_url):
+            result = await pipeline.process_urls(
+                urls=[f"https://example.com/{i}" for i in range(6)],
+                dataset_name="batch_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="fr",
+                model_qa="gpt-4o-mini",
+                concurrency=2,
+            )
+
+        assert max_in_flight == 2
+        assert result["metrics"].urls_processed == 6
+
+    @pytest.mark.asyncio
+    async def test_process_urls_shares_llm_service(self, pipeline: DatasetPipeline):
+        """Test that per-URL pipelines share the batch LLM service"""
+        seen = []
+
+        async def fake_process_url(self, url, **kwargs):
+            seen.append(self.llm_service)
+            return {"total": 0, "exact_duplicates": 0, "similar_duplicates": 0}
+
+        with patch.object(DatasetPipeline, "process_url", fake_process_url):
+            await pipeline.process_urls(
+                urls=["https://example.com/a", "https://example.com/b"],
+                dataset_name="batch_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="fr",
+                model_qa="gpt-4o-mini",
+            )
+
+        assert seen == [pipeline.llm_service, pipeline.llm_service]
+
+
+class TestDatasetPipelineCheckpoints:
+    """Tests for checkpointed, resumable pipeline stages"""
+
+    @staticmethod
+    def _fake_scrape(db: Session):
+        async def scrape(url, dataset_id):
+            snapshot = PageSnapshot(
+                url=url,
+                user_agent="Test Agent",
+                content="Scraped content",
+                retrieved_at=datetime.now(timezone.utc),
+                url_hash=PageSnapshot.compute_hash_from_url(url),
+                dataset_id=dataset_id,
+            )
+            db.add(snapshot)
+            db.commit()
+            return snapshot
+
+        return AsyncMock(side_effect=scrape)
+
+    @pytest.mark.asyncio
+    async def test_resume_after_qa_failure(self, pipeline: DatasetPipeline, db):
+        """Test a retried job skips the scrape and clean stages it completed"""
+        job = JobService(db).create_job(JobKind.GENERATE, {}, 1)
+        qa_item = QA(
+            question="What is this page about?",
+            answer="It is about the checkpointed pipeline.",
+            context="Scraped content about the checkpointed pipeline, long enough.",
+            confidence=0.9,
+        )
+        scrape = self._fake_scrape(db)
+
+        with (
+            patch.object(pipeline.scraper_service, "scrape_url", scrape),
+            patch.object(
+                pipeline.llm_service, "clean_text", AsyncMock(return_value="Cleaned")
+            ) as mock_clean,
+            patch.object(
+                pipeline.llm_service,
+                "generate_qa",
+                AsyncMock(side_effect=[RuntimeError("LLM down"), [qa_item]]),
+            ) as mock_gen_qa,
+        ):
+            with pytest.raises(RuntimeError, match="LLM down"):
+                await pipeline.process_url(
+                    url="https://example.com",
+                    dataset_name="checkpoint_dataset",
+                    model_cleaning="gpt-4o-mini",
+                    target_language="en",
+                    model_qa="gpt-4o-mini",
+                    job_id=job.id,
+                )
+
+            assert set(
+                JobService(db).get_checkpoints(job.id, "https://example.com")
+            ) == {
+                PipelineStage.SCRAPE,
+                PipelineStage.CLEAN,
+            }
+
+            result = await pipeline.process_url(
+                url="https://example.com",
+                dataset_name="checkpoint_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="en",
+                model_qa="gpt-4o-mini",
+                job_id=job.id,
+            )
+
+        assert scrape.await_count == 1
+        assert mock_clean.await_count == 1
+        assert mock_gen_qa.await_count == 2
+        assert mock_gen_qa.call_args[0][0] == "Cleaned"
+        assert result["total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_completed_url_is_not_processed_again(
+        self, pipeline: DatasetPipeline, db
+    ):
+        """Test a URL whose stages are all checkpointed only replays the result"""
+        job = JobService(db).create_job(JobKind.GENERATE, {}, 1)
+        qa_item = QA(
+            question="What is this page about?",
+            answer="It is about the checkpointed pipeline.",
+            context="Scraped content about the checkpointed pipeline, long enough.",
+            confidence=0.9,
+        )
+
+        with (
+            patch.object(pipeline.scraper_service, "scrape_url", self._fake_scrape(db)),
+            patch.object(
+                pipeline.llm_service, "clean_text", AsyncMock(return_value="Cleaned")
+            ),
+            patch.object(
+                pipeline.llm_service, "generate_qa", AsyncMock(return_value=[qa_item])
+            ),
+        ):
+            first = await pipeline.process_url(
+                url="https://example.com",
+                dataset_name="checkpoint_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="en",
+                model_qa="gpt-4o-mini",
+                job_id=job.id,
+            )
+
+        with (
+            patch.object(pipeline.scraper_service, "scrape_url") as mock_scrape,
+            patch.object(pipeline.llm_service, "clean_text") as mock_clean,
+            patch.object(pipeline.llm_service, "generate_qa") as mock_gen_qa,
+            patch.object(pipeline.qa_service, "process_qa_pairs") as mock_process,
+        ):
+            second = await pipeline.process_url(
+                url="https://example.com",
+                dataset_name="checkpoint_dataset",
+                model_cleaning="gpt-4o-mini",
+                target_language="en",
+                model_qa="gpt-4o-mini",
+                job_id=job.id,
+            )
+
+        mock_scrape.assert_not_called()
+        mock_clean.assert_not_called()
+        mock_gen_qa.assert_not_called()
+        mock_process.assert_not_called()
+        assert second["total"] == first["total"] == 1
+        assert second["qa_pairs"][0].question == qa_item.question
@@ -0,0 +1,246 @@
+"""Tests for the background job runner"""
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy.orm import Session, sessionmaker
+
+from server.models.dataset import Dataset, QASource
+from server.models.job import JobKind, JobStatus
+from server.pipelines.jobs import JobRunner
+from server.schemas.scraper import ScrapingMetrics
+from server.services.job import JobService
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return sessionmaker(bind=test_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def runner(session_factory):
+    return JobRunner(session_factory=session_factory, max_workers=2)
+
+
+def _payload(**extra):
+    return {
+        "dataset_name": "job_dataset",
+        "model_cleaning": "gpt-4o-mini",
+        "target_language": "fr",
+        "model_qa": "gpt-4o-mini",
+        "similarity_threshold": 0.9,
+        "use_cache": True,
+        **extra,
+    }
+
+
+def _get_job(session_factory, job_id):
+    db = session_factory()
+    try:
+        return JobService(db).get_job(job_id)
+    finally:
+        db.close()
+
+
+class TestJobRunner:
+    """Tests for JobRunner"""
+
+    @pytest.mark.asyncio
+    async def test_run_generate_job(self, runner, session_factory, test_db: Session):
+        """Test a single URL job stores the generation result"""
+        job = JobService(test_db).create_job(
+            JobKind.GENERATE, _payload(url="https://example.com"), 1
+        )
+        qa_item = Mock(question="What is this?", answer="A test")
+
+        with patch("server.pipelines.jobs.DatasetPipeline") as mock_pipeline_class:
+            mock_pipeline_class.return_value.process_url = AsyncMock(
+                return_value={
+                    "qa_pairs": [qa_item],
+                    "total": 1,
+                    "exact_duplicates": 0,
+                    "similar_duplicates": 0,
+                    "dataset_id": "dataset-1",
+                }
+            )
+            await runner.run(job.id)
+
+        stored = _get_job(session_factory, job.id)
+        assert stored.status == JobStatus.SUCCESS
+        assert stored.urls_processed == 1
+        assert stored.qa_pairs_generated == 1
+        assert stored.result["dataset_id"] == "dataset-1"
+        assert stored.result["qa_pairs"] == [
+            {"question": "What is this?", "answer": "A test"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_run_batch_job_records_progress(
+        self, runner, session_factory, test_db: Session
+    ):
+        """Test a batch job reports progress and aggregated metrics"""
+        urls = ["https://example.com/a", "https://example.com/b"]
+        job = JobService(test_db).create_job(
+            JobKind.GENERATE_BATCH, _payload(urls=urls, concurrency=2), len(urls)
+        )
+        progress_seen = []
+
+        async def fake_process_urls(**kwargs):
+            metrics = ScrapingMetrics()
+            metrics.urls_processed = 1
+            metrics.qa_pairs_generated = 3
+            await kwargs["on_progress"](metrics)
+            progress_seen.append(_get_job(session_factory, job.id).progress)
+            metrics.add_error(f"{urls[1]}: boom")
+            await kwargs["on_progress"](metrics)
+            return {"dataset_id": "dataset-1", "metrics": metrics, "results": []}
+
+        with patch("server.pipelines.jobs.DatasetPipeline") as mock_pipeline_class:
+            mock_pipeline_class.return_value.process_urls = fake_process_urls
+            await runner.run(job.id)
+
+        stored = _get_job(session_factory, job.id)
+        assert progress_seen == [0.5]
+        assert stored.status == JobStatus.SUCCESS
+        assert stored.urls_processed == 1
+        assert stored.qa_pairs_generated == 3
+        assert len(stored.errors) == 1
+        assert stored.progress == 1.0
+
+    @pytest.mark.asyncio
+    async def test_run_similarity_jobs(self, runner, session_factory, test_db: Session):
+        """Test analyze, clean and global duplicates jobs store their result"""
+        dataset = Dataset(name="similar_dataset")
+        test_db.add(dataset)
+        test_db.commit()
+        for question in ["What is Python?", "What is Python ?", "How do I cook?"]:
+            test_db.add(
+                QASource.from_qa_generation(
+                    question=question,
+                    answer="An answer long enough.",
+                    context="Some context.",
+                    confidence=0.9,
+                    source_url="https://example.com",
+                    dataset_id=dataset.id,
+                )
+            )
+        test_db.commit()
+        payload = {"dataset_id": dataset.id, "threshold": 0.9, "method": "exact"}
+        service = JobService(test_db)
+
+        analyze = service.create_job(JobKind.ANALYZE_SIMILARITIES, payload, 0)
+        await runner.run(analyze.id)
+        stored = _get_job(session_factory, analyze.id)
+        assert stored.status == JobStatus.SUCCESS
+        assert stored.progress == 1.0
+        assert stored.result["similar_pairs_found"] == 1
+
+        clean = service.create_job(JobKind.CLEAN_SIMILARITIES, payload, 0)
+        await runner.run(clean.id)
+        stored = _get_job(session_factory, clean.id)
+        assert stored.status == JobStatus.SUCCESS
+        assert stored.result["removed_records"] == 1
+        assert test_db.query(QASource).count() == 2
+
+        duplicates = service.create_job(
+            JobKind.GLOBAL_DUPLICATES, {"threshold": 0.9, "dataset_ids": None}, 0
+        )
+        await runner.run(duplicates.id)
+        stored = _get_job(session_factory, duplicates.id)
+        assert stored.status == JobStatus.SUCCESS
+        assert stored.result["total_records"] == 2
+        assert stored.result["clusters_found"] == 0
+
+    @pytest.mark.asyncio
+    async def test_similarity_job_records_progress(
+        self, runner, session_factory, test_db: Session
+    ):
+        """Test the progress of a similarity job is recorded while it runs"""
+        job = JobService(test_db).create_job(
+            JobKind.ANALYZE_SIMILARITIES, {"dataset_id": "d1", "threshold": 0.8}, 0
+        )
+        progress_seen = []
+
+        def fake_analyze(
+            db, dataset_id, threshold, method, workers, on_progress, update_index
+        ):
+            # Background analyses keep the similarity index up to date
+            assert update_index
+            on_progress(0.4)
+            progress_seen.append(_get_job(session_factory, job.id).progress)
+            return {"dataset_id": dataset_id, "similarities": []}
+
+        with (
+            patch("server.pipelines.jobs.SIMILARITY_PROGRESS_INTERVAL", 0.0),
+            patch("server.pipelines.jobs.analyze_dataset_similarities", fake_analyze),
+        ):
+            await runner.run(job.id)
+
+        assert progress_seen == [0.4]
+        assert _get_job(session_factory, job.id).status == JobStatus.SUCCESS
+
+    @pytest.mark.asyncio
+    async def test_similarity_job_progress_does_not_commit_analysis(
+        self, runner, session_factory, test_db: Session
+    ):
+        """Test progress is written apart, so a failed analysis leaves no state"""
+        job = JobService(test_db).create_job(
+            JobKind.ANALYZE_SIMILARITIES, {"dataset_id": "d1", "threshold": 0.8}, 0
+        )
+
+        def fake_analyze(
+            db, dataset_id, threshold, method, workers, on_progress, update_index
+        ):
+            db.add(Dataset(name="partial_dataset"))
+            on_progress(0.4)
+            raise RuntimeError("analysis failed")
+
+        with (
+            patch("server.pipelines.jobs.SIMILARITY_PROGRESS_INTERVAL", 0.0),
+            patch("server.pipelines.jobs.analyze_dataset_similarities", fake_analyze),
+        ):
+            await runner.run(job.id)
+
+        stored = _get_job(session_factory, job.id)
+        assert stored.status == JobStatus.ERROR
+        assert stored.progress == 0.4
+        db = session_factory()
+        try:
+            assert db.query(Dataset).filter_by(name="partial_dataset").count() == 0
+        finally:
+            db.close()
+
+    @pytest.mark.asyncio
+    async def test_run_failing_job(self, runner, session_factory, test_db: Session):
+        """Test a pipeline failure marks the job as error"""
+        job = JobService(test_db).create_job(
+            JobKind.GENERATE, _payload(url="https://example.com"), 1
+        )
+
+        with patch("server.pipelines.jobs.DatasetPipeline") as mock_pipeline_class:
+            mock_pipeline_class.return_value.process_url = AsyncMock(
+                side_effect=RuntimeError("scraping failed")
+            )
+            await runner.run(job.id)
+
+        stored = _get_job(session_factory, job.id)
+        assert stored.status == JobStatus.ERROR
+        assert stored.errors == ["scraping failed"]
+
+    @pytest.mark.asyncio
+    async def test_resume_submits_active_jobs(self, runner, test_db: Session):
+        """Test pending and interrupted jobs are resubmitted"""
+        service = JobService(test_db)
+        pending = service.create_job(JobKind.GENERATE, _payload(), 1)
+        interrupted = service.create_job(JobKind.GENERATE, _payload(), 1)
+        service.start_job(interrupted.id)
+        finished = service.create_job(JobKind.GENERATE, _payload(), 1)
+        service.fail_job(finished.id, "boom")
+
+        with patch.object(runner, "submit") as mock_submit:
+            resumed = await runner.resume()
+
+        assert resumed == 2
+        assert [c.args[0] for c in mock_submit.call_args_list] == [
+            pending.id,
+            interrupted.id,
+        ]
@@ -3,15 +3,21 @@ Tests for dataset service.
 """
 
 import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from server.models.dataset import Dataset, QASource
+from server.models.dataset import Dataset, QALshBucket, QASource
 from server.services.dataset import (
+    DatasetQuestions,
     DatasetService,
     get_datasets,
     get_dataset_by_id,
     analyze_dataset_similarities,
     clean_dataset_similarities,
+    find_global_duplicates,
+    stream_clean_dataset_similarities,
+    stream_dataset_similarities,
 )
 
 
@@ -240,6 +246,113 @@ def test_analyze_dataset_similarities_no_similar(test_db: Session):
     assert result["similar_pairs_found"] == 0
 
 
+def test_analyze_dataset_similarities_methods_agree(test_db: Session):
+    """Test the exact and TF-IDF engines report the same near duplicates."""
+    dataset = Dataset(name="methods_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+
+    questions = [
+        "What is the capital of France?",
+        "What is the capital of France ?",
+        "How do airplanes fly?",
+        "Who wrote the first compiler?",
+    ]
+    test_db.add_all(
+        [
+            QASource.from_qa_generation(
+                question=question,
+                answer="An answer",
+                context=f"Context {index}",
+                source_url="https://example.com",
+                dataset_id=str(dataset.id),
+            )
+            for index, question in enumerate(questions)
+        ]
+    )
+    test_db.commit()
+
+    exact = analyze_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.9, method="exact"
+    )
+    tfidf = analyze_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.9, method="tfidf"
+    )
+    index = analyze_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.9, method="index"
+    )
+
+    assert exact["similar_pairs_found"] == tfidf["similar_pairs_found"] == 1
+    assert index["similarities"] == exact["similarities"]
+    assert exact["pairs_considered"] == tfidf["pairs_considered"] == 6
+    assert exact["pairs_pruned"] == 5
+    assert exact["prune_rate"] == round(5 / 6, 3)
+    assert tfidf["pairs_pruned"] == 0
+    for result in (exact, tfidf):
+        pair = result["similarities"][0]
+        assert {pair["question1"], pair["question2"]} == set(questions[:2])
+        assert set(pair) == {
+            "record1_id",
+            "record2_id",
+            "similarity",
+            "question1",
+            "question2",
+        }
+
+
+def test_clean_dataset_similarities_lsh_method(test_db: Session):
+    """Test cleaning through the LSH index also removes the index entries."""
+    dataset = Dataset(name="lsh_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+
+    questions = [
+        "What is the capital of France?",
+        "What is the capital of France ?",
+        "How do airplanes fly?",
+    ]
+    records = [
+        QASource.from_qa_generation(
+            question=question,
+            answer="An answer",
+            context=f"Context {index}",
+            confidence=0.9 - index * 0.1,
+            source_url="https://example.com",
+            dataset_id=str(dataset.id),
+        )
+        for index, question in enumerate(questions)
+    ]
+    test_db.add_all(records)
+    test_db.commit()
+    duplicate_id = records[1].id
+
+    result = clean_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.9, method="lsh"
+    )
+
+    assert result["removed_records"] == 1
+    assert result["removed_items"][0]["id"] == duplicate_id
+    assert test_db.query(QASource).count() == 2
+    assert (
+        test_db.query(QALshBucket)
+        .filter(QALshBucket.qa_source_id == duplicate_id)
+        .count()
+        == 0
+    )
+
+
+def test_analyze_dataset_similarities_unknown_method(test_db: Session):
+    """Test analyze similarities with an unknown engine."""
+    dataset = Dataset(name="unknown_method_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+
+    with pytest.raises(ValueError, match="Unknown similarity method"):
+        analyze_dataset_similarities(test_db, str(dataset.id), method="fuzzy")
+
+
 def test_clean_dataset_similarities_empty_records(test_db: Session):
     """Test clean similarities with empty dataset."""
     dataset = Dataset(name="empty_clean_dataset")
@@ -353,3 +466,396 @@ def test_clean_dataset_similarities_no_duplicates(test_db: Session):
 
     assert result["removed_records"] == 0
     assert result["total_records"] == 2
+
+
+def _add_cluster_records(test_db: Session, dataset: Dataset, order):
+    """Adds five records, three of them duplicates, in the given order"""
+    base = datetime(2024, 1, 1)
+    specs = [
+        ("What is the capital of France?", 0.8, base + timedelta(days=2)),
+        ("What is the capital of France ?", 0.8, base + timedelta(days=1)),
+        ("what is the capital of France?", 0.5, base),
+        ("How do airplanes fly?", 0.9, base),
+        ("Who wrote the first compiler?", 0.9, base),
+    ]
+    records = []
+    for index in order:
+        question, confidence, created_at = specs[index]
+        qa = QASource.from_qa_generation(
+            question=question,
+            answer="An answer",
+            context=f"Context {index}",
+            confidence=confidence,
+            source_url="https://example.com",
+            dataset_id=str(dataset.id),
+        )
+        qa.created_at = created_at
+        records.append(qa)
+    test_db.add_all(records)
+    test_db.commit()
+
+
+@pytest.mark.parametrize("order", [[0, 1, 2, 3, 4], [4, 2, 3, 1, 0]])
+def test_clean_dataset_similarities_one_keeper_per_cluster(test_db: Session, order):
+    """Test a cluster keeps its highest-confidence, then oldest, record."""
+    dataset = Dataset(name="cluster_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+    _add_cluster_records(test_db, dataset, order)
+
+    result = clean_dataset_similarities(test_db, str(dataset.id), threshold=0.9)
+
+    assert result["removed_records"] == 2
+    assert {detail["keep_question"] for detail in result["details"]} == {
+        "What is the capital of France ?"
+    }
+    remaining = sorted(
+        qa.question
+        for qa in test_db.query(QASource).filter(QASource.dataset_id == dataset.id)
+    )
+    assert remaining == [
+        "How do airplanes fly?",
+        "What is the capital of France ?",
+        "Who wrote the first compiler?",
+    ]
+
+
+def test_clean_dataset_similarities_bulk_deletes(test_db: Session, monkeypatch):
+    """Test removals are sent as chunked DELETE ... WHERE id IN statements."""
+    import server.services.dataset as dataset_service
+
+    monkeypatch.setattr(dataset_service, "DELETE_BATCH_SIZE", 1)
+    dataset = Dataset(name="bulk_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+    _add_cluster_records(test_db, dataset, [0, 1, 2, 3, 4])
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        clean_dataset_similarities(test_db, str(dataset.id), threshold=0.9)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    deletes = [s for s in statements if s.startswith("DELETE FROM qa_sources")]
+    assert len(deletes) == 2
+    assert all("qa_sources.id IN" in s for s in deletes)
+
+
+def test_analyze_dataset_similarities_scores_older_record_first(test_db: Session):
+    """Test pairs are scored in insertion order, whatever the record IDs."""
+    dataset = Dataset(name="orientation_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    older, newer = (
+        QASource.from_qa_generation(
+            question=question,
+            answer="Paris",
+            context="Context",
+            source_url="https://example.com",
+            dataset_id=str(dataset.id),
+        )
+        for question in (
+            "What is capital France of the?",
+            "Capital of France, what is it?",
+        )
+    )
+    older.created_at = datetime(2024, 1, 1)
+    newer.created_at = datetime(2024, 1, 2)
+    test_db.add_all([newer, older])
+    test_db.commit()
+
+    # SequenceMatcher scores 0.333 this way round and 0.533 the other
+    result = analyze_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.3, method="exact"
+    )
+    assert [pair["similarity"] for pair in result["similarities"]] == [0.333]
+    result = analyze_dataset_similarities(
+        test_db, str(dataset.id), threshold=0.5, method="exact"
+    )
+    assert result["similar_pairs_found"] == 0
+
+
+def test_dataset_questions_load_narrow_columns(test_db: Session, monkeypatch):
+    """Test questions are streamed without the context, answer or metadata."""
+    import server.services.dataset as dataset_service
+
+    monkeypatch.setattr(dataset_service, "LOAD_BATCH_SIZE", 2)
+    dataset = Dataset(name="narrow_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    test_db.refresh(dataset)
+    records = []
+    created_at = datetime(2024, 1, 1)
+    for index in range(5):
+        qa = QASource.from_qa_generation(
+            question=f"Question {index}?",
+            answer="An answer",
+            context="A very long context " * 100,
+            confidence=0.5 + index / 10,
+            source_url="https://example.com",
+            dataset_id=str(dataset.id),
+        )
+        qa.created_at = created_at + timedelta(minutes=index)
+        records.append(qa)
+    records[0].expected_output = {"answer": "No confidence"}
+    test_db.add_all(records)
+    test_db.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        questions = DatasetQuestions.load(test_db, str(dataset.id))
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert len(questions) == 5
+    assert questions.ids == [qa.id for qa in records]
+    by_id = dict(zip(questions.ids, questions.questions))
+    assert by_id[records[3].id] == "Question 3?"
+    confidences = dict(zip(questions.ids, questions.confidences.tolist()))
+    assert confidences[records[0].id] == 0.0
+    assert confidences[records[4].id] == pytest.approx(0.9)
+    # Only extracts of the JSON columns are selected, never the whole documents
+    assert statements
+    for statement in statements:
+        assert "qa_metadata" not in statement
+        assert "qa_sources_input" not in statement
+        assert "qa_sources_expected_output" not in statement
+
+
+def _add_datasets(test_db: Session, questions_by_dataset):
+    datasets = []
+    for name, questions in questions_by_dataset.items():
+        dataset = Dataset(name=name)
+        test_db.add(dataset)
+        test_db.commit()
+        for index, question in enumerate(questions):
+            test_db.add(
+                QASource.from_qa_generation(
+                    question=question,
+                    answer="An answer",
+                    context=f"{name} context {index}",
+                    source_url=f"https://example.com/{name}",
+                    dataset_id=dataset.id,
+                )
+            )
+        datasets.append(dataset)
+    test_db.commit()
+    return datasets
+
+
+GLOBAL_QUESTIONS = {
+    "ansible": [
+        "What is the capital of France?",
+        "How do airplanes fly?",
+        "How do airplanes fly ?",
+    ],
+    "docker": ["What is the capital of France ?", "Who wrote the first compiler?"],
+    "kubernetes": ["What is the capital of France?!", "What is a pod?"],
+}
+
+
+def test_find_global_duplicates_across_datasets(test_db: Session):
+    """Test clusters span datasets and report the dataset of each record."""
+    ansible, docker, kubernetes = _add_datasets(test_db, GLOBAL_QUESTIONS)
+
+    result = find_global_duplicates(test_db, threshold=0.9)
+
+    assert result["total_records"] == 7
+    assert result["clusters_found"] == 2
+    assert result["cross_dataset_clusters"] == 1
+    assert result["duplicate_records"] == 3
+    france = result["clusters"][0]
+    assert france["size"] == 3
+    assert france["dataset_ids"] == sorted([ansible.id, docker.id, kubernetes.id])
+    assert {record["dataset_name"] for record in france["records"]} == {
+        "ansible",
+        "docker",
+        "kubernetes",
+    }
+    airplanes = result["clusters"][1]
+    assert airplanes["dataset_ids"] == [ansible.id]
+    assert {d["name"]: d["clustered_records"] for d in result["datasets"]} == {
+        "ansible": 3,
+        "docker": 1,
+        "kubernetes": 1,
+    }
+    # Only the pairs colliding in the LSH index are scored
+    assert result["pairs_considered"] < 7 * 6 // 2
+
+
+def test_find_global_duplicates_cross_dataset_only(test_db: Session):
+    """Test pairs within a dataset are skipped across datasets only."""
+    _add_datasets(test_db, GLOBAL_QUESTIONS)
+
+    result = find_global_duplicates(test_db, threshold=0.9, cross_dataset_only=True)
+
+    assert result["clusters_found"] == result["cross_dataset_clusters"] == 1
+    assert result["clusters"][0]["size"] == 3
+
+
+def test_find_global_duplicates_selected_datasets(test_db: Session):
+    """Test only the chosen datasets are compared, and unknown ones rejected."""
+    ansible, docker, _ = _add_datasets(test_db, GLOBAL_QUESTIONS)
+
+    result = find_global_duplicates(
+        test_db, [docker.id, ansible.id], threshold=0.9, cross_dataset_only=True
+    )
+
+    assert result["total_records"] == 5
+    assert [d["name"] for d in result["datasets"]] == ["ansible", "docker"]
+    assert result["clusters"][0]["size"] == 2
+
+    with pytest.raises(ValueError, match="not found"):
+        find_global_duplicates(test_db, [ansible.id, "missing"])
+
+
+STREAM_QUESTIONS = {
+    "stream": [
+        "What is the capital of France?",
+        "What is the capital of France ?",
+        "How do airplanes fly?",
+        "How do airplanes fly ?",
+        "Who wrote the first compiler?",
+    ]
+}
+
+
+def test_stream_dataset_similarities(test_db: Session):
+    """Test streamed pairs match the analysis, between a header and a summary."""
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+    expected = analyze_dataset_similarities(test_db, dataset.id, 0.9, "exact")
+
+    items = list(stream_dataset_similarities(test_db, dataset.id, 0.9, "exact"))
+
+    assert items[0]["type"] == "dataset"
+    assert items[0]["total_records"] == 5
+    assert items[-1] == {
+        "type": "summary",
+        "similar_pairs_found": 2,
+        "pairs_considered": expected["pairs_considered"],
+        "pairs_pruned": expected["pairs_pruned"],
+        "prune_rate": expected["prune_rate"],
+    }
+    pairs = [{k: v for k, v in i.items() if k != "type"} for i in items[1:-1]]
+    assert sorted(pairs, key=lambda x: x["record1_id"]) == sorted(
+        expected["similarities"], key=lambda x: x["record1_id"]
+    )
+
+
+def test_stream_dataset_similarities_validates_first(test_db: Session):
+    """Test an unknown dataset is rejected before streaming."""
+    with pytest.raises(ValueError, match="not found"):
+        stream_dataset_similarities(test_db, "missing")
+
+
+def test_stream_dataset_similarities_bounded(test_db: Session, monkeypatch):
+    """Test the comparisons wait for the reader and stop when it leaves."""
+    monkeypatch.setattr("server.services.dataset.STREAM_QUEUE_SIZE", 1)
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+
+    items = stream_dataset_similarities(test_db, dataset.id, 0.9, "exact")
+    assert next(items)["type"] == "dataset"
+    assert next(items)["type"] == "pair"
+    # Closing joins the comparison thread, blocked on the full queue
+    items.close()
+
+
+def test_stream_dataset_similarities_error(test_db: Session, monkeypatch):
+    """Test a failure of the comparisons ends the stream with an error item."""
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("comparison failed")
+
+    monkeypatch.setattr(
+        "server.services.similarity.ExactSimilarityEngine.find_similar_pairs", fail
+    )
+    items = list(stream_dataset_similarities(test_db, dataset.id, 0.9, "exact"))
+
+    assert items[-1] == {"type": "error", "detail": "comparison failed"}
+
+
+def test_clean_dataset_similarities_dry_run(test_db: Session):
+    """Test a dry run reports the removals and keeps the records."""
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+
+    result = clean_dataset_similarities(test_db, dataset.id, 0.9, dry_run=True)
+
+    assert result["dry_run"] is True
+    assert result["removed_records"] == 2
+    assert test_db.query(QASource).count() == 5
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.9])
+def test_clean_dataset_similarities_auto_keeps_ratio(
+    test_db: Session, monkeypatch, threshold
+):
+    """Test auto cleaning of a large dataset keeps the ratio-based engines."""
+    from server.core.config import config
+
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+    monkeypatch.setattr(config, "similarity_exact_max_records", 1)
+    expected = clean_dataset_similarities(
+        test_db, dataset.id, threshold, method="exact", dry_run=True
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("not a ratio-based engine")
+
+    for engine in ("TfidfSimilarityEngine", "LshSimilarityEngine"):
+        monkeypatch.setattr(
+            f"server.services.similarity.{engine}.find_similar_pairs", fail
+        )
+    result = clean_dataset_similarities(test_db, dataset.id, threshold, dry_run=True)
+
+    assert result["removed_items"] == expected["removed_items"]
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_stream_clean_dataset_similarities(test_db: Session, dry_run):
+    """Test removals are streamed, then applied unless it is a dry run."""
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+
+    items = list(
+        stream_clean_dataset_similarities(
+            test_db, dataset.id, 0.9, "exact", dry_run=dry_run
+        )
+    )
+
+    assert [item["type"] for item in items] == [
+        "dataset",
+        "removal",
+        "removal",
+        "summary",
+    ]
+    assert items[-1] == {"type": "summary", "removed_records": 2, "dry_run": dry_run}
+    remaining = {row[0] for row in test_db.query(QASource.id)}
+    removed = {item["id"] for item in items[1:3]}
+    assert len(remaining) == (5 if dry_run else 3)
+    assert removed.isdisjoint(remaining) != dry_run
+
+
+def test_stream_clean_dataset_similarities_interrupted(test_db: Session):
+    """Test nothing is removed when the stream is not read to the end."""
+    (dataset,) = _add_datasets(test_db, STREAM_QUESTIONS)
+
+    items = stream_clean_dataset_similarities(test_db, dataset.id, 0.9, "exact")
+    next(items)
+    next(items)
+    items.close()
+
+    assert test_db.query(QASource).count() == 5
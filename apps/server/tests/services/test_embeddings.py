@@ -0,0 +1,282 @@
+"""
+Tests for the embedding service and the vector index, against a local stub
+of an OpenAI-compatible embeddings server.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import openai
+import pytest
+from sqlalchemy.orm import Session
+
+from server.models.dataset import Dataset, QASource
+from server.models.embedding import Embedding
+from server.services.dataset import analyze_dataset_similarities
+from server.services.embeddings import (
+    EmbeddingScorer,
+    EmbeddingService,
+    VectorIndex,
+    close_embedding_client,
+    get_embedding_client,
+)
+from server.services.similarity import EmbeddingSimilarityEngine
+
+DIMENSIONS = 64
+STOPWORDS = {"what", "which", "is", "the", "of", "s", "a", "how", "do", "does"}
+
+
+def _stub_embedding(text: str) -> list:
+    """Bag of words without stopwords: word order and phrasing do not matter"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word not in STOPWORDS:
+            vector[zlib.crc32(word.encode()) % DIMENSIONS] += 1.0
+    return vector.tolist()
+
+
+@pytest.fixture
+def embeddings_server():
+    """Runs a stub embeddings endpoint; yields its base URL and received batches"""
+    batches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            batches.append(body["input"])
+            payload = json.dumps(
+                {
+                    "object": "list",
+                    "model": body["model"],
+                    "data": [
+                        {
+                            "object": "embedding",
+                            "index": i,
+                            "embedding": _stub_embedding(text),
+                        }
+                        for i, text in enumerate(body["input"])
+                    ],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/v1", batches
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def embedding_service(test_db: Session, embeddings_server):
+    base_url, _ = embeddings_server
+    client = openai.OpenAI(api_key="test-api-key", base_url=base_url, max_retries=0)
+    return EmbeddingService(test_db, client=client, model="stub", batch_size=2)
+
+
+QUESTIONS = [
+    "What is the capital city of France?",
+    "Which city is France's capital?",
+    "How do airplanes fly?",
+    "Who wrote the first compiler?",
+    "What is the capital city of France?",
+]
+
+
+def test_embed_batches_and_caches(embedding_service, embeddings_server, test_db):
+    """Test texts are embedded in batches, once, and cached by hash."""
+    _, batches = embeddings_server
+
+    vectors = embedding_service.embed(QUESTIONS)
+
+    assert vectors.shape == (5, DIMENSIONS)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    # The repeated question is only sent once
+    assert [len(batch) for batch in batches] == [2, 2]
+    assert test_db.query(Embedding).count() == 4
+    assert vectors[0] @ vectors[1] == pytest.approx(1.0)
+
+    again = embedding_service.embed(QUESTIONS[::-1])
+    assert len(batches) == 2
+    assert np.allclose(again, vectors[::-1])
+
+
+def test_embed_keeps_caller_changes_on_conflict(
+    embedding_service, test_db, monkeypatch
+):
+    """Test caching conflicting rows neither fails nor touches the caller's session."""
+    embedding_service.embed(QUESTIONS[:2])
+    # Another worker cached the texts after this one looked them up
+    monkeypatch.setattr(embedding_service, "_load_cached", lambda hashes: {})
+    dataset = Dataset(name="pending_dataset")
+    test_db.add(dataset)
+
+    vectors = embedding_service.embed(QUESTIONS[:3])
+
+    assert vectors.shape == (3, DIMENSIONS)
+    assert dataset in test_db.new
+    test_db.commit()
+    assert test_db.query(Dataset).filter_by(name="pending_dataset").count() == 1
+    assert test_db.query(Embedding).count() == 3
+
+
+def test_embedding_client_is_shared(test_db):
+    """Test services share one client until it is closed."""
+    close_embedding_client()
+    try:
+        client = get_embedding_client()
+        assert EmbeddingService(test_db).client is client
+        assert EmbeddingService(test_db).client is client
+
+        close_embedding_client()
+        assert get_embedding_client() is not client
+    finally:
+        close_embedding_client()
+
+
+def test_vector_index_is_memory_mapped_and_reused(embedding_service, tmp_path):
+    """Test the vectors are written once and read back memory-mapped."""
+    index = VectorIndex("dataset", directory=str(tmp_path))
+    ids = [str(i) for i in range(len(QUESTIONS))]
+
+    vectors = index.sync(ids, QUESTIONS, embedding_service)
+    assert isinstance(vectors, np.memmap)
+    written = (tmp_path / "dataset.npy").stat().st_mtime_ns
+
+    assert np.array_equal(index.sync(ids, QUESTIONS, embedding_service), vectors)
+    assert (tmp_path / "dataset.npy").stat().st_mtime_ns == written
+
+    index.delete()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_vector_index_sync_uses_unique_temporary_file(
+    embedding_service, tmp_path, monkeypatch
+):
+    """Test each sync writes its own temporary file before renaming it."""
+    renamed = []
+    replace = os.replace
+
+    def record_replace(source, destination):
+        renamed.append(source)
+        replace(source, destination)
+
+    monkeypatch.setattr("server.services.embeddings.os.replace", record_replace)
+    index = VectorIndex("dataset", directory=str(tmp_path))
+    ids = [str(i) for i in range(len(QUESTIONS))]
+    index.sync(ids, QUESTIONS, embedding_service)
+    index.sync(ids[:-1], QUESTIONS[:-1], embedding_service)
+
+    assert len(set(renamed)) == 2
+    assert all(os.path.dirname(path) == str(tmp_path) for path in renamed)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "dataset.json",
+        "dataset.npy",
+    ]
+
+
+def test_vector_index_ivf_matches_brute_force(tmp_path):
+    """Test the IVF search finds the pairs of the brute force search."""
+    generator = np.random.default_rng(0)
+    centers = generator.normal(size=(10, 32))
+    vectors = np.concatenate(
+        [center + generator.normal(scale=0.05, size=(20, 32)) for center in centers]
+    )
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+        np.float32
+    )
+
+    brute = VectorIndex("brute", directory=str(tmp_path))
+    expected = sorted(brute.similar_pairs(vectors, 0.95))
+    ivf = VectorIndex("ivf", directory=str(tmp_path), ivf_min_records=0, probes=3)
+    progress = []
+    found = sorted(ivf.similar_pairs(vectors, 0.95, on_progress=progress.append))
+
+    assert expected
+    assert [(i, j) for i, j, _ in found] == [(i, j) for i, j, _ in expected]
+    assert ivf.pairs_scored < brute.pairs_scored == 200 * 199 // 2
+    assert progress[-1] == 1.0
+    assert (tmp_path / "ivf.ivf.npz").exists()
+
+
+def test_embedding_engine_finds_paraphrases(
+    embedding_service, test_db: Session, tmp_path
+):
+    """Test the embedding method finds the paraphrases missed by ratios."""
+    dataset = Dataset(name="embedding_dataset")
+    test_db.add(dataset)
+    test_db.commit()
+    records = [
+        QASource.from_qa_generation(
+            question=question,
+            answer="An answer",
+            context=f"Context {i}",
+            source_url="https://example.com",
+            dataset_id=dataset.id,
+        )
+        for i, question in enumerate(QUESTIONS[:4])
+    ]
+    test_db.add_all(records)
+    test_db.commit()
+    engine = EmbeddingSimilarityEngine(
+        test_db,
+        dataset.id,
+        [r.id for r in records],
+        service=embedding_service,
+        index=VectorIndex(dataset.id, directory=str(tmp_path)),
+    )
+
+    pairs = engine.find_similar_pairs(QUESTIONS[:4], 0.9)
+    assert [(i, j) for i, j, _ in pairs] == [(0, 1)]
+    assert pairs[0][2] == pytest.approx(1.0)
+    assert engine.pairs_considered == 6
+    assert engine.pairs_pruned == 0
+
+    exact = analyze_dataset_similarities(test_db, dataset.id, 0.9, method="exact")
+    assert exact["similar_pairs_found"] == 0
+
+
+def test_check_for_duplicates_with_embedding_scorer(
+    embedding_service, embeddings_server, test_db: Session
+):
+    """Test a paraphrase of an existing question is a similar duplicate."""
+    _, batches = embeddings_server
+    test_db.add(
+        QASource.from_qa_generation(
+            question=QUESTIONS[0],
+            answer="Paris",
+            context="France context",
+            source_url="https://example.com/france",
+        )
+    )
+    test_db.commit()
+
+    results = QASource.check_for_duplicates_batch(
+        test_db,
+        [(QUESTIONS[1], "Paris"), (QUESTIONS[2], "With wings")],
+        "France context",
+        "https://example.com/france",
+        similarity_threshold=0.9,
+        scorer=EmbeddingScorer(embedding_service),
+    )
+
+    assert [result["type"] for result in results] == ["similar", "new"]
+    assert results[0]["similarity_score"] == pytest.approx(1.0)
+    # The batch and the candidates are embedded together
+    assert sum(len(batch) for batch in batches) == 3
@@ -0,0 +1,140 @@
+"""Tests for the QA ID filter"""
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from server.models.dataset import QASource
+from server.services.id_filter import QAIdFilter, get_qa_id_filter
+
+
+def _qa(question: str) -> QASource:
+    return QASource.from_qa_generation(
+        question=question,
+        answer="An answer",
+        context="Python context",
+        source_url="https://example.com",
+    )
+
+
+@pytest.fixture
+def captured(test_db: Session):
+    """Collects the SQL statements run on the test database"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_filter_is_shared_per_database(test_db: Session):
+    """Test sessions of one database share the filter, unless disabled."""
+    id_filter = get_qa_id_filter(test_db)
+
+    assert get_qa_id_filter(test_db) is id_filter
+    assert not id_filter.is_built
+    with patch("server.services.id_filter.config.qa_id_filter_enabled", False):
+        assert get_qa_id_filter(test_db) is None
+
+
+def test_new_pairs_skip_the_exact_lookup(test_db: Session, captured):
+    """Test hashes absent from the filter are not looked up."""
+    stored = _qa("What is Python?")
+    test_db.add(stored)
+    test_db.commit()
+    id_filter = get_qa_id_filter(test_db)
+
+    results = QASource.check_for_duplicates_batch(
+        test_db,
+        [("What is Python?", "An answer"), ("Who made Rust?", "Graydon Hoare")],
+        "Python context",
+        "https://example.com",
+        id_filter=id_filter,
+    )
+
+    assert [result["type"] for result in results] == ["exact", "new"]
+    lookups = [s for s in captured if "WHERE qa_sources.id IN" in s]
+    assert len(lookups) == 1
+    assert lookups[0].count("?") == 1
+
+    captured.clear()
+    QASource.check_for_duplicates(
+        test_db,
+        "Who made Rust?",
+        "Graydon Hoare",
+        "Python context",
+        "https://example.com",
+        id_filter=id_filter,
+    )
+    assert not any("WHERE qa_sources.id IN" in s for s in captured)
+
+
+def test_inserted_records_are_added(test_db: Session):
+    """Test records flushed after the filter is built are found."""
+    id_filter = get_qa_id_filter(test_db)
+    id_filter.build(test_db)
+    qa = _qa("What is Python?")
+    test_db.add(qa)
+    test_db.commit()
+
+    assert id_filter.possibly_existing(test_db, [qa.id, "unknown"]) == {qa.id}
+
+
+def test_records_flushed_during_a_build_are_kept(test_db: Session):
+    """Test IDs added while the records are read end up in the new filter."""
+    id_filter = get_qa_id_filter(test_db)
+    read_ids = id_filter._read_ids
+
+    def read_then_flush(db, since=None):
+        ids = read_ids(db, since)
+        # Flushed by another session after the read, before the swap
+        id_filter.add(["flushed-during-build"])
+        return ids
+
+    with patch.object(id_filter, "_read_ids", side_effect=read_then_flush):
+        id_filter.build(test_db)
+
+    assert id_filter.possibly_existing(test_db, ["flushed-during-build"]) == {
+        "flushed-during-build"
+    }
+
+
+def test_saved_filter_catches_up(test_db: Session, tmp_path, captured):
+    """Test a saved filter is loaded and completed with newer records."""
+    path = str(tmp_path / "qa_ids.npz")
+    old = _qa("What is Python?")
+    test_db.add(old)
+    test_db.commit()
+    QAIdFilter(test_db.get_bind(), path=path).build(test_db)
+
+    # Inserted by another process, after the filter was saved
+    new = _qa("Who made Rust?")
+    test_db.add(new)
+    test_db.commit()
+    captured.clear()
+
+    loaded = QAIdFilter(test_db.get_bind(), path=path)
+    assert loaded.possibly_existing(test_db, [old.id, new.id]) == {old.id, new.id}
+    # Only the records created since the filter was built are read
+    assert any("qa_sources.created_at >=" in s for s in captured)
+
+
+def test_saved_filter_of_another_database_is_ignored(test_db: Session, tmp_path):
+    """Test a filter saved for another database is rebuilt."""
+    path = str(tmp_path / "qa_ids.npz")
+    stale = QAIdFilter(test_db.get_bind(), path=path)
+    stale.engine_url = "sqlite:///other.db"
+    stale.build(test_db)
+    qa = _qa("What is Python?")
+    test_db.add(qa)
+    test_db.commit()
+
+    loaded = QAIdFilter(test_db.get_bind(), path=path)
+
+    assert loaded.possibly_existing(test_db, [qa.id]) == {qa.id}
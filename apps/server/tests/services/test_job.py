@@ -0,0 +1,212 @@
+"""
+Tests for job service.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from server.models.job import JobKind, JobStatus, PipelineStage
+from server.services.job import JobService
+
+
+def _create_job(test_db: Session, urls_total: int = 2):
+    service = JobService(test_db)
+    return service, service.create_job(
+        JobKind.GENERATE_BATCH, {"urls": ["https://example.com"]}, urls_total
+    )
+
+
+def test_create_job(test_db: Session):
+    """Test creating a pending job."""
+    _, job = _create_job(test_db)
+
+    assert job.id is not None
+    assert job.status == JobStatus.PENDING
+    assert job.urls_total == 2
+    assert job.payload == {"urls": ["https://example.com"]}
+    assert job.errors == []
+
+
+def test_start_job(test_db: Session):
+    """Test starting a job marks it processing."""
+    service, job = _create_job(test_db)
+
+    started = service.start_job(job.id)
+
+    assert started is not None
+    assert started.status == JobStatus.PROCESSING
+    assert started.started_at is not None
+
+
+def test_start_unknown_or_finished_job(test_db: Session):
+    """Test starting an unknown or finished job returns None."""
+    service, job = _create_job(test_db)
+    service.complete_job(job.id, result={}, urls_processed=2, qa_pairs_generated=0)
+
+    assert service.start_job("missing") is None
+    assert service.start_job(job.id) is None
+
+
+def test_update_progress(test_db: Session):
+    """Test progress counts processed and failed URLs."""
+    service, job = _create_job(test_db, urls_total=4)
+    service.start_job(job.id)
+
+    updated = service.update_progress(job.id, 1, 5, ["https://x: boom"])
+
+    assert updated.urls_processed == 1
+    assert updated.qa_pairs_generated == 5
+    assert updated.progress == 0.5
+    assert updated.errors == ["https://x: boom"]
+
+
+def test_complete_job(test_db: Session):
+    """Test completing a job stores its result."""
+    service, job = _create_job(test_db)
+    service.start_job(job.id)
+
+    completed = service.complete_job(
+        job.id, result={"dataset_id": "d1"}, urls_processed=2, qa_pairs_generated=7
+    )
+
+    assert completed.status == JobStatus.SUCCESS
+    assert completed.result == {"dataset_id": "d1"}
+    assert completed.progress == 1.0
+    assert completed.finished_at is not None
+    assert completed.duration >= 0.0
+
+
+def test_fail_job(test_db: Session):
+    """Test failing a job records the error."""
+    service, job = _create_job(test_db)
+    service.start_job(job.id)
+
+    failed = service.fail_job(job.id, "boom")
+
+    assert failed.status == JobStatus.ERROR
+    assert failed.errors == ["boom"]
+
+
+def test_list_active_jobs(test_db: Session):
+    """Test only pending and processing jobs are listed as active."""
+    service, pending = _create_job(test_db)
+    _, processing = _create_job(test_db)
+    _, finished = _create_job(test_db)
+    service.start_job(processing.id)
+    service.fail_job(finished.id, "boom")
+
+    active_ids = {job.id for job in service.list_active_jobs()}
+
+    assert active_ids == {pending.id, processing.id}
+
+
+def test_list_jobs_filtered_by_status(test_db: Session):
+    """Test listing jobs filtered by status."""
+    service, job = _create_job(test_db)
+    _create_job(test_db)
+    service.fail_job(job.id, "boom")
+
+    assert [j.id for j in service.list_jobs(status=JobStatus.ERROR)] == [job.id]
+    assert len(service.list_jobs()) == 2
+
+
+def test_to_result(test_db: Session):
+    """Test serializing a job in the DatasetResult format."""
+    service, job = _create_job(test_db)
+
+    result = JobService.to_result(job)
+
+    assert result["task_id"] == job.id
+    assert result["status"] == JobStatus.PENDING
+    assert result["kind"] == JobKind.GENERATE_BATCH
+    assert result["urls_total"] == 2
+    assert result["rate"] == 0.0
+
+
+def test_set_progress_and_eta(test_db: Session):
+    """Test the progress of a job without URLs gives an estimated time left."""
+    service = JobService(test_db)
+    job = service.create_job(JobKind.ANALYZE_SIMILARITIES, {"dataset_id": "d1"}, 0)
+    service.start_job(job.id)
+    job.started_at = datetime.now(timezone.utc) - timedelta(seconds=30)
+
+    service.set_progress(job.id, 0.25)
+
+    result = JobService.to_result(job)
+    assert result["progress"] == 0.25
+    assert result["eta"] == pytest.approx(90.0, rel=0.05)
+
+
+def test_to_result_pages_similarity_lists(test_db: Session):
+    """Test the lists of similarity jobs are only served by pages."""
+    service = JobService(test_db)
+    job = service.create_job(JobKind.CLEAN_SIMILARITIES, {"dataset_id": "d1"}, 0)
+    items = [{"id": str(i)} for i in range(5)]
+    service.complete_job(
+        job.id,
+        result={"removed_records": 5, "removed_items": items, "details": []},
+        urls_processed=0,
+        qa_pairs_generated=0,
+    )
+
+    result = JobService.to_result(job)
+    assert result["result"] == {"removed_records": 5}
+    assert result["eta"] is None
+
+    page = JobService.get_result_page(job, offset=3, limit=10)
+    assert page["field"] == "removed_items"
+    assert page["total"] == 5
+    assert page["items"] == items[3:]
+    assert JobService.get_result_page(job, field="details")["items"] == []
+    assert JobService.get_result_page(job, field="removed_records") is None
+
+
+def test_retry_job(test_db: Session):
+    """Test retrying a failed job puts it back in the queue."""
+    service, job = _create_job(test_db)
+    service.fail_job(job.id, "boom")
+
+    retried = service.retry_job(job.id)
+
+    assert retried.status == JobStatus.PENDING
+    assert retried.errors == []
+    assert retried.finished_at is None
+
+
+def test_retry_job_not_failed(test_db: Session):
+    """Test only failed jobs can be retried."""
+    service, job = _create_job(test_db)
+
+    assert service.retry_job(job.id) is None
+    assert service.retry_job("missing") is None
+
+
+def test_save_and_get_checkpoints(test_db: Session):
+    """Test checkpoints are keyed by stage and scoped to a URL."""
+    service, job = _create_job(test_db)
+    service.save_checkpoint(
+        job.id, "https://a", PipelineStage.SCRAPE, {"page_snapshot_id": "p1"}
+    )
+    service.save_checkpoint(
+        job.id, "https://b", PipelineStage.SCRAPE, {"page_snapshot_id": "p2"}
+    )
+
+    assert service.get_checkpoints(job.id, "https://a") == {
+        PipelineStage.SCRAPE: {"page_snapshot_id": "p1"}
+    }
+    assert service.get_checkpoints(job.id, "https://c") == {}
+
+
+def test_save_checkpoint_replaces_previous(test_db: Session):
+    """Test saving a stage twice keeps only the latest data."""
+    service, job = _create_job(test_db)
+    service.save_checkpoint(job.id, "https://a", PipelineStage.QA, {"qa_pairs": []})
+    service.save_checkpoint(
+        job.id, "https://a", PipelineStage.QA, {"qa_pairs": [{"question": "Q?"}]}
+    )
+
+    assert service.get_checkpoints(job.id, "https://a") == {
+        PipelineStage.QA: {"qa_pairs": [{"question": "Q?"}]}
+    }
@@ -2,7 +2,10 @@
 Tests for LLM service.
 """
 
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from server.core.cache import LLMCache
+from server.schemas.dataset import QA
 from server.services.llm import LLMService, PromptManager
 
 
@@ -26,7 +29,7 @@ def test_prompt_manager_qa_prompt_custom_language():
     assert "Sample context" in prompt
 
 
-@patch("server.services.llm.openai.OpenAI")
+@patch("server.services.llm.openai.AsyncOpenAI")
 @patch("server.services.llm.instructor.from_openai")
 def test_llm_service_initialization(mock_instructor, mock_openai):
     """Test LLMService initialization."""
@@ -36,8 +39,8 @@ def test_llm_service_initialization(mock_instructor, mock_openai):
     assert service.prompt_manager is not None
 
 
-@patch("server.services.llm.openai.OpenAI")
-def test_clean_text_success(mock_openai_class):
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_success(mock_openai_class):
     """Test successful text cleaning."""
     # Setup mock
     mock_client = MagicMock()
@@ -46,35 +49,35 @@ def test_clean_text_success(mock_openai_class):
     mock_response = MagicMock()
     mock_response.choices = [MagicMock()]
     mock_response.choices[0].message.content = "Cleaned text content"
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
 
     with patch("server.services.llm.instructor.from_openai"):
         service = LLMService()
-        result = service.clean_text("Dirty text with ads and navigation")
+        result = await service.clean_text("Dirty text with ads and navigation")
 
     assert result == "Cleaned text content"
     mock_client.chat.completions.create.assert_called_once()
 
 
-@patch("server.services.llm.openai.OpenAI")
-def test_clean_text_failure_returns_original(mock_openai_class):
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_failure_returns_original(mock_openai_class):
     """Test that clean_text returns original text on failure."""
     # Setup mock to raise exception
     mock_client = MagicMock()
     mock_openai_class.return_value = mock_client
-    mock_client.chat.completions.create.side_effect = Exception("API Error")
+    mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
 
     with patch("server.services.llm.instructor.from_openai"):
         service = LLMService()
         original_text = "Original text"
-        result = service.clean_text(original_text)
+        result = await service.clean_text(original_text)
 
     assert result == original_text
 
 
-@patch("server.services.llm.openai.OpenAI")
+@patch("server.services.llm.openai.AsyncOpenAI")
 @patch("server.services.llm.instructor.from_openai")
-def test_generate_qa_success(mock_instructor_from, mock_openai_class):
+async def test_generate_qa_success(mock_instructor_from, mock_openai_class):
     """Test successful QA generation."""
     # Setup mocks
     mock_client = MagicMock()
@@ -87,19 +90,21 @@ def test_generate_qa_success(mock_instructor_from, mock_openai_class):
     mock_qa = MagicMock()
     mock_qa.question = "Test question?"
     mock_qa.answer = "Test answer"
-    mock_instructor_client.chat.completions.create.return_value = [mock_qa]
+    mock_instructor_client.chat.completions.create = AsyncMock(return_value=[mock_qa])
 
     service = LLMService()
-    result = service.generate_qa("Sample text for QA generation")
+    result = await service.generate_qa("Sample text for QA generation")
 
     assert len(result) == 1
     assert result[0].question == "Test question?"
     assert result[0].answer == "Test answer"
 
 
-@patch("server.services.llm.openai.OpenAI")
+@patch("server.services.llm.openai.AsyncOpenAI")
 @patch("server.services.llm.instructor.from_openai")
-def test_generate_qa_failure_returns_empty(mock_instructor_from, mock_openai_class):
+async def test_generate_qa_failure_returns_empty(
+    mock_instructor_from, mock_openai_class
+):
     """Test that generate_qa returns empty list on failure."""
     # Setup mocks
     mock_client = MagicMock()
@@ -107,16 +112,18 @@ def test_generate_qa_failure_returns_empty(mock_instructor_from, mock_openai_cla
 
     mock_instructor_client = MagicMock()
     mock_instructor_from.return_value = mock_instructor_client
-    mock_instructor_client.chat.completions.create.side_effect = Exception("API Error")
+    mock_instructor_client.chat.completions.create = AsyncMock(
+        side_effect=Exception("API Error")
+    )
 
     service = LLMService()
-    result = service.generate_qa("Sample text")
+    result = await service.generate_qa("Sample text")
 
     assert result == []
 
 
-@patch("server.services.llm.openai.OpenAI")
-def test_get_models_success(mock_openai_class):
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_get_models_success(mock_openai_class):
     """Test successful model listing."""
     # Setup mock
     mock_client = MagicMock()
@@ -132,27 +139,229 @@ def test_get_models_success(mock_openai_class):
 
     mock_response = MagicMock()
     mock_response.data = [mock_model1, mock_model2]
-    mock_client.models.list.return_value = mock_response
+    mock_client.models.list = AsyncMock(return_value=mock_response)
 
     with patch("server.services.llm.instructor.from_openai"):
         service = LLMService()
-        result = service.get_models()
+        result = await service.get_models()
 
     assert len(result) == 2
     assert result[0]["id"] == "gpt-4"
     assert result[1]["id"] == "gpt-3.5-turbo"
 
 
-@patch("server.services.llm.openai.OpenAI")
-def test_get_models_failure_returns_empty(mock_openai_class):
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_get_models_failure_returns_empty(mock_openai_class):
     """Test that get_models returns empty list on failure."""
     # Setup mock to raise exception
     mock_client = MagicMock()
     mock_openai_class.return_value = mock_client
-    mock_client.models.list.side_effect = Exception("API Error")
+    mock_client.models.list = AsyncMock(side_effect=Exception("API Error"))
 
     with patch("server.services.llm.instructor.from_openai"):
         service = LLMService()
-        result = service.get_models()
+        result = await service.get_models()
 
     assert result == []
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_uses_cache(mock_openai_class):
+    """Test that a cached cleaning result skips the LLM call."""
+    mock_client = MagicMock()
+    mock_openai_class.return_value = mock_client
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = "Cleaned text content"
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+    with patch("server.services.llm.instructor.from_openai"):
+        service = LLMService(cache=LLMCache())
+        first = await service.clean_text("Dirty text", "gpt-4o-mini")
+        second = await service.clean_text("Dirty text", "gpt-4o-mini")
+
+    assert first == second == "Cleaned text content"
+    mock_client.chat.completions.create.assert_called_once()
+    assert service.cache is not None
+    assert service.cache.stats()["hits"] == 1
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_cache_bypass(mock_openai_class):
+    """Test that use_cache=False always calls the LLM."""
+    mock_client = MagicMock()
+    mock_openai_class.return_value = mock_client
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = "Cleaned text content"
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+    with patch("server.services.llm.instructor.from_openai"):
+        service = LLMService(cache=LLMCache())
+        await service.clean_text("Dirty text", use_cache=False)
+        await service.clean_text("Dirty text", use_cache=False)
+
+    assert mock_client.chat.completions.create.call_count == 2
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_failure_not_cached(mock_openai_class):
+    """Test that fallback results from failed calls are not cached."""
+    mock_client = MagicMock()
+    mock_openai_class.return_value = mock_client
+    mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+
+    with patch("server.services.llm.instructor.from_openai"):
+        service = LLMService(cache=LLMCache())
+        await service.clean_text("Original text")
+
+    assert service.cache is not None
+    assert service.cache.stats()["entries"] == 0
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+@patch("server.services.llm.instructor.from_openai")
+async def test_generate_qa_uses_cache(mock_instructor_from, mock_openai_class):
+    """Test that cached QA pairs are returned as QA models."""
+    mock_instructor_client = MagicMock()
+    mock_instructor_from.return_value = mock_instructor_client
+
+    qa = QA(
+        question="What is Python?",
+        answer="Python is a high-level programming language.",
+        context="Python is a high-level programming language used widely.",
+    )
+    mock_instructor_client.chat.completions.create = AsyncMock(return_value=[qa])
+
+    service = LLMService(cache=LLMCache())
+    await service.generate_qa("Sample text", "en", "gpt-4o-mini")
+    result = await service.generate_qa("Sample text", "en", "gpt-4o-mini")
+
+    mock_instructor_client.chat.completions.create.assert_called_once()
+    assert result == [qa]
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_chunks_long_text_in_order(mock_openai_class):
+    """Test that long text is cleaned per chunk and reassembled in order."""
+    mock_client = MagicMock()
+    mock_openai_class.return_value = mock_client
+
+    async def fake_create(**kwargs):
+        chunk = kwargs["messages"][1]["content"]
+        # Finish the first chunk last to check that order is preserved
+        await asyncio.sleep(0.02 if chunk.startswith("a") else 0)
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = f"clean-{chunk[0]}"
+        return response
+
+    mock_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+    text = "\n\n".join(["a" * 60, "b" * 60, "c" * 60])
+
+    with (
+        patch("server.services.llm.instructor.from_openai"),
+        patch("server.services.llm.config.cleaning_chunk_size", 70),
+    ):
+        service = LLMService()
+        result = await service.clean_text(text)
+
+    assert mock_client.chat.completions.create.call_count == 3
+    assert result == "clean-a\n\nclean-b\n\nclean-c"
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+async def test_clean_text_bounded_concurrency(mock_openai_class):
+    """Test that no more than llm_max_concurrency chunks are cleaned at once."""
+    mock_client = MagicMock()
+    mock_openai_class.return_value = mock_client
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = "clean"
+        return response
+
+    mock_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+    text = "\n\n".join(["word " * 10] * 8)
+
+    with (
+        patch("server.services.llm.instructor.from_openai"),
+        patch("server.services.llm.config.cleaning_chunk_size", 60),
+        patch("server.services.llm.config.llm_max_concurrency", 2),
+    ):
+        service = LLMService()
+        await service.clean_text(text)
+
+    assert mock_client.chat.completions.create.call_count == 8
+    assert max_in_flight == 2
+
+
+def _make_qa(question: str) -> QA:
+    return QA(
+        question=question,
+        answer="This answer is long enough to be valid.",
+        context="This context is long enough to pass the schema validation.",
+    )
+
+
+@patch("server.services.llm.openai.AsyncOpenAI")
+@patch("server.services.llm.instructor.from_openai")
+async def test_generate_qa_fans_out_over_chunks(
+    mock_instructor_from, mock_openai_class
+):
+    """Test that long text is split and QA pairs are merged in chunk order."""
+    mock_instructor_client = MagicMock()
+    mock_instructor_from.return_value = mock_instructor_client
+
+    async def fake_create(**kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        if "a" * 60 in prompt:
+            await asyncio.sleep(0.02)
+            return [_make_qa("What does the first part describe?")]
+        if "b" * 60 in prompt:
+            return [_make_qa("What does the second part describe?")]
+        return [_make_qa("Which topic closes the third part?")]
+
+    mock_instructor_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+    text = "\n\n".join(["a" * 60, "b" * 60, "c" * 60])
+
+    with patch("server.services.llm.config.qa_chunk_size", 70):
+        service = LLMService()
+        result = await service.generate_qa(text, "en", "gpt-4o-mini")
+
+    assert mock_instructor_client.chat.completions.create.call_count == 3
+    assert [qa.question for qa in result] == [
+        "What does the first part describe?",
+        "What does the second part describe?",
+        "Which topic closes the third part?",
+    ]
+
+
+def test_merge_qa_lists_drops_in_batch_duplicates():
+    """Test that duplicate questions across chunks are merged away."""
+    merged = LLMService._merge_qa_lists(
+        [
+            [_make_qa("What is Python used for?")],
+            [
+                _make_qa("what is python  used for?"),
+                _make_qa("What is Python mostly used for?"),
+                _make_qa("Who created the Python language?"),
+            ],
+        ],
+        similarity_threshold=0.85,
+    )
+
+    assert [qa.question for qa in merged] == [
+        "What is Python used for?",
+        "Who created the Python language?",
+    ]
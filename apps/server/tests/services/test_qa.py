@@ -6,7 +6,13 @@ from unittest.mock import Mock, patch
 from sqlalchemy.orm import Session
 
 from server.services.qa import QAService
-from server.models.dataset import QASource, Dataset
+from server.models.dataset import (
+    QASource,
+    QALshBucket,
+    QASimilarityFingerprint,
+    QASimilarityPair,
+    Dataset,
+)
 
 
 @pytest.fixture
@@ -150,6 +156,34 @@ class TestQAService:
         )
         assert len(qa_records) == 2
 
+    def test_process_qa_pairs_references_cleaned_text(
+        self, qa_service: QAService, db: Session, sample_dataset
+    ):
+        """Test rows keep the QA passage instead of the whole cleaned page"""
+        page = "Docker packages applications into containers. " * 200
+        mock_qa = Mock()
+        mock_qa.question = "What does Docker do?"
+        mock_qa.answer = "It packages applications into containers"
+        mock_qa.context = "Docker packages applications into containers."
+        mock_qa.confidence = 0.9
+
+        result = qa_service.process_qa_pairs(
+            qa_list=[mock_qa],
+            cleaned_text=page,
+            url="https://example.com",
+            page_snapshot_id="1",
+            dataset_name=sample_dataset.name,
+            model="gpt-4o-mini",
+            dataset_id=sample_dataset.id,
+            cleaned_text_id="cleaned-1",
+        )
+
+        assert result["total"] == 1
+        record = db.query(QASource).one()
+        assert record.cleaned_text_id == "cleaned-1"
+        assert record.context == mock_qa.context
+        assert record.input["context_span"] == [0, len(mock_qa.context)]
+
     def test_process_qa_pairs_exact_duplicate(
         self, qa_service: QAService, db: Session, sample_dataset, sample_qa_source
     ):
@@ -172,17 +206,19 @@ class TestQAService:
         assert result["exact_duplicates"] == 1
         assert result["total"] == 0
 
-    @patch("server.models.dataset.QASource.check_for_duplicates")
+    @patch("server.models.dataset.QASource.check_for_duplicates_batch")
     def test_process_qa_pairs_similar_duplicate(
         self, mock_check_duplicates, qa_service: QAService, db: Session, sample_dataset
     ):
         """Test processing QA pairs with similar duplicate"""
         # Mock duplicate check to return similar
-        mock_check_duplicates.return_value = {
-            "type": "similar",
-            "duplicate_id": "similar-id",
-            "similarity_score": 0.92,
-        }
+        mock_check_duplicates.return_value = [
+            {
+                "type": "similar",
+                "duplicate_id": "similar-id",
+                "similarity_score": 0.92,
+            }
+        ]
 
         mock_qa = Mock()
         mock_qa.question = "What exactly is Python?"
@@ -235,7 +271,7 @@ class TestQAService:
         """Test processing QA pairs with mixed results (new, exact, similar)"""
         # First QA - new
         mock_qa1 = Mock()
-        mock_qa1.question = "New question 1?"
+        mock_qa1.question = "How do I install the package?"
         mock_qa1.answer = "New answer 1"
         mock_qa1.confidence = 0.9
 
@@ -247,7 +283,7 @@ class TestQAService:
 
         # Third QA - new
         mock_qa3 = Mock()
-        mock_qa3.question = "New question 2?"
+        mock_qa3.question = "Which license is the code under?"
         mock_qa3.answer = "New answer 2"
         mock_qa3.confidence = 0.8
 
@@ -265,6 +301,131 @@ class TestQAService:
         assert result["total"] == 2  # Two new items
         assert result["exact_duplicates"] == 1
 
+    def test_process_qa_pairs_intra_batch_duplicates(
+        self, qa_service: QAService, db: Session, sample_dataset
+    ):
+        """Test that QA pairs of one page are also checked against each other"""
+        items = []
+        for question, answer in [
+            ("What is Terraform?", "An infrastructure as code tool"),
+            ("What is Terraform?", "An infrastructure as code tool"),
+            ("What is Terraform ?", "A tool to manage infrastructure"),
+            ("Who develops Terraform?", "HashiCorp"),
+        ]:
+            item = Mock(spec=["question", "answer", "confidence"])
+            item.question, item.answer, item.confidence = question, answer, 0.9
+            items.append(item)
+
+        result = qa_service.process_qa_pairs(
+            qa_list=items,
+            cleaned_text="Terraform is an infrastructure as code tool by HashiCorp.",
+            url="https://example.com/terraform",
+            page_snapshot_id="1",
+            dataset_name=sample_dataset.name,
+            model="gpt-4o-mini",
+            dataset_id=sample_dataset.id,
+            similarity_threshold=0.9,
+        )
+
+        assert result == {"total": 2, "exact_duplicates": 1, "similar_duplicates": 1}
+        assert db.query(QASource).count() == 2
+
+    def test_process_qa_pairs_indexes_new_records(
+        self, qa_service: QAService, db: Session, sample_dataset
+    ):
+        """Test saved QA pairs are added to the LSH index of their dataset"""
+        item = Mock(spec=["question", "answer", "confidence"])
+        item.question, item.answer, item.confidence = "What is Ansible?", "A tool", 0.9
+
+        qa_service.process_qa_pairs(
+            qa_list=[item],
+            cleaned_text="Ansible automates configuration.",
+            url="https://example.com/ansible",
+            page_snapshot_id="1",
+            dataset_name=sample_dataset.name,
+            model="gpt-4o-mini",
+            dataset_id=sample_dataset.id,
+        )
+
+        record = db.query(QASource).one()
+        buckets = db.query(QALshBucket).filter(QALshBucket.qa_source_id == record.id)
+        assert buckets.count() > 0
+        assert {bucket.dataset_id for bucket in buckets} == {sample_dataset.id}
+        assert QALshBucket.ensure_index(db, sample_dataset.id) == 0
+
+        qa_service.delete_qa_source(record.id)
+        assert db.query(QALshBucket).count() == 0
+
+    def test_process_qa_pairs_updates_similarity_index(
+        self, qa_service: QAService, db: Session, sample_dataset
+    ):
+        """Test saved QA pairs are compared with the dataset in the similarity index"""
+        for question in [
+            "What is Ansible used for?",
+            "What is Ansible mostly used for?",
+        ]:
+            item = Mock(spec=["question", "answer", "confidence"])
+            item.question, item.answer, item.confidence = question, "A tool", 0.9
+            qa_service.process_qa_pairs(
+                qa_list=[item],
+                cleaned_text="Ansible automates configuration.",
+                url="https://example.com/ansible",
+                page_snapshot_id="1",
+                dataset_name=sample_dataset.name,
+                model="gpt-4o-mini",
+                dataset_id=sample_dataset.id,
+            )
+
+        assert db.query(QASimilarityFingerprint).count() == 2
+        pair = db.query(QASimilarityPair).one()
+        assert pair.dataset_id == sample_dataset.id
+        assert pair.score == pytest.approx(50 / 57)
+
+        qa_service.delete_qa_source(pair.record1_id)
+        assert db.query(QASimilarityPair).count() == 0
+        assert db.query(QASimilarityFingerprint).count() == 1
+
+    def test_process_qa_pairs_constant_queries(
+        self, qa_service: QAService, db: Session, sample_dataset
+    ):
+        """Test that the number of SELECTs does not grow with the batch size"""
+        from sqlalchemy import event
+
+        items = []
+        for i in range(20):
+            item = Mock(spec=["question", "answer", "confidence"])
+            item.question = f"Question number {i} about topic {'x' * i}?"
+            item.answer = f"Answer {i}"
+            item.confidence = 0.9
+            items.append(item)
+
+        selects = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            qa_service.process_qa_pairs(
+                qa_list=items,
+                cleaned_text="Some page content",
+                url="https://example.com/many",
+                page_snapshot_id="1",
+                dataset_name=sample_dataset.name,
+                model="gpt-4o-mini",
+                dataset_id=sample_dataset.id,
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        # The IDs read to build the ID filter, which skips the exact lookup,
+        # the similarity candidates, then the unindexed record count, the new
+        # question lengths and the questions in their length window read to
+        # update the similarity index
+        assert len(selects) == 5
+
     def test_process_qa_pairs_empty_list(
         self, qa_service: QAService, db: Session, sample_dataset
     ):
@@ -1,13 +1,15 @@
 """Tests for scraper service"""
 
 import pytest
-from unittest.mock import Mock, patch
-from datetime import datetime, timezone
+import httpx
+from unittest.mock import AsyncMock, Mock, patch
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
 from sqlalchemy.orm import Session
-import requests
 
-from server.services.scraper import ScraperService
-from server.models.scraper import PageSnapshot
+from server.services.scraper import ScraperService, retry_after_delay
+from server.core.config import config
+from server.models.scraper import CleanedText, PageSnapshot
 from server.models.dataset import Dataset
 
 
@@ -51,14 +53,17 @@ def sample_html():
 class TestScraperService:
     """Tests for ScraperService class"""
 
-    def test_setup_session(self, scraper_service: ScraperService):
-        """Test session setup with retries"""
-        session = scraper_service._setup_session()
+    async def test_client_is_shared(self, scraper_service: ScraperService, db):
+        """Test scrapers share one async client with redirects enabled"""
+        client = scraper_service.client
 
-        assert isinstance(session, requests.Session)
-        # Verify adapters are mounted
-        assert "https://" in session.adapters
-        assert "http://" in session.adapters
+        assert isinstance(client, httpx.AsyncClient)
+        assert client.follow_redirects is True
+        assert ScraperService(db).client is client
+
+        given = httpx.AsyncClient()
+        assert ScraperService(db, client=given).client is given
+        await given.aclose()
 
     def test_get_user_agent(self, scraper_service: ScraperService):
         """Test getting a user agent"""
@@ -175,9 +180,9 @@ class TestScraperService:
         assert saved_snapshot is not None
         assert saved_snapshot.content == "Test content"
 
-    @patch("server.services.scraper.requests.Session.get")
-    @patch("server.services.scraper.time.sleep")
-    def test_scrape_url_success(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_success(
         self,
         mock_sleep,
         mock_get,
@@ -190,10 +195,13 @@ class TestScraperService:
         # Mock response
         mock_response = Mock()
         mock_response.text = sample_html
+        mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        result = scraper_service.scrape_url("https://example.com", sample_dataset.id)
+        result = await scraper_service.scrape_url(
+            "https://example.com", sample_dataset.id
+        )
 
         assert result.id is not None
         assert result.url == "https://example.com"
@@ -202,39 +210,107 @@ class TestScraperService:
         # Verify sleep was called (rate limiting)
         mock_sleep.assert_called_once()
 
-    @patch("server.services.scraper.requests.Session.get")
-    def test_scrape_url_http_error(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    async def test_scrape_url_http_error(
         self, mock_get, scraper_service: ScraperService, sample_dataset
     ):
         """Test scraping with HTTP error"""
-        mock_get.side_effect = requests.HTTPError("404 Not Found")
+        request = httpx.Request("GET", "https://example.com/404")
+        mock_get.return_value = httpx.Response(404, request=request)
 
-        with pytest.raises(requests.HTTPError):
-            scraper_service.scrape_url("https://example.com/404", sample_dataset.id)
+        with pytest.raises(httpx.HTTPStatusError):
+            await scraper_service.scrape_url(
+                "https://example.com/404", sample_dataset.id
+            )
 
-    @patch("server.services.scraper.requests.Session.get")
-    def test_scrape_url_timeout(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    async def test_scrape_url_timeout(
         self, mock_get, scraper_service: ScraperService, sample_dataset
     ):
         """Test scraping with timeout"""
-        mock_get.side_effect = requests.Timeout("Request timeout")
+        mock_get.side_effect = httpx.ReadTimeout("Request timeout")
 
-        with pytest.raises(requests.Timeout):
-            scraper_service.scrape_url("https://slow-example.com", sample_dataset.id)
+        with pytest.raises(httpx.TimeoutException):
+            await scraper_service.scrape_url(
+                "https://slow-example.com", sample_dataset.id
+            )
 
-    @patch("server.services.scraper.requests.Session.get")
-    def test_scrape_url_connection_error(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    async def test_scrape_url_connection_error(
         self, mock_get, scraper_service: ScraperService, sample_dataset
     ):
         """Test scraping with connection error"""
-        mock_get.side_effect = requests.ConnectionError("Connection failed")
+        mock_get.side_effect = httpx.ConnectError("Connection failed")
+
+        with pytest.raises(httpx.ConnectError):
+            await scraper_service.scrape_url(
+                "https://unreachable.com", sample_dataset.id
+            )
+
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_retries_on_server_error(
+        self, mock_sleep, mock_get, scraper_service: ScraperService, sample_dataset
+    ):
+        """Test that 5xx responses are retried before succeeding"""
+        request = httpx.Request("GET", "https://example.com")
+        mock_get.side_effect = [
+            httpx.Response(503, request=request),
+            httpx.Response(
+                200, request=request, text="<html><body>Recovered</body></html>"
+            ),
+        ]
+
+        result = await scraper_service.scrape_url(
+            "https://example.com", sample_dataset.id
+        )
 
-        with pytest.raises(requests.ConnectionError):
-            scraper_service.scrape_url("https://unreachable.com", sample_dataset.id)
+        assert mock_get.call_count == 2
+        assert "Recovered" in result.content
 
-    @patch("server.services.scraper.requests.Session.get")
-    @patch("server.services.scraper.time.sleep")
-    def test_scrape_url_creates_hash(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_honors_retry_after(
+        self, mock_sleep, mock_get, scraper_service: ScraperService, sample_dataset
+    ):
+        """Test that the Retry-After header of a 429 sets the retry delay"""
+        request = httpx.Request("GET", "https://example.com")
+        mock_get.side_effect = [
+            httpx.Response(429, request=request, headers={"Retry-After": "2"}),
+            httpx.Response(503, request=request, headers={"Retry-After": "3600"}),
+            httpx.Response(503, request=request),
+            httpx.Response(200, request=request, text="<html><body>Ok</body></html>"),
+        ]
+
+        await scraper_service.scrape_url("https://example.com", sample_dataset.id)
+
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        # Retry-After, capped by HTTP_MAX_RETRY_DELAY, then exponential backoff,
+        # then the delay between scrapes
+        assert delays[:3] == [2.0, 60.0, pytest.approx(1.2)]
+
+    def test_retry_after_delay_formats(self):
+        """Test Retry-After is read in seconds or as an HTTP date"""
+        request = httpx.Request("GET", "https://example.com")
+
+        def delay(value):
+            headers = {"Retry-After": value} if value is not None else {}
+            return retry_after_delay(
+                httpx.Response(429, request=request, headers=headers)
+            )
+
+        assert delay("5") == 5.0
+        assert delay(None) is None
+        assert delay("soon") is None
+        assert delay("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        future = format_datetime(
+            datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True
+        )
+        assert 25 < delay(future) <= 30
+
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_creates_hash(
         self,
         mock_sleep,
         mock_get,
@@ -245,10 +321,11 @@ class TestScraperService:
         """Test that URL hash is created correctly"""
         mock_response = Mock()
         mock_response.text = "<html><body>Test</body></html>"
+        mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        result = scraper_service.scrape_url(
+        result = await scraper_service.scrape_url(
             "https://example.com/page", sample_dataset.id
         )
 
@@ -258,18 +335,19 @@ class TestScraperService:
         expected_hash = PageSnapshot.compute_hash_from_url("https://example.com/page")
         assert result.url_hash == expected_hash
 
-    @patch("server.services.scraper.requests.Session.get")
-    @patch("server.services.scraper.time.sleep")
-    def test_scrape_url_sets_user_agent(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_sets_user_agent(
         self, mock_sleep, mock_get, scraper_service: ScraperService, sample_dataset
     ):
         """Test that user agent is set in request"""
         mock_response = Mock()
         mock_response.text = "<html><body>Test</body></html>"
+        mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        scraper_service.scrape_url("https://example.com", sample_dataset.id)
+        await scraper_service.scrape_url("https://example.com", sample_dataset.id)
 
         # Verify get was called with headers containing User-Agent
         call_args = mock_get.call_args
@@ -337,9 +415,9 @@ class TestScraperService:
 
         assert cleaned.content == ""
 
-    @patch("server.services.scraper.requests.Session.get")
-    @patch("server.services.scraper.time.sleep")
-    def test_scrape_url_with_complex_html(
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_with_complex_html(
         self,
         mock_sleep,
         mock_get,
@@ -368,10 +446,113 @@ class TestScraperService:
         """
         mock_response = Mock()
         mock_response.text = complex_html
+        mock_response.status_code = 200
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        result = scraper_service.scrape_url("https://example.com", sample_dataset.id)
+        result = await scraper_service.scrape_url(
+            "https://example.com", sample_dataset.id
+        )
 
         assert "Article Title" in result.content
         assert "Article content" in result.content
+
+    def test_find_cleaned_text_matches_content_and_model(
+        self, scraper_service: ScraperService, db: Session, sample_dataset
+    ):
+        """Test finding a cleaned text by snapshot content hash and model"""
+        content = "Identical page content"
+        snapshot = PageSnapshot(
+            url="https://example.com",
+            user_agent="Test Agent",
+            content=content,
+            retrieved_at=datetime.now(timezone.utc),
+            url_hash=PageSnapshot.compute_hash_from_url("https://example.com"),
+            content_hash=PageSnapshot.compute_hash_from_content(content),
+            dataset_id=sample_dataset.id,
+        )
+        db.add(snapshot)
+        db.commit()
+        db.refresh(snapshot)
+
+        assert isinstance(snapshot.id, str)
+        saved = scraper_service.save_cleaned_text(
+            page_snapshot_id=snapshot.id,
+            content="Cleaned content",
+            language="en",
+            model="gpt-4o-mini",
+        )
+
+        content_hash = PageSnapshot.compute_hash_from_content(content)
+        found = scraper_service.find_cleaned_text(content_hash, "gpt-4o-mini")
+        assert found is not None
+        assert found.id == saved.id
+
+        assert scraper_service.find_cleaned_text(content_hash, "gpt-4") is None
+        other_hash = PageSnapshot.compute_hash_from_content("Other content")
+        assert scraper_service.find_cleaned_text(other_hash, "gpt-4o-mini") is None
+
+    def test_find_cleaned_text_skips_truncated_cleanings(
+        self, scraper_service: ScraperService, db: Session, sample_dataset
+    ):
+        """Test texts cleaned before chunking, or with other chunks, are not reused"""
+        content = "Long page content " * 1000
+        snapshot = PageSnapshot(
+            url="https://example.com/long",
+            user_agent="Test Agent",
+            content=content,
+            retrieved_at=datetime.now(timezone.utc),
+            url_hash=PageSnapshot.compute_hash_from_url("https://example.com/long"),
+            content_hash=PageSnapshot.compute_hash_from_content(content),
+            dataset_id=sample_dataset.id,
+        )
+        # Cleaned from the first 10000 characters, before the chunk size was stored
+        truncated = CleanedText(
+            page_snapshot=snapshot,
+            content=content[:10000],
+            language="en",
+            model="gpt-4o-mini",
+        )
+        db.add_all([snapshot, truncated])
+        db.commit()
+
+        content_hash = PageSnapshot.compute_hash_from_content(content)
+        assert scraper_service.find_cleaned_text(content_hash, "gpt-4o-mini") is None
+
+        saved = scraper_service.save_cleaned_text(
+            page_snapshot_id=str(snapshot.id),
+            content=content,
+            language="en",
+            model="gpt-4o-mini",
+        )
+        assert saved.chunk_size == config.cleaning_chunk_size
+        found = scraper_service.find_cleaned_text(content_hash, "gpt-4o-mini")
+        assert found is not None
+        assert found.id == saved.id
+
+        with patch.object(
+            config, "cleaning_chunk_size", config.cleaning_chunk_size * 2
+        ):
+            assert (
+                scraper_service.find_cleaned_text(content_hash, "gpt-4o-mini") is None
+            )
+
+    @patch("server.services.scraper.httpx.AsyncClient.get", new_callable=AsyncMock)
+    @patch("server.services.scraper.asyncio.sleep", new_callable=AsyncMock)
+    async def test_scrape_url_sets_content_hash(
+        self, mock_sleep, mock_get, scraper_service: ScraperService, sample_dataset
+    ):
+        """Test that the content hash of the extracted text is stored"""
+        mock_response = Mock()
+        mock_response.text = "<html><body>Hashed text</body></html>"
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        result = await scraper_service.scrape_url(
+            "https://example.com", sample_dataset.id
+        )
+
+        assert result.content_hash == PageSnapshot.compute_hash_from_content(
+            "Hashed text"
+        )
@@ -0,0 +1,401 @@
+"""
+Tests for the similarity engines.
+"""
+
+import random
+from difflib import SequenceMatcher
+
+import pytest
+from sqlalchemy.orm import Session
+
+from server.models.dataset import (
+    QALshBucket,
+    QASimilarityFingerprint,
+    QASimilarityPair,
+    QASource,
+)
+from server.services.similarity import (
+    ExactSimilarityEngine,
+    IndexedSimilarityEngine,
+    LshSimilarityEngine,
+    SimilarityIndex,
+    SimilarityMethod,
+    TfidfSimilarityEngine,
+    _pack_texts,
+    cluster_similar_pairs,
+    get_similarity_engine,
+)
+
+
+QUESTIONS = [
+    "What is Python programming language?",
+    "How do airplanes fly?",
+    "What is the Python programming language?",
+    "Who wrote the first compiler?",
+    "How do airplanes fly ?",
+    "What is JavaScript?",
+]
+
+
+def _pair_keys(pairs):
+    return {(i, j) for i, j, _ in pairs}
+
+
+def test_exact_engine_finds_similar_pairs():
+    """Test the exact engine matches SequenceMatcher ratios."""
+    pairs = ExactSimilarityEngine().find_similar_pairs(QUESTIONS, threshold=0.9)
+
+    assert _pair_keys(pairs) == {(0, 2), (1, 4)}
+    assert all(i < j for i, j, _ in pairs)
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.9])
+def test_exact_engine_pruning_keeps_results(threshold):
+    """Test the exact engine returns what comparing every pair returns."""
+    rng = random.Random(7)
+    words = ["what", "is", "the", "python", "language", "how", "do", "planes"]
+    texts = [
+        " ".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(80)
+    ]
+    expected = []
+    for i in range(len(texts)):
+        for j in range(i + 1, len(texts)):
+            similarity = SequenceMatcher(None, texts[i], texts[j]).ratio()
+            if similarity >= threshold:
+                expected.append((i, j, similarity))
+
+    engine = ExactSimilarityEngine()
+    pairs = engine.find_similar_pairs(texts, threshold)
+
+    assert pairs == expected
+    assert engine.pairs_considered == len(texts) * (len(texts) - 1) // 2
+    assert engine.pairs_pruned > 0
+
+
+def test_exact_engine_process_pool_matches_sequential():
+    """Test sharding rows across worker processes gives the same pairs."""
+    rng = random.Random(3)
+    words = ["what", "is", "the", "python", "language", "how", "do", "planes"]
+    texts = [
+        " ".join(rng.choice(words) for _ in range(rng.randint(1, 6))) for _ in range(60)
+    ]
+
+    sequential = ExactSimilarityEngine(workers=1)
+    parallel = ExactSimilarityEngine(workers=2, chunk_size=7)
+
+    assert parallel.find_similar_pairs(texts, 0.8) == sequential.find_similar_pairs(
+        texts, 0.8
+    )
+    assert parallel.pairs_considered == sequential.pairs_considered
+    assert parallel.pairs_pruned == sequential.pairs_pruned
+
+
+def test_pack_texts():
+    """Test texts are packed into one string and offsets."""
+    joined, offsets = _pack_texts(["ab", "", "cde"])
+
+    assert joined == "abcde"
+    assert offsets.tolist() == [0, 2, 2, 5]
+
+
+def test_tfidf_engine_agrees_with_exact_engine():
+    """Test the TF-IDF engine finds the same near duplicates as the exact one."""
+    exact = ExactSimilarityEngine().find_similar_pairs(QUESTIONS, threshold=0.9)
+    tfidf = TfidfSimilarityEngine().find_similar_pairs(QUESTIONS, threshold=0.8)
+
+    assert _pair_keys(tfidf) == _pair_keys(exact)
+    assert all(0.8 <= score <= 1.0 for _, _, score in tfidf)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 4, 1024])
+def test_tfidf_engine_tiling_does_not_change_results(block_size):
+    """Test the pairs found do not depend on the block size."""
+    reference = TfidfSimilarityEngine(block_size=1024).find_similar_pairs(
+        QUESTIONS, threshold=0.3
+    )
+    pairs = TfidfSimilarityEngine(block_size=block_size).find_similar_pairs(
+        QUESTIONS, threshold=0.3
+    )
+
+    assert _pair_keys(pairs) == _pair_keys(reference)
+    scores = {(i, j): score for i, j, score in pairs}
+    for i, j, score in reference:
+        assert scores[(i, j)] == pytest.approx(score, abs=1e-5)
+
+
+def test_tfidf_engine_identical_texts_reach_threshold_one():
+    """Test identical texts score 1.0 despite float rounding."""
+    texts = ["Same question?", "Same question?", "Different one"]
+
+    pairs = TfidfSimilarityEngine().find_similar_pairs(texts, threshold=1.0)
+
+    assert pairs == [(0, 1, 1.0)]
+
+
+def test_tfidf_engine_handles_small_inputs():
+    """Test empty, single and blank inputs."""
+    engine = TfidfSimilarityEngine()
+
+    assert engine.find_similar_pairs([], threshold=0.5) == []
+    assert engine.find_similar_pairs(["Only one"], threshold=0.5) == []
+    assert engine.find_similar_pairs(["abc", "xyz"], threshold=0.5) == []
+    assert _pair_keys(engine.find_similar_pairs(["", ""], threshold=0.5)) == {(0, 1)}
+
+
+def test_lsh_engine_agrees_with_exact_engine(test_db: Session):
+    """Test the LSH engine verifies the near duplicates found by the exact one."""
+    records = [
+        QASource.from_qa_generation(
+            question=question,
+            answer="An answer",
+            context="A context",
+            source_url="https://example.com",
+            dataset_id="dataset",
+        )
+        for question in QUESTIONS
+    ]
+    test_db.add_all(records)
+    test_db.commit()
+
+    engine = LshSimilarityEngine(test_db, "dataset", [r.id for r in records])
+    pairs = engine.find_similar_pairs(QUESTIONS, threshold=0.9)
+
+    exact = ExactSimilarityEngine().find_similar_pairs(QUESTIONS, threshold=0.9)
+    assert pairs == sorted(exact)
+    # The index is built on first use and persisted
+    assert test_db.query(QALshBucket).count() > 0
+
+    parallel = LshSimilarityEngine(
+        test_db, "dataset", [r.id for r in records], workers=2, chunk_size=1
+    )
+    assert parallel.find_similar_pairs(QUESTIONS, threshold=0.9) == pairs
+    assert parallel.pairs_considered == engine.pairs_considered
+
+
+def _add_records(test_db: Session, questions, dataset_id="dataset"):
+    records = [
+        QASource.from_qa_generation(
+            question=question,
+            answer="An answer",
+            context="A context",
+            source_url="https://example.com",
+            dataset_id=dataset_id,
+        )
+        for question in questions
+    ]
+    test_db.add_all(records)
+    test_db.commit()
+    return records
+
+
+@pytest.mark.parametrize("threshold", [0.7, 0.8, 0.95])
+def test_indexed_engine_agrees_with_exact_engine(test_db: Session, threshold):
+    """Test the pairs read from the index are those of the exact engine."""
+    records = _add_records(test_db, QUESTIONS)
+
+    engine = IndexedSimilarityEngine(
+        test_db, "dataset", [r.id for r in records], floor=0.7
+    )
+    pairs = engine.find_similar_pairs(QUESTIONS, threshold)
+
+    assert pairs == ExactSimilarityEngine().find_similar_pairs(QUESTIONS, threshold)
+    assert engine.pairs_considered == len(QUESTIONS) * (len(QUESTIONS) - 1) // 2
+    assert test_db.query(QASimilarityFingerprint).count() == len(QUESTIONS)
+
+
+def test_similarity_index_only_compares_new_records(test_db: Session):
+    """Test a refresh compares the new and edited records with the others."""
+    records = _add_records(test_db, QUESTIONS)
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+    assert index.refresh([r.id for r in records], QUESTIONS)
+    test_db.commit()
+
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+    assert index.refresh([r.id for r in records], QUESTIONS)
+    assert index.pairs_considered == 0
+
+    questions = [*QUESTIONS, "Who wrote the first compiler ?"]
+    records += _add_records(test_db, questions[-1:])
+    record_ids = [r.id for r in records]
+    assert index.refresh(record_ids, questions)
+    assert index.pairs_considered == len(QUESTIONS)
+
+    # An edited question is compared again and its old pairs are dropped
+    questions[3] = "Which river crosses Paris?"
+    assert index.pending(record_ids, questions) == [3]
+    assert index.refresh(record_ids, questions)
+    test_db.commit()
+
+    stored = {(id1, id2) for id1, id2, _ in index.pairs(0.7)}
+    expected = ExactSimilarityEngine().find_similar_pairs(questions, 0.7)
+    assert stored == {(record_ids[i], record_ids[j]) for i, j, _ in expected}
+
+
+def test_indexed_engine_read_only(test_db: Session):
+    """Test a read-only engine compares pending records without storing them."""
+    records = _add_records(test_db, QUESTIONS)
+    record_ids = [r.id for r in records]
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+    assert index.refresh(record_ids, QUESTIONS)
+    test_db.commit()
+
+    # A new record, and an edited one whose indexed pairs are stale
+    questions = [*QUESTIONS, "Who wrote the first compiler ?"]
+    record_ids += [r.id for r in _add_records(test_db, questions[-1:])]
+    questions[3] = "Which river crosses Paris?"
+
+    engine = IndexedSimilarityEngine(
+        test_db, "dataset", record_ids, floor=0.7, read_only=True
+    )
+    pairs = engine.find_similar_pairs(questions, 0.7)
+
+    assert pairs == ExactSimilarityEngine().find_similar_pairs(questions, 0.7)
+    assert not test_db.new and not test_db.dirty
+    assert index.pending(record_ids, questions) == [3, len(QUESTIONS)]
+
+
+def test_similarity_index_add_records_loads_length_window(test_db: Session):
+    """Test new records are only compared with questions of a reachable length."""
+    long_questions = [
+        f"Which of the {n} frameworks released this year supports async views?"
+        for n in range(5)
+    ]
+    questions = QUESTIONS + long_questions
+    records = _add_records(test_db, questions)
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+    assert index.refresh([r.id for r in records], questions)
+    test_db.commit()
+
+    new = _add_records(test_db, ["What is the Python language?"])
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+    assert index.add_records([new[0].id])
+    test_db.commit()
+
+    # The long questions cannot reach the floor and are not loaded
+    assert index.pairs_considered == len(QUESTIONS)
+    questions.append(new[0].question)
+    record_ids = [r.id for r in records + new]
+    assert index.pending(record_ids, questions) == []
+    stored = {(id1, id2) for id1, id2, _ in index.pairs(0.7)}
+    expected = ExactSimilarityEngine().find_similar_pairs(questions, 0.7)
+    assert stored == {(record_ids[i], record_ids[j]) for i, j, _ in expected}
+    assert not index.add_records(
+        [r.id for r in _add_records(test_db, ["One more?", "And another?"])],
+        max_pending=1,
+    )
+
+
+def test_similarity_index_limits(test_db: Session):
+    """Test the pending limit and the floor of the index."""
+    records = _add_records(test_db, QUESTIONS)
+    index = SimilarityIndex(test_db, "dataset", floor=0.7)
+
+    assert not index.refresh([r.id for r in records], QUESTIONS, max_pending=2)
+    assert test_db.query(QASimilarityFingerprint).count() == 0
+    with pytest.raises(ValueError, match="at least 0.7"):
+        index.pairs(0.5)
+    with pytest.raises(ValueError, match="at least 0.7"):
+        IndexedSimilarityEngine(
+            test_db, "dataset", [r.id for r in records], floor=0.7
+        ).find_similar_pairs(QUESTIONS, 0.5)
+
+    index.refresh([r.id for r in records], QUESTIONS)
+    SimilarityIndex.remove_records(test_db, [records[0].id])
+    assert test_db.query(QASimilarityFingerprint).count() == len(QUESTIONS) - 1
+    assert all(
+        records[0].id not in (pair.record1_id, pair.record2_id)
+        for pair in test_db.query(QASimilarityPair)
+    )
+
+
+def test_get_similarity_engine_auto(monkeypatch, test_db: Session):
+    """Test auto picks the engine from the dataset size."""
+    from server.core.config import config
+
+    monkeypatch.setattr(config, "similarity_exact_max_records", 10)
+    monkeypatch.setattr(config, "similarity_tfidf_max_records", 100)
+
+    assert isinstance(get_similarity_engine("auto", 10), ExactSimilarityEngine)
+    assert isinstance(get_similarity_engine("auto", 11), TfidfSimilarityEngine)
+    assert isinstance(get_similarity_engine("auto", 101), TfidfSimilarityEngine)
+    assert isinstance(
+        get_similarity_engine("auto", 101, test_db, "dataset", []),
+        LshSimilarityEngine,
+    )
+    assert isinstance(
+        get_similarity_engine("auto", 10, test_db, "dataset", [], threshold=0.9),
+        IndexedSimilarityEngine,
+    )
+    # Large datasets only use the index once it is built
+    assert isinstance(
+        get_similarity_engine("auto", 5000, test_db, "dataset", [], threshold=0.9),
+        LshSimilarityEngine,
+    )
+    assert isinstance(
+        get_similarity_engine("auto", 10, test_db, "dataset", [], threshold=0.5),
+        ExactSimilarityEngine,
+    )
+    assert get_similarity_engine(SimilarityMethod.EXACT, 10**6).method == "exact"
+    assert get_similarity_engine(SimilarityMethod.TFIDF, 2).method == "tfidf"
+
+
+def test_get_similarity_engine_unknown_method():
+    """Test an unknown method is rejected."""
+    with pytest.raises(ValueError, match="Unknown similarity method"):
+        get_similarity_engine("levenshtein", 10)
+
+
+def test_get_similarity_engine_lsh_needs_dataset():
+    """Test the LSH engine cannot be used without a dataset."""
+    with pytest.raises(ValueError, match="needs a dataset"):
+        get_similarity_engine("lsh", 10)
+
+
+@pytest.mark.parametrize(
+    "engine",
+    [
+        ExactSimilarityEngine(chunk_size=2),
+        TfidfSimilarityEngine(block_size=2),
+    ],
+    ids=["exact", "tfidf"],
+)
+def test_engines_report_progress(engine):
+    """Test the engines report an increasing share of the comparisons."""
+    progress = []
+    engine.find_similar_pairs(QUESTIONS, threshold=0.8, on_progress=progress.append)
+
+    assert len(progress) == 3
+    assert progress == sorted(progress)
+    assert progress[-1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "engine",
+    [
+        ExactSimilarityEngine(chunk_size=2),
+        TfidfSimilarityEngine(block_size=2),
+    ],
+    ids=["exact", "tfidf"],
+)
+def test_engines_hand_over_pairs(engine):
+    """Test pairs go to on_pairs as they are found, instead of the result."""
+    expected = engine.find_similar_pairs(QUESTIONS, threshold=0.5)
+    batches = []
+
+    returned = engine.find_similar_pairs(
+        QUESTIONS, threshold=0.5, on_pairs=batches.append
+    )
+
+    assert returned == []
+    assert len(batches) == 3
+    assert sorted(pair for batch in batches for pair in batch) == expected
+
+
+def test_cluster_similar_pairs():
+    """Test pairs are grouped transitively and singletons are dropped."""
+    pairs = [(0, 3, 0.9), (3, 5, 0.85), (1, 4, 0.95)]
+
+    clusters = cluster_similar_pairs(6, pairs)
+
+    assert sorted(sorted(cluster) for cluster in clusters) == [[0, 3, 5], [1, 4]]
+    assert cluster_similar_pairs(3, []) == []